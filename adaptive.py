@@ -0,0 +1,110 @@
+import math
+
+from campaign import SimulationConfig, run_campaign
+from montecarlo import concat_results
+from stats import RunningStats
+
+
+def relative_precision(result, level=0.95):
+    """
+    Relative half-widths of the confidence intervals of a campaign's
+    overall KF RMSE and mean collisions per run.
+
+    Returns:
+        dict 'rmse_kf' / 'collisions' -> half-width / estimate (0 when the
+        estimate and its interval are both 0, NaN below two runs)
+    """
+    summary = result.summary(level)
+    collisions = RunningStats()
+    collisions.add(result.collision_counts)
+    lo, hi = collisions.confidence_interval(level)
+    return {
+        'rmse_kf': _relative(summary['rmse_kf'], summary['rmse_kf_lo'], summary['rmse_kf_hi']),
+        'collisions': _relative(collisions.mean, lo, hi),
+    }
+
+
+def _relative(estimate, lo, hi):
+    half = 0.5 * (hi - lo)
+    if half == 0.0:
+        return 0.0
+    return float(half / abs(estimate)) if estimate else math.inf
+
+
+def run_adaptive(config=None, precision=0.05, collision_precision=None, min_runs=100,
+                 max_runs=10000, batch_runs=100, level=0.95, workers=None,
+                 keep_histories=False, cache=None):
+    """
+    Run a Monte Carlo campaign of config until its metrics are known to a
+    relative precision.
+
+    Runs are added in batches until the level confidence intervals of the
+    overall KF RMSE and of the mean collisions per run have a half-width
+    below precision (resp. collision_precision) times the estimate, or
+    max_runs is reached. After each batch, the next one is sized from the
+    current half-widths (precision scales as 1 / sqrt(runs)), between
+    batch_runs and the runs done so far.
+
+    Runs use the per-run campaign engine, extended with run_campaign(
+    first_run=...), so the result is identical to a fixed campaign of the
+    same number of runs. With a cache (resultcache.ResultCache), every
+    batch is served through it: the schedule, and so the reported number
+    of runs, doesn't depend on what is cached, and a rerun answers each
+    batch from the stored campaign (or its prefix entries) instead of
+    simulating it again.
+
+    Args:
+        config: SimulationConfig (default: SimulationConfig())
+        precision: target relative half-width of the KF RMSE interval
+        collision_precision: same for the mean collisions (default:
+            precision; math.inf ignores collisions)
+        min_runs, max_runs: bounds on the number of runs
+        batch_runs: smallest batch of runs added at a time
+        level: confidence level of the intervals
+        workers, keep_histories: see run_campaign
+
+    Returns:
+        MonteCarloResult, with result.stopping = {'runs', 'converged',
+        'precision': relative_precision() at the end, 'history': list of
+        (runs, relative_precision()) after every batch}
+    """
+    config = config if config is not None else SimulationConfig()
+    if collision_precision is None:
+        collision_precision = precision
+    targets = {name: target for name, target in
+               (('rmse_kf', precision), ('collisions', collision_precision))
+               if math.isfinite(target)}
+    min_runs = max(2, min(min_runs, max_runs))
+
+    result = None
+    history = []
+    n_next = min_runs
+    while True:
+        if cache is not None:
+            result = cache.run(config, n_next, workers=workers, keep_histories=keep_histories)
+        elif result is None:
+            result = run_campaign(config, n_next, workers, keep_histories=keep_histories)
+        else:
+            tail = run_campaign(config, n_next - result.n_runs, workers,
+                                keep_histories=keep_histories, first_run=result.n_runs)
+            result = concat_results(result, tail)
+
+        n = result.n_runs
+        achieved = relative_precision(result, level)
+        history.append((n, achieved))
+        ratio = max(achieved[name] / target for name, target in targets.items())
+        converged = ratio <= 1.0
+        if converged or n >= max_runs:
+            break
+
+        # Runs needed if the spread stays put: n * ratio^2
+        wanted = math.ceil(n * ratio ** 2) if math.isfinite(ratio) else 2 * n
+        n_next = min(max(wanted, n + batch_runs), 2 * n, max_runs)
+
+    result.stopping = {
+        'runs': n,
+        'converged': converged,
+        'precision': achieved,
+        'history': history,
+    }
+    return result
@@ -0,0 +1,344 @@
+import os
+
+import numpy as np
+import matplotlib.patches as patches
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+
+
+# ============================================================
+# ACCUMULATION
+# ============================================================
+
+class DensityGrid:
+    """
+    Visitation-density heatmap over a rectangular extent.
+
+    Points are binned with one vectorized bincount per batch, so any
+    number of trajectories can be accumulated chunk by chunk in
+    O(bins) memory.
+    """
+
+    def __init__(self, extent, bins=(440, 440)):
+        """
+        Args:
+            extent: (x_min, x_max, y_min, y_max) of the grid
+            bins: number of cells along x and y
+        """
+        self.extent = tuple(float(v) for v in extent)
+        self.bins = (int(bins[0]), int(bins[1]))
+        self.counts = np.zeros(self.bins[0] * self.bins[1], dtype=np.int64)
+        self.n_points = 0
+
+    @classmethod
+    def from_boundary(cls, boundary_constraints, bins=(440, 440)):
+        b = boundary_constraints
+        return cls((b.x_min, b.x_max, b.y_min, b.y_max), bins)
+
+    @classmethod
+    def from_log(cls, log, field='true_pos', bins=(440, 440), runs_per_chunk=4096):
+        """Grid spanning every position of a TrajectoryLog (one pass over the log)."""
+        lo = np.full(2, np.inf)
+        hi = np.full(2, -np.inf)
+        for first in range(0, len(log), runs_per_chunk):
+            points = log.runs(first, first + runs_per_chunk)[0][field]
+            if len(points):
+                lo = np.minimum(lo, points.min(axis=0))
+                hi = np.maximum(hi, points.max(axis=0))
+        if not np.all(np.isfinite(lo)):
+            lo, hi = np.zeros(2), np.ones(2)
+        # Margin so the largest coordinates fall inside the last cell
+        margin = np.maximum(1e-6 * (hi - lo), 1e-9) + (hi == lo)
+        lo, hi = lo - margin, hi + margin
+        return cls((lo[0], hi[0], lo[1], hi[1]), bins)
+
+    @property
+    def density(self):
+        """(ny, nx) counts, rows along y (ready for imshow with origin='lower')."""
+        return self.counts.reshape(self.bins).T
+
+    def add_points(self, points):
+        """Accumulate an (n, 2) array of positions."""
+        points = np.asarray(points, dtype=float)
+        x_min, x_max, y_min, y_max = self.extent
+        nx, ny = self.bins
+        ix = np.floor((points[:, 0] - x_min) * (nx / (x_max - x_min))).astype(np.int64)
+        iy = np.floor((points[:, 1] - y_min) * (ny / (y_max - y_min))).astype(np.int64)
+        inside = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny)
+        self.counts += np.bincount(ix[inside] * ny + iy[inside], minlength=nx * ny)
+        self.n_points += int(inside.sum())
+
+    def add_paths(self, points, offsets, substeps=1):
+        """
+        Accumulate concatenated trajectories.
+
+        Args:
+            points: (n, 2) positions of several runs back to back
+            offsets: (runs + 1,) start row of every run, plus the total
+            substeps: also add substeps - 1 evenly spaced points on every
+                      segment, so fast runs leave continuous tracks
+        """
+        points = np.asarray(points, dtype=float)
+        self.add_points(points)
+        if substeps <= 1 or len(points) < 2:
+            return
+
+        # Segments that stay within one run
+        starts = np.ones(len(points) - 1, dtype=bool)
+        run_last = np.asarray(offsets[1:-1], dtype=np.int64) - 1
+        starts[run_last[(run_last >= 0) & (run_last < len(starts))]] = False
+        a = points[:-1][starts]
+        d = points[1:][starts] - a
+        for k in range(1, substeps):
+            self.add_points(a + d * (k / substeps))
+
+    def add_log(self, log, field='true_pos', runs_per_chunk=4096, substeps=1):
+        """Accumulate every run of a TrajectoryLog, a chunk of runs at a time."""
+        for first in range(0, len(log), runs_per_chunk):
+            views, offsets = log.runs(first, first + runs_per_chunk)
+            self.add_paths(views[field], offsets, substeps)
+        return self
+
+
+def _log_errors(views):
+    true_pos = views['true_pos']
+    return {
+        'meas': np.linalg.norm(views['measured_pos'] - true_pos, axis=1),
+        'kf': np.linalg.norm(views['kf_state'][:, :2] - true_pos, axis=1),
+        'pred': np.linalg.norm(views['pred_pos'] - true_pos, axis=1),
+    }
+
+
+def errors_from_log(log, runs_per_chunk=4096):
+    """
+    Measured / KF / predicted position errors of every recorded run, as
+    dense arrays; error_bands_from_log() needs far less memory.
+
+    Returns:
+        dict name -> (N, T) error array, NaN-padded after each run's end
+        steps: (N,) number of steps per run
+    """
+    steps = log.steps()
+    width = int(steps.max()) if len(steps) else 0
+    errors = {name: np.full((len(steps), width), np.nan) for name in ('meas', 'kf', 'pred')}
+    for first in range(0, len(log), runs_per_chunk):
+        views, offsets = log.runs(first, first + runs_per_chunk)
+        n = np.diff(offsets)
+        rows = np.repeat(np.arange(first, first + len(n)), n)
+        cols = np.arange(offsets[-1]) - np.repeat(offsets[:-1], n)
+        for name, values in _log_errors(views).items():
+            errors[name][rows, cols] = values
+    return errors, steps
+
+
+def error_bands_from_log(log, percentiles=(5, 25, 75, 95), sample_runs=4096, runs_per_chunk=4096):
+    """
+    Per-timestep error percentiles and RMSE of a TrajectoryLog in memory
+    independent of its number of runs.
+
+    RMSE and active-run counts cover every run and are summed chunk by
+    chunk. The percentiles are those of an evenly spaced sample of at most
+    sample_runs runs, the only (runs, T) arrays held.
+
+    Returns:
+        dict name -> (bands, rmse, counts), as error_percentiles()
+    """
+    steps = log.steps()
+    n_runs = len(steps)
+    width = int(steps.max()) if n_runs else 0
+    sample = np.unique(np.linspace(0, n_runs - 1, min(n_runs, sample_runs)).round().astype(np.int64))
+    slot = np.full(n_runs, -1, dtype=np.int64)
+    slot[sample] = np.arange(len(sample))
+
+    names = ('meas', 'kf', 'pred')
+    sampled = {name: np.full((len(sample), width), np.nan) for name in names}
+    sq_sums = {name: np.zeros(width) for name in names}
+    counts = np.zeros(width, dtype=np.int64)
+    for first in range(0, n_runs, runs_per_chunk):
+        views, offsets = log.runs(first, first + runs_per_chunk)
+        n = np.diff(offsets)
+        rows = slot[np.repeat(np.arange(first, first + len(n)), n)]
+        cols = np.arange(offsets[-1]) - np.repeat(offsets[:-1], n)
+        keep = rows >= 0
+        counts += np.bincount(cols, minlength=width)
+        for name, values in _log_errors(views).items():
+            sq_sums[name] += np.bincount(cols, weights=values ** 2, minlength=width)
+            sampled[name][rows[keep], cols[keep]] = values[keep]
+
+    bands = {}
+    for name in names:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rmse = np.sqrt(sq_sums[name] / counts)
+        bands[name] = (error_percentiles(sampled[name], percentiles)[0], rmse, counts)
+    return bands
+
+
+def pad_histories(histories):
+    """Stack ragged per-run error lists (e.g. ErrorPlotter histories) into a NaN-padded (N, T) array."""
+    width = max((len(h) for h in histories), default=0)
+    errors = np.full((len(histories), width), np.nan)
+    for i, h in enumerate(histories):
+        errors[i, :len(h)] = h
+    return errors
+
+
+def error_percentiles(errors, percentiles=(5, 25, 50, 75, 95)):
+    """
+    Per-timestep percentiles of an (N, T) error array over the runs still
+    active at each timestep (NaN entries are ignored).
+
+    Uses a single sort along the run axis (NaNs sort last) and linear
+    interpolation between order statistics, instead of np.nanpercentile.
+
+    Returns:
+        (len(percentiles), T) array; NaN where no run is active
+        rmse: (T,) RMSE over the active runs
+        counts: (T,) number of active runs
+    """
+    errors = np.asarray(errors, dtype=float)
+    valid = ~np.isnan(errors)
+    counts = valid.sum(axis=0)
+    ordered = np.sort(errors, axis=0)
+    cols = np.arange(errors.shape[1])
+
+    out = np.full((len(percentiles), errors.shape[1]), np.nan)
+    active = counts > 0
+    last = np.maximum(counts - 1, 0)
+    for i, q in enumerate(percentiles):
+        pos = last * (q / 100.0)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, last)
+        frac = pos - lo
+        value = ordered[lo, cols] * (1.0 - frac) + ordered[hi, cols] * frac
+        out[i, active] = value[active]
+
+    sq = np.where(valid, errors, 0.0) ** 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rmse = np.sqrt(sq.sum(axis=0) / counts)
+    return out, rmse, counts
+
+
+# ============================================================
+# RENDERING (offscreen Agg, no pyplot / GUI involved)
+# ============================================================
+
+def _figure(figsize):
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _overlay_world(ax, boundary_constraints=None, obstacle_constraints=None):
+    if boundary_constraints is not None:
+        b = boundary_constraints
+        ax.add_patch(patches.Rectangle(
+            (b.x_min, b.y_min), b.x_max - b.x_min, b.y_max - b.y_min,
+            linewidth=2, edgecolor='darkorange', facecolor='none', zorder=5))
+    if obstacle_constraints is not None:
+        for i, obs in enumerate(obstacle_constraints.obstacles):
+            ax.add_patch(patches.Rectangle(
+                (obs['x_min'], obs['y_min']),
+                obs['x_max'] - obs['x_min'],
+                obs['y_max'] - obs['y_min'],
+                linewidth=1.5, edgecolor='darkred', facecolor='none', hatch='//',
+                label='Obstacle' if i == 0 else '', zorder=6))
+
+
+def render_density(grid, path, boundary_constraints=None, obstacle_constraints=None,
+                   title="Trajectory density", dpi=150):
+    """Save a log-scaled visitation heatmap of a DensityGrid to path."""
+    fig = _figure((9, 9))
+    ax = fig.add_subplot()
+    density = grid.density
+    image = ax.imshow(
+        np.ma.masked_equal(density, 0),
+        extent=grid.extent,
+        origin='lower',
+        cmap='viridis',
+        norm=LogNorm(vmin=1, vmax=max(1, int(density.max()))),
+        interpolation='nearest',
+        zorder=1
+    )
+    fig.colorbar(image, ax=ax, shrink=0.8, label="Visits per cell")
+    _overlay_world(ax, boundary_constraints, obstacle_constraints)
+
+    x_min, x_max, y_min, y_max = grid.extent
+    ax.set_xlim(x_min - 5, x_max + 5)
+    ax.set_ylim(y_min - 5, y_max + 5)
+    ax.set_aspect('equal')
+    ax.set_title(f"{title} ({grid.n_points} points)")
+    fig.savefig(path, dpi=dpi)
+    return path
+
+
+_ERROR_STYLE = {
+    'meas': ("Measurement Error (GPS)", 'blue'),
+    'kf': ("Kalman Error", 'green'),
+    'pred': ("Prediction Error (Model)", 'brown'),
+}
+
+
+def render_error_bands(errors, path, percentiles=(5, 25, 75, 95), title="Position Estimation Error vs Time",
+                       yscale='log', dpi=150):
+    """
+    Save RMSE-vs-time curves with percentile bands to path.
+
+    Args:
+        errors: dict name -> (N, T) NaN-padded error array (see errors_from_log,
+                pad_histories); names in _ERROR_STYLE get ErrorPlotter's colors
+        percentiles: pairs of band edges, outermost first (5-95, 25-75)
+        yscale: 'log' keeps the bands readable next to the initial transient
+    """
+    bands = {name: error_percentiles(data, percentiles) for name, data in errors.items()}
+    return render_bands(bands, path, percentiles, title, yscale, dpi)
+
+
+def render_bands(bands, path, percentiles=(5, 25, 75, 95), title="Position Estimation Error vs Time",
+                 yscale='log', dpi=150):
+    """
+    render_error_bands() from precomputed bands: dict name -> (bands, rmse,
+    counts) of error_percentiles() or error_bands_from_log().
+    """
+    fig = _figure((10, 6))
+    ax = fig.add_subplot()
+    for name, (bands_t, rmse, counts) in bands.items():
+        label, color = _ERROR_STYLE.get(name, (name, None))
+        t = np.arange(len(rmse))
+        line, = ax.plot(t, rmse, color=color, linewidth=1.5, label=f"{label} RMSE")
+        for i in range(len(percentiles) // 2):
+            lo, hi = bands_t[i], bands_t[-1 - i]
+            ax.fill_between(t, lo, hi, color=line.get_color(), alpha=0.12 + 0.1 * i, linewidth=0,
+                            label=f"{label} p{percentiles[i]:g}-p{percentiles[-1 - i]:g}" if i == 0 else None)
+
+    ax.set_title(title)
+    ax.set_xlabel("Time step")
+    ax.set_ylabel("Error (Euclidean distance)")
+    ax.set_yscale(yscale)
+    ax.grid(True)
+    ax.legend(fontsize=8)
+    fig.savefig(path, dpi=dpi)
+    return path
+
+
+def render_log(log, directory, boundary_constraints, obstacle_constraints=None, bins=(440, 440), substeps=1,
+               sample_runs=4096):
+    """
+    Render the density heatmap and the error bands of a TrajectoryLog into
+    directory (density.png, errors.png). The heatmap spans the boundary, or
+    the recorded positions without one; see error_bands_from_log() for
+    sample_runs.
+    """
+    os.makedirs(directory, exist_ok=True)
+    if boundary_constraints is not None:
+        grid = DensityGrid.from_boundary(boundary_constraints, bins)
+    else:
+        grid = DensityGrid.from_log(log, bins=bins)
+    grid.add_log(log, substeps=substeps)
+    percentiles = (5, 25, 75, 95)
+    bands = error_bands_from_log(log, percentiles, sample_runs)
+    return (
+        render_density(grid, os.path.join(directory, 'density.png'),
+                       boundary_constraints, obstacle_constraints),
+        render_bands(bands, os.path.join(directory, 'errors.png'), percentiles),
+    )
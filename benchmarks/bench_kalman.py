@@ -0,0 +1,93 @@
+"""
+Micro-benchmark for the single-instance Kalman2D update.
+
+Compares Kalman2D.update (matrix form) against Kalman2D.update_fast
+(allocation-free block form), with the full covariance filter and with
+the steady-state (fixed) gain: per-call latency and the temporary memory
+each call holds, measured with tracemalloc.
+
+The peak temporary bytes stand in for an allocation count: tracemalloc
+reports memory, not the number of allocations, and Python has no such
+counter short of a C-level allocator hook. A path that allocates no
+arrays holds a couple of hundred bytes of Python float scalars; every
+live temporary array adds at least ~100 bytes.
+
+Usage:
+    python benchmarks/bench_kalman.py [--calls N]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filters import Kalman2D  # noqa: E402
+
+
+def _make_filter(steady_state=False):
+    return Kalman2D([0.0, 0.0], 0.1 ** 2, 0.5 ** 2, 1.0, steady_state=steady_state)
+
+
+def _measurements(n, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n, dtype=float)[:, None]
+    return t * np.array([1.0, 0.5]) + rng.normal(0.0, 0.5, size=(n, 2))
+
+
+def time_per_call(method, calls, repeats=5, steady_state=False):
+    """Best-of-repeats wall time per call, in microseconds."""
+    zs = list(_measurements(calls))
+    best = float('inf')
+    for _ in range(repeats):
+        kf = _make_filter(steady_state)
+        update = getattr(kf, method)
+        start = time.perf_counter()
+        for z in zs:
+            update(z, None, 1.0)
+        best = min(best, time.perf_counter() - start)
+    return best / calls * 1e6
+
+
+def peak_temp_bytes_per_call(method, calls=1000, steady_state=False):
+    """
+    Largest amount of memory a single call holds at once beyond what was
+    allocated before it (tracemalloc peak), i.e. its temporaries. A warm-up
+    call runs first so lazily created buffers are not counted.
+    """
+    zs = list(_measurements(calls + 1))
+    kf = _make_filter(steady_state)
+    update = getattr(kf, method)
+    update(zs[0], None, 1.0)
+    zs = zs[1:]
+
+    tracemalloc.start()
+    worst = 0
+    for z in zs:
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        update(z, None, 1.0)
+        worst = max(worst, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'method':<14}{'gain':<8}{'us/call':>10}{'peak temp bytes/call':>24}")
+    for steady_state in (False, True):
+        for method in ('update', 'update_fast'):
+            us = time_per_call(method, args.calls, steady_state=steady_state)
+            peak = peak_temp_bytes_per_call(method, steady_state=steady_state)
+            gain = 'fixed' if steady_state else 'full'
+            print(f"{method:<14}{gain:<8}{us:>10.2f}{peak:>24d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,396 @@
+"""
+Seeded micro- and macro-benchmark suite with regression checks.
+
+Micro-benchmarks time single calls of the hot-path methods (Kalman2D.update,
+Kalman2D.predict / correct, Kalman.update, Simulator2D.step with 0 / 10 / 1000 obstacles,
+ObstacleConstraints.is_colliding, Planner2D.velocity_vector,
+PositionSensor.sense_position). Macro-benchmarks time the full
+sense -> filter -> plan -> act loop of main.py: the serial per-run loop
+(campaign.simulate_run) and the lockstep batch engine (campaign.run_batch), in
+steps/sec and runs/sec. Every input is drawn from fixed seeds, so two runs
+of the suite do exactly the same work.
+
+Results are written as JSON together with the environment they were
+measured in (Python / numpy versions, platform, CPU count, git commit).
+`compare` checks a result file against a stored baseline and exits with
+status 1 if any benchmark got slower by more than the threshold.
+
+Usage:
+    python benchmarks/suite.py run [--out results.json] [--only PATTERN] [--quick]
+    python benchmarks/suite.py compare baseline.json results.json [--threshold 0.1]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from boundaries import BoundaryConstraints, ObstacleConstraints  # noqa: E402
+from campaign import SimulationConfig, simulate_run, run_batch  # noqa: E402
+from filters import Kalman, Kalman2D, ParticleFilter2D  # noqa: E402
+from planner import Planner2D  # noqa: E402
+from sdf import DistanceMap  # noqa: E402
+from sensors import PositionSensor  # noqa: E402
+from simulator import Simulator2D  # noqa: E402
+
+SCHEMA_VERSION = 1
+
+# Scenario used by the micro-benchmarks, as in main.py
+DT = 1.0
+MAX_SPEED = 2
+RADIUS = 0.5
+BOUNDARY = (-100, 10, -100, 10)
+
+
+# ============================================================
+# SCENARIO HELPERS
+# ============================================================
+
+def _boundary():
+    x_min, x_max, y_min, y_max = BOUNDARY
+    return BoundaryConstraints(RADIUS, MAX_SPEED, DT, x_min=x_min, x_max=x_max, y_min=y_min, y_max=y_max)
+
+
+def _obstacles(n, seed):
+    """n random boxes of 0.5-4 units inside the boundary, never covering the start corner."""
+    rng = np.random.default_rng(seed)
+    obstacles = ObstacleConstraints(MAX_SPEED, DT, RADIUS)
+    added = 0
+    while added < n:
+        x, y = rng.uniform(BOUNDARY[0], BOUNDARY[1] - 4), rng.uniform(BOUNDARY[2], BOUNDARY[3] - 4)
+        w, h = rng.uniform(0.5, 4.0, size=2)
+        if x + w > -10 and y + h > -10:
+            continue
+        obstacles.add_obstacle(x_min=x, x_max=x + w, y_min=y, y_max=y + h)
+        added += 1
+    return obstacles
+
+
+def _positions(n, seed):
+    rng = np.random.default_rng(seed)
+    return rng.uniform((BOUNDARY[0], BOUNDARY[2]), (BOUNDARY[1], BOUNDARY[3]), size=(n, 2))
+
+
+# ============================================================
+# MICRO-BENCHMARKS
+# ============================================================
+# Each setup(calls) returns (func, inputs); the timed loop is
+# `for a in inputs: func(*a)`. Setups run once per repeat, so stateful
+# objects (filters, simulators) start every repeat from the same state.
+
+def _kalman2d_update(calls):
+    kf = Kalman2D([0.0, 0.0], 0.1 ** 2, 0.5 ** 2, DT)
+    rng = np.random.default_rng(1)
+    t = np.arange(calls, dtype=float)[:, None]
+    zs = t * np.array([1.0, 0.5]) + rng.normal(0.0, 0.5, size=(calls, 2))
+    vel = np.array([1.0, 0.5])
+    return kf.update, [(z, vel, DT) for z in zs]
+
+
+def _kalman2d_predict(calls):
+    kf = Kalman2D([0.0, 0.0], 0.1 ** 2, 0.5 ** 2, DT)
+    return kf.predict, [(0.1,)] * calls
+
+
+def _kalman2d_correct(calls):
+    kf = Kalman2D([0.0, 0.0], 0.1 ** 2, 0.5 ** 2, DT)
+    rng = np.random.default_rng(10)
+    return kf.correct, [(z,) for z in rng.normal(0.0, 0.5, size=(calls, 2))]
+
+
+def _kalman_update(calls):
+    kf = Kalman([0.0, 0.0], 0.1 ** 2, 0.5 ** 2)
+    rng = np.random.default_rng(2)
+    t = np.arange(calls, dtype=float)[:, None]
+    zs = t * np.array([1.0, 0.5]) + rng.normal(0.0, 0.5, size=(calls, 2))
+    vel = np.array([1.0, 0.5])
+    return kf.update, [(z, vel, DT) for z in zs]
+
+
+def _particle_filter_update(calls):
+    pf = ParticleFilter2D([0.0, 0.0], 0.1 ** 2, 0.5 ** 2, DT,
+                          boundary_constraints=_boundary(), obstacle_constraints=_obstacles(10, seed=3),
+                          rng=np.random.default_rng(11))
+    rng = np.random.default_rng(12)
+    t = np.arange(calls, dtype=float)[:, None]
+    zs = t * np.array([-0.2, -0.1]) + rng.normal(0.0, 0.5, size=(calls, 2))
+    vel = np.array([-0.2, -0.1])
+    return pf.update, [(z, vel, DT) for z in zs]
+
+
+def _simulator_step(n_obstacles, sdf=False):
+    def setup(calls):
+        boundary = _boundary()
+        obstacles = _obstacles(n_obstacles, seed=3) if n_obstacles else None
+        distance_map = DistanceMap(boundary, obstacles) if sdf else None
+        sim = Simulator2D([0.0, 0.0], [-95.0, -95.0], DT, 0.1, MAX_SPEED,
+                          boundary_constraints=boundary, obstacle_constraints=obstacles,
+                          rng=np.random.default_rng(4), log_path=False, distance_map=distance_map)
+        # A noisy walk towards the far corner, bouncing off whatever it meets
+        rng = np.random.default_rng(5)
+        vels = rng.normal(0.0, 1.0, size=(calls, 2)) + np.array([-1.0, -1.0])
+        return sim.step, [(v,) for v in vels]
+    return setup
+
+
+def _is_colliding(calls):
+    obstacles = _obstacles(1000, seed=3)
+    return obstacles.is_colliding, [(p,) for p in _positions(calls, seed=6)]
+
+
+def _velocity_vector(calls):
+    planner = Planner2D([-95.0, -95.0], MAX_SPEED, DT, 40.0, 2.0)
+    return planner.velocity_vector, [(p,) for p in _positions(calls, seed=7)]
+
+
+def _sense_position(calls):
+    sensor = PositionSensor(0.5, [0.0, 0.0], rng=np.random.default_rng(8), log_path=False)
+    return sensor.sense_position, [(p,) for p in _positions(calls, seed=9)]
+
+
+MICRO_BENCHMARKS = {
+    'kalman2d_update': _kalman2d_update,
+    'kalman2d_predict': _kalman2d_predict,
+    'kalman2d_correct': _kalman2d_correct,
+    'kalman_update': _kalman_update,
+    'particle_filter_update': _particle_filter_update,
+    'simulator_step_0_obstacles': _simulator_step(0),
+    'simulator_step_10_obstacles': _simulator_step(10),
+    'simulator_step_1000_obstacles': _simulator_step(1000),
+    'simulator_step_1000_obstacles_sdf': _simulator_step(1000, sdf=True),
+    'is_colliding_1000_obstacles': _is_colliding,
+    'planner_velocity_vector': _velocity_vector,
+    'sensor_sense_position': _sense_position,
+}
+
+
+def run_micro(setup, calls, repeats):
+    """
+    Returns:
+        dict with best / median microseconds per call over the repeats
+    """
+    times = []
+    for _ in range(repeats):
+        func, inputs = setup(calls)
+        start = time.perf_counter()
+        for a in inputs:
+            func(*a)
+        times.append((time.perf_counter() - start) / len(inputs) * 1e6)
+    return {
+        'metric': 'us_per_call',
+        'higher_is_better': False,
+        'value': min(times),
+        'median': statistics.median(times),
+        'repeats': times,
+        'calls': calls,
+    }
+
+
+# ============================================================
+# MACRO-BENCHMARKS (the main.py loop)
+# ============================================================
+# Each returns (total steps, runs) of one full campaign.
+
+# main.py's defaults: signed distance field on, navigation off
+MACRO_CONFIG = SimulationConfig(distance_map=True, seed=2024)
+
+
+def _serial_loop(n_runs):
+    config = MACRO_CONFIG
+    boundary, obstacles = config.build_constraints()
+    distance_map = config.build_distance_map(boundary, obstacles)
+    steps = 0
+    for run in range(n_runs):
+        errors, _, _ = simulate_run(config, run, boundary, obstacles, distance_map=distance_map)
+        steps += len(errors)
+    return steps, n_runs
+
+
+def _batch_loop(n_runs):
+    result = run_batch(MACRO_CONFIG, n_runs)
+    return int(result.steps.sum()), n_runs
+
+
+# name -> (campaign, runs per repeat)
+MACRO_BENCHMARKS = {
+    'main_loop_serial': (_serial_loop, 100),
+    'main_loop_batch': (_batch_loop, 500),
+}
+
+
+def run_macro(campaign, n_runs, repeats):
+    """
+    Returns:
+        dict with the best steps/sec (the compared value), runs/sec and
+        wall time over the repeats
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        steps, runs = campaign(n_runs)
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return {
+        'metric': 'steps_per_sec',
+        'higher_is_better': True,
+        'value': steps / best,
+        'runs_per_sec': runs / best,
+        'median_seconds': statistics.median(times),
+        'repeats': times,
+        'steps': steps,
+        'runs': runs,
+    }
+
+
+# ============================================================
+# ENVIRONMENT / RESULTS
+# ============================================================
+
+def _git(*args):
+    try:
+        out = subprocess.run(['git', *args], cwd=REPO_DIR, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+def environment():
+    """Where the results were measured."""
+    status = _git('status', '--porcelain', '--untracked-files=no')
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': _git('rev-parse', 'HEAD'),
+        'git_dirty': bool(status) if status is not None else None,
+    }
+
+
+def run_suite(only=None, quick=False, calls=20000, repeats=5, macro_repeats=3):
+    """Run every benchmark whose name matches the regex only; returns the results document."""
+    scale = 10 if quick else 1
+    pattern = re.compile(only) if only else None
+    results = {}
+    for name, setup in MICRO_BENCHMARKS.items():
+        if pattern is None or pattern.search(name):
+            results[name] = run_micro(setup, max(1, calls // scale), repeats)
+            print(f"{name:<38}{results[name]['value']:>12.2f} us/call")
+    for name, (campaign, n_runs) in MACRO_BENCHMARKS.items():
+        if pattern is None or pattern.search(name):
+            results[name] = r = run_macro(campaign, max(1, n_runs // scale), macro_repeats)
+            print(f"{name:<38}{r['value']:>12.0f} steps/s{r['runs_per_sec']:>10.1f} runs/s")
+    return {
+        'schema': SCHEMA_VERSION,
+        'environment': environment(),
+        'settings': {'quick': quick, 'calls': calls, 'repeats': repeats, 'macro_repeats': macro_repeats},
+        'benchmarks': results,
+    }
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Compare two results documents benchmark by benchmark.
+
+    Slowdown is current/baseline time per call (or baseline/current
+    throughput), so 1.25 means 25% slower whatever the metric.
+
+    Returns:
+        rows: (name, baseline value, current value, slowdown, regressed)
+        for every benchmark present in both
+        regressions: names slower by more than threshold
+    """
+    rows, regressions = [], []
+    base, cur = baseline['benchmarks'], current['benchmarks']
+    for name in base:
+        if name not in cur:
+            continue
+        b, c = base[name]['value'], cur[name]['value']
+        slowdown = b / c if base[name]['higher_is_better'] else c / b
+        regressed = slowdown > 1.0 + threshold
+        rows.append((name, b, c, slowdown, regressed))
+        if regressed:
+            regressions.append(name)
+    return rows, regressions
+
+
+_ENV_KEYS = ('python', 'numpy', 'machine', 'processor', 'cpu_count')
+
+
+def _cmd_run(args):
+    document = run_suite(args.only, args.quick, args.calls, args.repeats, args.macro_repeats)
+    with open(args.out, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"Wrote {len(document['benchmarks'])} results to {args.out}")
+    return 0
+
+
+def _cmd_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    for key in _ENV_KEYS:
+        b, c = baseline['environment'].get(key), current['environment'].get(key)
+        if b != c:
+            print(f"warning: {key} differs (baseline {b}, current {c})")
+    if baseline.get('settings', {}).get('quick') != current.get('settings', {}).get('quick'):
+        print("warning: comparing a --quick run with a full run")
+
+    rows, regressions = compare(baseline, current, args.threshold)
+    print(f"{'benchmark':<38}{'baseline':>12}{'current':>12}{'slowdown':>10}")
+    for name, b, c, slowdown, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:<38}{b:>12.4g}{c:>12.4g}{slowdown:>9.2f}x{flag}")
+    for name in sorted(set(baseline['benchmarks']) ^ set(current['benchmarks'])):
+        where = 'baseline' if name in baseline['benchmarks'] else 'current'
+        print(f"{name:<38} only in {where}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="run the suite and write a results file")
+    run.add_argument('--out', default='benchmark_results.json')
+    run.add_argument('--only', help="regex of the benchmark names to run")
+    run.add_argument('--quick', action='store_true', help="a tenth of the calls / runs, for smoke tests")
+    run.add_argument('--calls', type=int, default=20000, help="calls per micro-benchmark repeat")
+    run.add_argument('--repeats', type=int, default=5)
+    run.add_argument('--macro-repeats', type=int, default=3)
+    run.set_defaults(func=_cmd_run)
+
+    cmp = commands.add_parser('compare', help="flag regressions against a baseline results file")
+    cmp.add_argument('baseline')
+    cmp.add_argument('current')
+    cmp.add_argument('--threshold', type=float, default=0.1,
+                     help="allowed slowdown, as a fraction (default 0.1 = 10%%)")
+    cmp.set_defaults(func=_cmd_compare)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,5 @@
+import math
+
 import numpy as np
 
 
@@ -31,6 +33,14 @@ class BoundaryConstraints:
             pos[1] + self.radius > self.y_max):
             return True
         return False
+
+    def is_outside_many(self, points):
+        """Vectorized is_outside for an (N, 2) array of positions."""
+        points = np.asarray(points, dtype=float)
+        return ((points[:, 0] - self.radius < self.x_min) |
+                (points[:, 0] + self.radius > self.x_max) |
+                (points[:, 1] - self.radius < self.y_min) |
+                (points[:, 1] + self.radius > self.y_max))
     
     def corrected_boundary_violated(self,pos,old_pos):
         movement=pos-old_pos
@@ -49,23 +59,66 @@ class BoundaryConstraints:
         
         return corrected_pos
 
+    def corrected_boundary_violated_many(self, points, old_points):
+        """Vectorized corrected_boundary_violated for (N, 2) arrays."""
+        corrected = np.array(points, dtype=float)
+        for axis, lo, hi in ((0, self.x_min, self.x_max), (1, self.y_min, self.y_max)):
+            c = corrected[:, axis]
+            below = c - self.radius < lo
+            above = ~below & (c + self.radius > hi)
+            c[below] = lo + self.radius
+            c[above] = hi - self.radius
+        return corrected
+
 class ObstacleConstraints:
     """
     Handles rectangular obstacles in the environment.
+
+    Obstacles are stored in a contiguous (M, 4) array of
+    [x_min, x_max, y_min, y_max] rows, and indexed by a uniform grid so a
+    point query only tests the few obstacles whose inflated box overlaps
+    the point's grid cell.
     """
     
-    def __init__(self, max_speed, dt, radius ):
+    def __init__(self, max_speed, dt, radius, cell_size=10.0):
         """
         Initialize obstacle constraints.
         
         Args:
-                              'multi_direction' (try down, left, right, up)
+            max_speed, dt: vehicle limits
+            radius: vehicle radius; obstacles are inflated by it
+            cell_size: edge length of the broadphase grid cells
         """
+        # Obstacle records as dicts, kept for plotting
         self.obstacles = []
         self.max_speed=max_speed
         self.dt=dt
         self.radius=radius
 
+        # Contiguous obstacle storage (grown geometrically)
+        self.n_obstacles = 0
+        self._boxes = np.empty((16, 4))
+        self._inflated_boxes = np.empty((16, 4))
+        self._inflated = []  # inflated boxes as tuples, for scalar queries
+
+        # Uniform grid broadphase: (cell_x, cell_y) -> obstacle indices
+        self.cell_size = float(cell_size)
+        self._grid = {}
+        self._grid_arrays = {}
+
+        # Moves that started inside an obstacle and fell back to axis reversion
+        self.slide_fallbacks = 0
+
+    @property
+    def boxes(self):
+        """(M, 4) array of [x_min, x_max, y_min, y_max] rows."""
+        return self._boxes[:self.n_obstacles]
+
+    @property
+    def inflated_boxes(self):
+        """(M, 4) obstacle boxes grown by radius on every side."""
+        return self._inflated_boxes[:self.n_obstacles]
+
     def add_obstacle(self, x_min, x_max, y_min, y_max):
         """Add a rectangular obstacle."""
         self.obstacles.append({
@@ -74,14 +127,74 @@ class ObstacleConstraints:
             'y_min': y_min,
             'y_max': y_max
         })
+
+        n = self.n_obstacles
+        if n == len(self._boxes):
+            self._boxes = np.concatenate([self._boxes, np.empty_like(self._boxes)])
+            self._inflated_boxes = np.concatenate(
+                [self._inflated_boxes, np.empty_like(self._inflated_boxes)])
+
+        inflated = (x_min - self.radius, x_max + self.radius,
+                    y_min - self.radius, y_max + self.radius)
+        self._boxes[n] = (x_min, x_max, y_min, y_max)
+        self._inflated_boxes[n] = inflated
+        self._inflated.append(inflated)
+        self.n_obstacles += 1
+
+        # Register the obstacle in every grid cell its inflated box overlaps
+        cx0, cy0 = self._cell(inflated[0], inflated[2])
+        cx1, cy1 = self._cell(inflated[1], inflated[3])
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                self._grid.setdefault((cx, cy), []).append(n)
+                self._grid_arrays.pop((cx, cy), None)
+
+    def _cell(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _cell_candidates(self, cell):
+        """Obstacle indices registered in a grid cell, as an int array."""
+        candidates = self._grid_arrays.get(cell)
+        if candidates is None:
+            candidates = np.array(self._grid.get(cell, ()), dtype=np.intp)
+            self._grid_arrays[cell] = candidates
+        return candidates
     
     def is_colliding(self, pos):
         """Check if position collides with any obstacle."""
-        for obs in self.obstacles:
-            if (obs['x_min'] - self.radius <= pos[0] <= obs['x_max'] + self.radius and
-                obs['y_min'] - self.radius <= pos[1] <= obs['y_max'] + self.radius):
+        candidates = self._grid.get(self._cell(pos[0], pos[1]))
+        if candidates is None:
+            return False
+        for i in candidates:
+            x_min, x_max, y_min, y_max = self._inflated[i]
+            if x_min <= pos[0] <= x_max and y_min <= pos[1] <= y_max:
                 return True
         return False
+
+    def is_colliding_many(self, points):
+        """Vectorized is_colliding for an (N, 2) array of positions."""
+        points = np.asarray(points, dtype=float)
+        colliding = np.zeros(len(points), dtype=bool)
+        if not self._grid or not len(points):
+            return colliding
+
+        # Group the points by grid cell
+        cells = np.floor(points / self.cell_size).astype(np.int64)
+        unique_cells, inverse = np.unique(cells, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(inverse))))
+
+        inflated = self.inflated_boxes
+        for u, (cx, cy) in enumerate(unique_cells.tolist()):
+            if (cx, cy) not in self._grid:
+                continue
+            sel = order[bounds[u]:bounds[u + 1]]
+            boxes = inflated[self._cell_candidates((cx, cy))]
+            p = points[sel]
+            colliding[sel] = ((boxes[:, 0] <= p[:, :1]) & (p[:, :1] <= boxes[:, 1]) &
+                              (boxes[:, 2] <= p[:, 1:]) & (p[:, 1:] <= boxes[:, 3])).any(axis=1)
+        return colliding
     
     def _multi_direction_collision(self, new_pos, old_pos):
         """
@@ -108,4 +221,240 @@ class ObstacleConstraints:
             return try_y
         
         # Both sliding attempts failed - stay at old position
-        return old_pos.copy()
\ No newline at end of file
+        return old_pos.copy()
+
+    def _multi_direction_collision_many(self, new_points, old_points):
+        """
+        Vectorized _multi_direction_collision for (N, 2) arrays.
+        Every row gets the same x-then-y slide fallback as the scalar version.
+        """
+        corrected = np.array(new_points, dtype=float)
+        blocked = self.is_colliding_many(corrected)
+        if not blocked.any():
+            return corrected
+
+        try_x = old_points[blocked].copy()
+        try_x[:, 0] = corrected[blocked, 0]
+        x_ok = ~self.is_colliding_many(try_x)
+
+        try_y = old_points[blocked].copy()
+        try_y[:, 1] = corrected[blocked, 1]
+        y_ok = ~x_ok & ~self.is_colliding_many(try_y)
+
+        resolved = old_points[blocked].copy()
+        resolved[x_ok] = try_x[x_ok]
+        resolved[y_ok] = try_y[y_ok]
+        corrected[blocked] = resolved
+        return corrected
+
+    # ============================================================
+    # SWEPT (CONTINUOUS) COLLISION
+    # ============================================================
+
+    def _segment_candidates(self, x0, y0, x1, y1):
+        """Obstacle indices registered in the grid cells a segment's bbox covers."""
+        cx0, cy0 = self._cell(min(x0, x1), min(y0, y1))
+        cx1, cy1 = self._cell(max(x0, x1), max(y0, y1))
+        if cx0 == cx1 and cy0 == cy1:
+            return self._grid.get((cx0, cy0), ())
+        found = set()
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                found.update(self._grid.get((cx, cy), ()))
+        return sorted(found)
+
+    def sweep(self, old_pos, new_pos):
+        """
+        Sweep the vehicle (a circle of radius, approximated by the inflated
+        boxes like is_colliding) from old_pos to new_pos with the slab method.
+        Obstacles that already contain old_pos are ignored.
+
+        Returns:
+            (toi, normal, index) of the first contact, or None:
+            toi in [0, 1] along the motion, normal the outward unit normal of
+            the face hit, index the blocking obstacle
+        """
+        x0, y0 = float(old_pos[0]), float(old_pos[1])
+        dx, dy = float(new_pos[0]) - x0, float(new_pos[1]) - y0
+
+        best = None
+        for i in self._segment_candidates(x0, y0, x0 + dx, y0 + dy):
+            x_min, x_max, y_min, y_max = self._inflated[i]
+            t_enter, t_exit, axis = -math.inf, math.inf, -1
+
+            # X slab
+            if dx == 0.0:
+                if x0 < x_min or x0 > x_max:
+                    continue
+            else:
+                t1, t2 = (x_min - x0) / dx, (x_max - x0) / dx
+                if t1 > t2:
+                    t1, t2 = t2, t1
+                t_enter, t_exit, axis = t1, t2, 0
+
+            # Y slab
+            if dy == 0.0:
+                if y0 < y_min or y0 > y_max:
+                    continue
+            else:
+                t1, t2 = (y_min - y0) / dy, (y_max - y0) / dy
+                if t1 > t2:
+                    t1, t2 = t2, t1
+                if t1 > t_enter:
+                    t_enter, axis = t1, 1
+                t_exit = min(t_exit, t2)
+
+            if t_enter > t_exit or t_enter < 0.0 or t_enter > 1.0:
+                continue
+            if best is None or t_enter < best[0]:
+                if axis == 0:
+                    normal = (-math.copysign(1.0, dx), 0.0)
+                else:
+                    normal = (0.0, -math.copysign(1.0, dy))
+                best = (t_enter, normal, i)
+        return best
+
+    def sweep_many(self, old_points, new_points):
+        """
+        Vectorized sweep for (N, 2) arrays of segments.
+
+        Returns:
+            toi: (N,) time of impact, inf where nothing is hit
+            normal: (N, 2) outward contact normals (zero where nothing is hit)
+            index: (N,) blocking obstacle, -1 where nothing is hit
+        """
+        old_points = np.asarray(old_points, dtype=float)
+        new_points = np.asarray(new_points, dtype=float)
+        n = len(old_points)
+        toi = np.full(n, np.inf)
+        normal = np.zeros((n, 2))
+        index = np.full(n, -1, dtype=np.intp)
+        if not self._grid or not n:
+            return toi, normal, index
+
+        # Broadphase: (segment, obstacle) pairs sharing a grid cell
+        lo_cell = np.floor(np.minimum(old_points, new_points) / self.cell_size).astype(np.int64)
+        span = np.floor(np.maximum(old_points, new_points) / self.cell_size).astype(np.int64) - lo_cell
+        pair_rows, pair_boxes = [], []
+        for ox in range(int(span[:, 0].max()) + 1):
+            for oy in range(int(span[:, 1].max()) + 1):
+                rows = np.flatnonzero((span[:, 0] >= ox) & (span[:, 1] >= oy))
+                cells = lo_cell[rows] + (ox, oy)
+                unique_cells, inverse = np.unique(cells, axis=0, return_inverse=True)
+                inverse = inverse.reshape(-1)
+                for u, (cx, cy) in enumerate(unique_cells.tolist()):
+                    if (cx, cy) not in self._grid:
+                        continue
+                    cell_rows = rows[inverse == u]
+                    candidates = self._cell_candidates((cx, cy))
+                    pair_rows.append(np.repeat(cell_rows, len(candidates)))
+                    pair_boxes.append(np.tile(candidates, len(cell_rows)))
+        if not pair_rows:
+            return toi, normal, index
+        pairs = np.unique(np.concatenate(pair_rows) * self.n_obstacles + np.concatenate(pair_boxes))
+        rows, boxes_idx = np.divmod(pairs, self.n_obstacles)
+
+        # Narrowphase: slab test per pair
+        boxes = self.inflated_boxes[boxes_idx]
+        p0 = old_points[rows]
+        d = new_points[rows] - p0
+        lo = boxes[:, [0, 2]]
+        hi = boxes[:, [1, 3]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t1 = (lo - p0) / d
+            t2 = (hi - p0) / d
+        t_min = np.minimum(t1, t2)
+        t_max = np.maximum(t1, t2)
+        still = d == 0.0
+        inside = (lo <= p0) & (p0 <= hi)
+        t_min[still] = np.where(inside[still], -np.inf, np.inf)
+        t_max[still] = np.where(inside[still], np.inf, -np.inf)
+
+        axis = (t_min[:, 1] > t_min[:, 0]).astype(np.intp)
+        t_enter = np.maximum(t_min[:, 0], t_min[:, 1])
+        t_exit = np.minimum(t_max[:, 0], t_max[:, 1])
+        valid = (t_enter <= t_exit) & (t_enter >= 0.0) & (t_enter <= 1.0)
+        if not valid.any():
+            return toi, normal, index
+
+        # Earliest contact per segment
+        rows, boxes_idx, axis, t_enter, d = (
+            rows[valid], boxes_idx[valid], axis[valid], t_enter[valid], d[valid])
+        order = np.lexsort((t_enter, rows))
+        first = order[np.concatenate(([True], rows[order][1:] != rows[order][:-1]))]
+        hit_rows = rows[first]
+        toi[hit_rows] = t_enter[first]
+        index[hit_rows] = boxes_idx[first]
+        hit_axis = axis[first]
+        normal[hit_rows, hit_axis] = -np.copysign(1.0, d[first, hit_axis])
+        return toi, normal, index
+
+    def slide(self, old_pos, new_pos, max_contacts=3, skin=1e-7):
+        """
+        Move from old_pos towards new_pos, stopping at the first contact and
+        sliding the remaining motion along the contact face (its normal
+        component removed), for up to max_contacts contacts.
+
+        Returns:
+            corrected_pos: final position
+            hit: True if any obstacle was contacted
+        """
+        if not self._segment_candidates(old_pos[0], old_pos[1], new_pos[0], new_pos[1]):
+            # Broadphase: no obstacle anywhere near the motion
+            return np.array(new_pos, dtype=float), False
+
+        if self.is_colliding(old_pos):
+            # Already overlapping an obstacle: fall back to axis reversion
+            self.slide_fallbacks += 1
+            if self.is_colliding(new_pos):
+                return self._multi_direction_collision(new_pos, old_pos), True
+            return np.array(new_pos, dtype=float), False
+
+        pos = np.array(old_pos, dtype=float)
+        motion = np.asarray(new_pos, dtype=float) - pos
+        hit = False
+        for _ in range(max_contacts):
+            contact = self.sweep(pos, pos + motion)
+            if contact is None:
+                return pos + motion, hit
+            hit = True
+            toi, (nx, ny), _ = contact
+            pos = pos + motion * toi + np.array((nx * skin, ny * skin))
+            motion = motion * (1.0 - toi)
+            motion[0 if nx else 1] = 0.0
+        return pos, hit
+
+    def slide_many(self, old_points, new_points, max_contacts=3, skin=1e-7):
+        """Vectorized slide for (N, 2) arrays. Returns (corrected, hit)."""
+        old_points = np.asarray(old_points, dtype=float)
+        new_points = np.asarray(new_points, dtype=float)
+        pos = old_points.copy()
+        motion = new_points - old_points
+        hit = np.zeros(len(pos), dtype=bool)
+
+        # Rows already overlapping an obstacle: fall back to axis reversion
+        inside = self.is_colliding_many(old_points)
+        if inside.any():
+            rows = np.flatnonzero(inside)
+            self.slide_fallbacks += len(rows)
+            blocked = rows[self.is_colliding_many(new_points[rows])]
+            pos[rows] = new_points[rows]
+            pos[blocked] = self._multi_direction_collision_many(
+                new_points[blocked], old_points[blocked])
+            hit[blocked] = True
+
+        active = np.flatnonzero(~inside)
+        for _ in range(max_contacts):
+            if not active.size:
+                break
+            toi, normal, _ = self.sweep_many(pos[active], pos[active] + motion[active])
+            contact = np.isfinite(toi)
+
+            free = active[~contact]
+            pos[free] = pos[free] + motion[free]
+
+            active, toi, normal = active[contact], toi[contact][:, None], normal[contact]
+            hit[active] = True
+            pos[active] = pos[active] + motion[active] * toi + normal * skin
+            motion[active] = motion[active] * (1.0 - toi) * (normal == 0.0)
+        return pos, hit
\ No newline at end of file
@@ -0,0 +1,530 @@
+import os
+from dataclasses import dataclass
+from multiprocessing import get_context
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from simulator import Simulator2D
+from sensors import PositionSensor
+from planner import Planner2D
+from filters import Kalman2D, ParticleFilter2D
+from boundaries import BoundaryConstraints, ObstacleConstraints
+from navigation import NavigationMap
+from sdf import DistanceMap
+from montecarlo import MonteCarlo2D, MonteCarloResult
+from noise import NoiseSource, make_generator
+from qmc import SobolSequence
+from stats import StepStats
+from profiling import StageProfiler
+
+
+@dataclass(frozen=True)
+class SimulationConfig:
+    """Everything that defines a Monte Carlo campaign, apart from its size."""
+    sensor_noise_std: float = 0.5
+    motion_noise_std: float = 0.1
+    max_speed: float = 2
+    dt: float = 1.0
+    mu: float = 40.0
+    sigma: float = 2.0
+    radius: float = 0.5
+    goal_tolerance: float = 1.0
+    max_steps: int = 500
+    # (x_min, x_max, y_min, y_max); None disables the constraint
+    boundary: tuple = (-100, 10, -100, 10)
+    obstacles: tuple = ((-50, -30, -50, -30), (-20, -10, -20, 10))
+    kf_steady_state: bool = False
+    # State estimator: 'kalman' (Kalman2D) or 'particle' (ParticleFilter2D)
+    estimator: str = 'kalman'
+    # Particle count bounds of the particle filter (KLD-sampling in between)
+    pf_min_particles: int = 100
+    pf_max_particles: int = 2000
+    seed: int = 0
+    # Bit generator of the per-run streams (see noise.BIT_GENERATORS)
+    bit_generator: str = 'pcg64'
+    # Start / goal sampling: 'random' (each run's scenario stream) or
+    # 'sobol' (scrambled Sobol points, the scramble seeded by seed)
+    scenarios: str = 'random'
+    # Runs 2k and 2k + 1 share their streams, the second one with negated
+    # sensor and motion noise and a mirrored start / goal (antithetic pairs)
+    antithetic: bool = False
+    # Steer along a goal distance field instead of straight at the goal
+    navigation: bool = False
+    # Skip exact collision checks of moves the signed distance field clears
+    distance_map: bool = False
+    # Slow down below this clearance (uses the distance field); None disables
+    slow_clearance: float = None
+
+    def build_constraints(self):
+        """Return fresh (BoundaryConstraints, ObstacleConstraints) for a run."""
+        boundary_constraints = None
+        if self.boundary is not None:
+            x_min, x_max, y_min, y_max = self.boundary
+            boundary_constraints = BoundaryConstraints(
+                self.radius,
+                self.max_speed,
+                self.dt,
+                x_min=x_min,
+                x_max=x_max,
+                y_min=y_min,
+                y_max=y_max
+            )
+
+        obstacle_constraints = None
+        if self.obstacles:
+            obstacle_constraints = ObstacleConstraints(self.max_speed, self.dt, self.radius)
+            for x_min, x_max, y_min, y_max in self.obstacles:
+                obstacle_constraints.add_obstacle(x_min=x_min, x_max=x_max, y_min=y_min, y_max=y_max)
+
+        return boundary_constraints, obstacle_constraints
+
+    def build_estimator(self, start, dt, boundary_constraints=None, obstacle_constraints=None,
+                        rng=None):
+        """
+        State estimator of a run from start: Kalman2D, or ParticleFilter2D
+        (which draws from rng and rejects particles with the constraints).
+        """
+        if self.estimator == 'kalman':
+            return Kalman2D(
+                start,
+                self.motion_noise_std ** 2,
+                self.sensor_noise_std ** 2,
+                dt,
+                steady_state=self.kf_steady_state
+            )
+        if self.estimator == 'particle':
+            return ParticleFilter2D(
+                start,
+                self.motion_noise_std ** 2,
+                self.sensor_noise_std ** 2,
+                dt,
+                boundary_constraints=boundary_constraints,
+                obstacle_constraints=obstacle_constraints,
+                rng=rng,
+                min_particles=self.pf_min_particles,
+                max_particles=self.pf_max_particles
+            )
+        raise ValueError(f"Unknown estimator {self.estimator!r}, expected 'kalman' or 'particle'")
+
+    def build_navigation(self, boundary_constraints, obstacle_constraints, distance_map=None):
+        """
+        NavigationMap for the planner, or None if navigation is off. A
+        distance_map of the same world only speeds up building it.
+        """
+        if not self.navigation or boundary_constraints is None:
+            return None
+        return NavigationMap(boundary_constraints, obstacle_constraints, distance_map=distance_map)
+
+    def build_distance_map(self, boundary_constraints, obstacle_constraints):
+        """DistanceMap for the simulator / planner, or None if unused."""
+        if boundary_constraints is None or not (self.distance_map or self.slow_clearance is not None):
+            return None
+        return DistanceMap(boundary_constraints, obstacle_constraints)
+
+
+def run_generators(seed, run_index, bit_generator='pcg64'):
+    """
+    Independent (scenario, sensor, motion) generators for one run.
+
+    Run i uses the i-th child of SeedSequence(seed), so its streams don't
+    depend on how runs are distributed over workers.
+    """
+    run_seq = np.random.SeedSequence(seed, spawn_key=(run_index,))
+    return tuple(make_generator(s, bit_generator) for s in run_seq.spawn(3))
+
+
+def filter_generator(seed, run_index, bit_generator='pcg64'):
+    """
+    Generator of run i's particle filter: the 4th child of its SeedSequence,
+    so the streams of run_generators() are unchanged.
+    """
+    return make_generator(np.random.SeedSequence(seed, spawn_key=(run_index, 3)), bit_generator)
+
+
+# Integer start / goal ranges [low, high) of the scenarios
+START_LOW, START_HIGH = (-100, 1), (101, 101)
+GOAL_LOW, GOAL_HIGH = (-100, -100), (101, 101)
+
+
+def sample_start_goal(rng):
+    """Draw a random start and goal, as main.py does with random.randint."""
+    start = rng.integers(low=START_LOW, high=START_HIGH)
+    goal = rng.integers(low=GOAL_LOW, high=GOAL_HIGH)
+    return start, goal
+
+
+# Scrambled Sobol sequences of the scenarios, per seed
+_SCENARIO_SEQUENCES = {}
+
+# Extra entropy word of the Sobol scramble, so it is independent of the
+# per-run streams of the same seed
+_SOBOL_STREAM = 0x50B01
+
+
+def sobol_start_goal(seed, indices):
+    """
+    Starts and goals of the scenario points with these indices: the
+    (x_start, y_start, x_goal, y_goal) coordinates of a 4-d scrambled Sobol
+    sequence, mapped onto the integer ranges of sample_start_goal().
+
+    Returns:
+        starts, goals: (n, 2) integer arrays
+    """
+    sequence = _SCENARIO_SEQUENCES.get(seed)
+    if sequence is None:
+        sequence = _SCENARIO_SEQUENCES[seed] = SobolSequence(
+            4, seed=np.random.SeedSequence([seed, _SOBOL_STREAM]))
+    u = sequence.points(indices)
+    low = np.array(START_LOW + GOAL_LOW)
+    high = np.array(START_HIGH + GOAL_HIGH)
+    values = low + np.floor(u * (high - low)).astype(np.int64)
+    return values[:, :2], values[:, 2:]
+
+
+def stream_index(config, run_index):
+    """Index of the streams run_index draws from (antithetic pairs share theirs)."""
+    return run_index // 2 if config.antithetic else run_index
+
+
+def run_start_goal(config, run_index, scenario_rng):
+    """
+    Start and goal of run_index; scenario_rng is the scenario generator of
+    its streams (run_generators(seed, stream_index(config, run_index))).
+    """
+    if config.scenarios == 'random':
+        start, goal = sample_start_goal(scenario_rng)
+    elif config.scenarios == 'sobol':
+        starts, goals = sobol_start_goal(config.seed, [stream_index(config, run_index)])
+        start, goal = starts[0], goals[0]
+    else:
+        raise ValueError(f"Unknown scenario sampling {config.scenarios!r}, expected 'random' or 'sobol'")
+    if config.antithetic and run_index % 2 == 1:
+        # Mirror image of the pair's scenario within the sampling ranges
+        start = np.add(START_LOW, START_HIGH) - 1 - start
+        goal = np.add(GOAL_LOW, GOAL_HIGH) - 1 - goal
+    return start, goal
+
+
+def run_scenarios(config, n_runs):
+    """(n_runs, 2) starts and goals of runs 0..n_runs-1, from their scenario streams."""
+    starts = np.empty((n_runs, 2))
+    goals = np.empty((n_runs, 2))
+    for run in range(n_runs):
+        scenario_rng = run_generators(config.seed, stream_index(config, run), config.bit_generator)[0]
+        starts[run], goals[run] = run_start_goal(config, run, scenario_rng)
+    return starts, goals
+
+
+def simulate_run(config, run_index, boundary_constraints=None, obstacle_constraints=None,
+                 navigation=None, distance_map=None, profiler=None):
+    """
+    Run one Monte Carlo run of the sense -> filter -> plan -> act loop.
+
+    profiler: optional profiling.StageProfiler; times every stage of the
+    loop (and the parts of Simulator2D.step) and counts collision events
+
+    Returns:
+        errors: (steps, 3) measured / KF / predicted position errors
+        collisions: collision count of the run
+        reached: True if the goal was reached before max_steps
+    """
+    if boundary_constraints is None and obstacle_constraints is None:
+        boundary_constraints, obstacle_constraints = config.build_constraints()
+    if distance_map is None:
+        distance_map = config.build_distance_map(boundary_constraints, obstacle_constraints)
+    if navigation is None:
+        navigation = config.build_navigation(boundary_constraints, obstacle_constraints, distance_map)
+
+    streams = stream_index(config, run_index)
+    scenario_rng, sensor_rng, motion_rng = run_generators(
+        config.seed, streams, config.bit_generator)
+    start, goal = run_start_goal(config, run_index, scenario_rng)
+
+    # One block of noise covers a whole run: (max_steps + 1, 2) draws
+    block_size = 2 * (config.max_steps + 1)
+    negate = config.antithetic and run_index % 2 == 1
+    sensor_noise = NoiseSource(sensor_rng, block_size=block_size, negate=negate)
+    motion_noise = NoiseSource(motion_rng, block_size=block_size, negate=negate)
+
+    sim = Simulator2D(
+        start,
+        goal,
+        config.dt,
+        config.motion_noise_std,
+        config.max_speed,
+        boundary_constraints=boundary_constraints,
+        obstacle_constraints=obstacle_constraints,
+        rng=motion_noise,
+        log_path=False,
+        distance_map=distance_map if config.distance_map else None,
+        profiler=profiler
+    )
+    sensor = PositionSensor(config.sensor_noise_std, start, rng=sensor_noise, log_path=False)
+    planner = Planner2D(goal, config.max_speed, config.dt, config.mu, config.sigma,
+                        navigation=navigation,
+                        distance_map=distance_map if config.slow_clearance is not None else None,
+                        slow_clearance=config.slow_clearance)
+    kf = config.build_estimator(start, config.dt, boundary_constraints, obstacle_constraints,
+                                rng=filter_generator(config.seed, streams, config.bit_generator))
+
+    vel = planner.velocity_vector(start)
+    errors = np.empty((config.max_steps + 1, 3))
+    steps = 0
+    reached = False
+    while True:
+        if profiler is not None:
+            profiler.start()
+        measured_pos = sensor.sense_position(sim.pos)
+        if profiler is not None:
+            profiler.lap('sense')
+        kf_pos, pred_pos, _ = kf.update(measured_pos, vel, config.dt)
+        if profiler is not None:
+            profiler.lap('filter')
+        vel = planner.velocity_vector(kf_pos)
+        if profiler is not None:
+            profiler.lap('plan')
+        vel_noisy = sim.add_motion_noise(vel)
+        pos, _ = sim.step(vel_noisy)
+        if profiler is not None:
+            profiler.lap('act')
+
+        errors[steps, 0] = np.linalg.norm(measured_pos - pos)
+        errors[steps, 1] = np.linalg.norm(kf_pos - pos)
+        errors[steps, 2] = np.linalg.norm(pred_pos - pos)
+        steps += 1
+        if profiler is not None:
+            profiler.lap('log')
+
+        if steps > config.max_steps:
+            break
+        if sim.distance_to_goal(pred_pos) <= config.goal_tolerance:
+            reached = True
+            break
+
+    if profiler is not None:
+        profiler.count('runs')
+        profiler.count('goals_reached', reached)
+    return errors[:steps], sim.get_collision_count(), reached
+
+
+# ============================================================
+# SHARED-MEMORY RESULT BUFFERS
+# ============================================================
+
+def _result_layout(n_runs, max_steps, keep_histories=True):
+    layout = {
+        'steps': ((n_runs,), np.int64),
+        'collisions': ((n_runs,), np.int64),
+        'reached': ((n_runs,), np.bool_),
+    }
+    if keep_histories:
+        layout['errors'] = ((3, n_runs, max_steps + 1), np.float64)
+    return layout
+
+
+def _attach(names, layout):
+    """Map the named shared-memory blocks as arrays."""
+    blocks, arrays = [], {}
+    for key, (shape, dtype) in layout.items():
+        shm = shared_memory.SharedMemory(name=names[key])
+        blocks.append(shm)
+        arrays[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    return blocks, arrays
+
+
+_worker_state = {}
+
+
+def _init_worker(names, layout):
+    # Workers share the parent's resource tracker, so attaching here does not
+    # change who unlinks the blocks: the parent does, in run_campaign().
+    blocks, arrays = _attach(names, layout)
+    _worker_state['blocks'] = blocks
+    _worker_state['arrays'] = arrays
+
+
+def _run_shard(config, first, last, arrays=None, profile=False, offset=0):
+    """
+    Simulate runs [first, last), write them into rows run - offset of the
+    result arrays and return the shard's StepStats and StageProfiler
+    (None unless profile).
+    """
+    if arrays is None:
+        arrays = _worker_state['arrays']
+    boundary_constraints, obstacle_constraints = config.build_constraints()
+    distance_map = config.build_distance_map(boundary_constraints, obstacle_constraints)
+    navigation = config.build_navigation(boundary_constraints, obstacle_constraints, distance_map)
+    stats = StepStats()
+    profiler = StageProfiler() if profile else None
+    for run in range(first, last):
+        errors, collisions, reached = simulate_run(
+            config, run, boundary_constraints, obstacle_constraints, navigation, distance_map,
+            profiler)
+        n = len(errors)
+        stats.add_run(errors)
+        row = run - offset
+        if 'errors' in arrays:
+            arrays['errors'][:, row, :n] = errors.T
+        arrays['steps'][row] = n
+        arrays['collisions'][row] = collisions
+        arrays['reached'][row] = reached
+    return stats, profiler
+
+
+def run_campaign(config, n_runs, workers=None, chunk_size=16, keep_histories=False, profile=False,
+                 first_run=0):
+    """
+    Run n_runs Monte Carlo runs of config, sharded across a process pool.
+
+    Every run draws from its own SeedSequence-spawned generators, and
+    workers write their results straight into shared memory, so the
+    result is bit-identical for any number of workers.
+
+    Args:
+        config: SimulationConfig
+        n_runs: number of runs
+        workers: pool size (default: os.cpu_count()); 1 runs in-process
+        chunk_size: runs per task; shard boundaries don't depend on workers,
+            so the merged statistics are bit-identical too
+        keep_histories: keep the full (runs x steps) error histories; if
+            False only the streaming StepStats is returned, in memory
+            independent of n_runs
+        profile: time the loop stages of every run; the StageProfilers of
+            all shards are merged into result.profile
+        first_run: index of the first run, e.g. to extend an earlier
+            campaign of first_run runs with runs first_run..first_run+n_runs-1
+
+    Returns:
+        MonteCarloResult
+    """
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, n_runs))
+    layout = _result_layout(n_runs, config.max_steps, keep_histories)
+    end = first_run + n_runs
+    shards = [(config, first, min(first + chunk_size, end), None, profile, first_run)
+              for first in range(first_run, end, chunk_size)]
+
+    if workers == 1:
+        arrays = {key: np.zeros(shape, dtype=dtype) for key, (shape, dtype) in layout.items()}
+        shard_results = [_run_shard(*shard[:3], arrays=arrays, profile=profile, offset=first_run)
+                         for shard in shards]
+        return _to_result(arrays, shard_results)
+
+    # Fresh shared memory is zero-filled, like the in-process arrays
+    blocks = {}
+    try:
+        for key, (shape, dtype) in layout.items():
+            nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            blocks[key] = shared_memory.SharedMemory(create=True, size=nbytes)
+        names = {key: shm.name for key, shm in blocks.items()}
+
+        with get_context().Pool(workers, initializer=_init_worker,
+                                initargs=(names, layout)) as pool:
+            shard_results = pool.starmap(_run_shard, shards)
+
+        return _to_result({
+            key: np.ndarray(shape, dtype=dtype, buffer=blocks[key].buf).copy()
+            for key, (shape, dtype) in layout.items()
+        }, shard_results)
+    finally:
+        for shm in blocks.values():
+            shm.close()
+            shm.unlink()
+
+
+def _to_result(arrays, shard_results):
+    stats = StepStats()
+    profile = None
+    for shard_stats, shard_profile in shard_results:
+        stats.merge(shard_stats)
+        if shard_profile is not None:
+            profile = (profile or StageProfiler()).merge(shard_profile)
+    errors = arrays.get('errors', (None, None, None))
+    return MonteCarloResult(
+        errors[0],
+        errors[1],
+        errors[2],
+        arrays['steps'],
+        arrays['collisions'],
+        arrays['reached'],
+        stats=stats,
+        profile=profile
+    )
+
+
+# ============================================================
+# LIBRARY ENTRY POINT
+# ============================================================
+
+def run_batch(config, n_runs, recorder=None, profiler=None, keep_histories=False):
+    """
+    Run n_runs runs of config in this process, in lockstep (MonteCarlo2D).
+
+    Runs start and end at the same points as in run_campaign, but their
+    sensor and motion noise come from one stream shared by all runs, so
+    individual runs differ from run_campaign's while the statistics agree.
+    """
+    if config.kf_steady_state:
+        raise ValueError("The batch engine has no steady-state filter, use vectorized=False")
+    if config.estimator != 'kalman':
+        raise ValueError("The batch engine only runs the Kalman filter, use vectorized=False")
+    if config.antithetic:
+        raise ValueError("The batch engine shares one noise stream between runs and can't pair "
+                         "them antithetically, use vectorized=False")
+    boundary_constraints, obstacle_constraints = config.build_constraints()
+    distance_map = config.build_distance_map(boundary_constraints, obstacle_constraints)
+    navigation = config.build_navigation(boundary_constraints, obstacle_constraints, distance_map)
+    starts, goals = run_scenarios(config, n_runs)
+
+    engine = MonteCarlo2D(
+        starts,
+        goals,
+        config.dt,
+        config.sensor_noise_std,
+        config.motion_noise_std,
+        config.max_speed,
+        boundary_constraints=boundary_constraints,
+        obstacle_constraints=obstacle_constraints,
+        goal_tolerance=config.goal_tolerance,
+        max_steps=config.max_steps,
+        rng=make_generator(np.random.SeedSequence(config.seed), config.bit_generator),
+        navigation=navigation,
+        distance_map=distance_map,
+        slow_clearance=config.slow_clearance,
+        profiler=profiler,
+        sdf_collisions=config.distance_map
+    )
+    return engine.run(recorder=recorder, keep_histories=keep_histories)
+
+
+def run_monte_carlo(config=None, n_runs=500, vectorized=True, workers=None,
+                    keep_histories=False, recorder=None, profile=False, cache=None):
+    """
+    Run a Monte Carlo campaign of config and return its results.
+
+    Args:
+        config: SimulationConfig (default: SimulationConfig())
+        n_runs: number of runs
+        vectorized: advance all runs in lockstep in this process
+            (run_batch); otherwise run them one by one over a process
+            pool (run_campaign), bit-identical for any number of workers
+        workers: pool size of the non-vectorized engine
+        keep_histories: see run_campaign
+        recorder: optional TrajectoryRecorder (vectorized engine only)
+        profile: attach a StageProfiler of the loop stages as result.profile
+        cache: optional resultcache.ResultCache; reuses (and extends) stored
+            campaigns of the same config. Not used when recording or profiling
+
+    Returns:
+        MonteCarloResult; result.summary() gives its scalar metrics
+    """
+    config = config if config is not None else SimulationConfig()
+    if cache is not None and recorder is None and not profile:
+        return cache.run(config, n_runs, vectorized, workers, keep_histories)
+    if vectorized:
+        return run_batch(config, n_runs, recorder, StageProfiler() if profile else None,
+                         keep_histories=keep_histories)
+    if recorder is not None:
+        raise ValueError("Recording needs the vectorized engine")
+    return run_campaign(config, n_runs, workers, keep_histories=keep_histories, profile=profile)
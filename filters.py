@@ -1,3 +1,5 @@
+import math
+
 import numpy as np
 
 class Kalman:
@@ -33,43 +35,165 @@ class Kalman:
 
         return self.kf_pos,pred_pos,K
     
-class Kalman2D:
-    def __init__(self, start, process_var, meas_var, dt):
-        # State: [x, y, vx, vy]
-        self.x = np.array([start[0], start[1], 0.0, 0.0])
-        
-        # Covariance matrix (4x4)
-        self.P = np.eye(4) * 1.0
-        
+# Model matrices and steady-state solutions shared by every Kalman2D with the
+# same (dt, process_var, meas_var), so Monte Carlo runs don't rebuild them.
+# Jittered timesteps give ever new keys, so both are bounded LRU caches.
+_MODEL_CACHE = {}
+_STEADY_STATE_CACHE = {}
+_MODEL_CACHE_SIZE = 256
+
+
+def _cache_get(cache, key):
+    """cache[key] (or None), marked as most recently used."""
+    value = cache.pop(key, None)
+    if value is not None:
+        cache[key] = value
+    return value
+
+
+def _cache_put(cache, key, value):
+    """Store value under key, evicting the least recently used entry when full."""
+    if len(cache) >= _MODEL_CACHE_SIZE:
+        del cache[next(iter(cache))]
+    cache[key] = value
+    return value
+
+
+def kalman2d_model(dt, process_var, meas_var):
+    """
+    Return the shared, read-only (F, H, Q, R) matrices of the constant
+    velocity model for the given timestep and noise variances.
+    """
+    key = (float(dt), float(process_var), float(meas_var))
+    model = _cache_get(_MODEL_CACHE, key)
+    if model is None:
         # State transition matrix
-        self.F = np.array([
+        F = np.array([
             [1, 0, dt, 0],
             [0, 1, 0, dt],
             [0, 0, 1, 0],
             [0, 0, 0, 1]
-        ])
-        
+        ], dtype=float)
+
         # Measurement matrix (we measure position only)
-        self.H = np.array([
+        H = np.array([
             [1, 0, 0, 0],
             [0, 1, 0, 0]
-        ])
-        
+        ], dtype=float)
+
         # Process noise covariance
         q = process_var
-        self.Q = np.array([
+        Q = np.array([
             [dt**4/4*q, 0, dt**3/2*q, 0],
             [0, dt**4/4*q, 0, dt**3/2*q],
             [dt**3/2*q, 0, dt**2*q, 0],
             [0, dt**3/2*q, 0, dt**2*q]
-        ])
-        
+        ], dtype=float)
+
         # Measurement noise covariance
-        self.R = np.eye(2) * meas_var
+        R = np.eye(2) * meas_var
+
+        for m in (F, H, Q, R):
+            m.setflags(write=False)
+        model = _cache_put(_MODEL_CACHE, key, (F, H, Q, R))
+    return model
+
+
+def steady_state_gain(dt, process_var, meas_var, tol=1e-12, max_iter=100000):
+    """
+    Solve the discrete Riccati equation of the Kalman2D model by iterating
+    the covariance recursion to its fixed point. Cached per (dt, q, r).
+
+    Returns:
+        K: steady-state Kalman gain (4x2)
+        P: steady-state a-posteriori covariance (4x4)
+    """
+    key = (float(dt), float(process_var), float(meas_var))
+    solution = _cache_get(_STEADY_STATE_CACHE, key)
+    if solution is not None:
+        return solution
+
+    F, H, Q, R = kalman2d_model(dt, process_var, meas_var)
+    P = np.eye(4)
+    for _ in range(max_iter):
+        P_pred = F @ P @ F.T + Q
+        S = H @ P_pred @ H.T + R
+        K = P_pred @ H.T @ np.linalg.inv(S)
+        P_next = (np.eye(4) - K @ H) @ P_pred
+        converged = np.abs(P_next - P).max() <= tol * max(1.0, np.abs(P).max())
+        P = P_next
+        if converged:
+            break
+    else:
+        raise RuntimeError("Riccati iteration did not converge")
+
+    K.setflags(write=False)
+    P.setflags(write=False)
+    solution = _cache_put(_STEADY_STATE_CACHE, key, (K, P))
+    return solution
+
+
+class Kalman2D:
+    def __init__(self, start, process_var, meas_var, dt, steady_state=False,
+                 switch_tol=None):
+        """
+        steady_state : use the precomputed steady-state gain instead of
+                       propagating the covariance on every update
+        switch_tol   : with steady_state, run the exact filter until P is
+                       within switch_tol of its steady-state value, then
+                       switch to the fixed gain (None: fixed gain from start)
+        """
+        # State: [x, y, vx, vy]
+        self.x = np.array([start[0], start[1], 0.0, 0.0])
+        
+        # Covariance matrix (4x4)
+        self.P = np.eye(4) * 1.0
+        
+        # Shared model matrices: F, H, Q, R
+        self.F, self.H, self.Q, self.R = kalman2d_model(dt, process_var, meas_var)
+        self._process_var = float(process_var)
+        self._meas_var = float(meas_var)
+        # (F, Q) per distinct predict() timestep, bounded like _MODEL_CACHE
+        self._models = {float(dt): (self.F, self.Q)}
+
+        # Steady-state (fixed-gain) mode
+        self.fixed_gain = False
+        self.switch_tol = switch_tol
+        self.K_ss = None
+        self.P_ss = None
+        self._dt = float(dt)
+        if steady_state:
+            self.K_ss, self.P_ss = steady_state_gain(dt, process_var, meas_var)
+            self._k_pos = self.K_ss[0, 0]
+            self._k_vel = self.K_ss[2, 0]
+            if switch_tol is None:
+                self.fixed_gain = True
+                self.P = self.P_ss.copy()
+
+        # Constants and scratch buffers for update_fast()
+        self._r = float(meas_var)
+        self._q_pp = float(self.Q[0, 0])
+        self._q_pv = float(self.Q[0, 2])
+        self._q_vv = float(self.Q[2, 2])
+        self._x = np.empty(4)
+        self._x_pred = np.empty(4)
+        self._P = np.zeros((4, 4))
+        self._K = np.zeros((4, 2))
+        self._pos_view = self._x[:2]
+        self._pred_view = self._x_pred[:2]
+        self._cov = None
+        self._cov_ss = None
+        if self.P_ss is not None:
+            self._cov_ss = (
+                (float(self.P_ss[0, 0]), float(self.P_ss[0, 2]), float(self.P_ss[2, 2])),
+                (float(self.P_ss[1, 1]), float(self.P_ss[1, 3]), float(self.P_ss[3, 3]))
+            )
         
     def update(self, measured_pos, control_velocity, dt):
         # Optional: add control input (if you trust motor commands)
         # For now, we let the filter estimate velocity itself
+        if self.fixed_gain:
+            return self._fixed_gain_update(measured_pos)
         
         # ========== PREDICTION ==========
         # Predict state
@@ -95,6 +219,498 @@ class Kalman2D:
         # Update covariance
         I = np.eye(4)
         self.P = (I - K @ self.H) @ P_pred
+
+        # Switch to the fixed gain once P has converged
+        if self.P_ss is not None and np.abs(self.P - self.P_ss).max() <= self.switch_tol:
+            self.fixed_gain = True
+            self.P = self.P_ss.copy()
         
         # Return position estimate
-        return self.x[:2], x_pred[:2], K
\ No newline at end of file
+        return self.x[:2], x_pred[:2], K
+
+    def predict(self, dt=None):
+        """
+        Time update only: propagate x and P by dt (default: the filter's dt).
+
+        F and Q are cached per distinct dt, so a loop running predict() at
+        a few fixed rates builds each model once. predict() / correct()
+        always run the full covariance filter (the steady-state gain only
+        holds for the fixed dt of update()).
+
+        Returns:
+            predicted position (view of the state)
+        """
+        dt = self._dt if dt is None else dt
+        model = _cache_get(self._models, dt)
+        if model is None:
+            F, _, Q, _ = kalman2d_model(dt, self._process_var, self._meas_var)
+            model = _cache_put(self._models, dt, (F, Q))
+        F, Q = model
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + Q
+        return self.x[:2]
+
+    def correct(self, measured_pos):
+        """
+        Measurement update only, at the time the state was last predicted to.
+
+        Returns:
+            kf_pos: corrected position estimate
+            pred_pos: position before the correction
+            K: Kalman gain (4x2 matrix)
+        """
+        x_pred = self.x
+        P_pred = self.P
+
+        # Innovation and its covariance
+        y = measured_pos - x_pred[:2]
+        S = self.H @ P_pred @ self.H.T + self.R
+        K = P_pred @ self.H.T @ np.linalg.inv(S)
+
+        self.x = x_pred + K @ y
+        self.P = (np.eye(4) - K @ self.H) @ P_pred
+        return self.x[:2], x_pred[:2], K
+
+    def update_fast(self, measured_pos, control_velocity=None, dt=None):
+        """
+        Low-latency equivalent of update() that allocates no arrays.
+
+        F, Q, H and R never couple the x and y axes, so with the diagonal
+        initial P the covariance is two independent 2x2 (position, velocity)
+        blocks. Each block is propagated with scalar arithmetic, S^-1 is a
+        scalar reciprocal, and P is updated in Joseph form to stay symmetric
+        positive definite. Results are written into preallocated buffers:
+        the returned arrays are views that the next call overwrites.
+        """
+        if self.x is not self._x:
+            self._load_fast_state()
+        x = self._x
+        x_pred = self._x_pred
+        K = self._K
+        dt = self._dt
+        r = self._r
+        cov = self._cov
+
+        for axis in (0, 1):
+            # ========== PREDICTION ==========
+            pos = x[axis]
+            vel = x[axis + 2]
+            pos_pred = pos + dt * vel
+            x_pred[axis] = pos_pred
+            x_pred[axis + 2] = vel
+            innov = measured_pos[axis] - pos_pred
+
+            if self.fixed_gain:
+                k_pos = self._k_pos
+                k_vel = self._k_vel
+            else:
+                p_pp, p_pv, p_vv = cov[axis]
+                p_pp = p_pp + 2.0 * dt * p_pv + dt * dt * p_vv + self._q_pp
+                p_pv = p_pv + dt * p_vv + self._q_pv
+                p_vv = p_vv + self._q_vv
+
+                # ========== UPDATE ==========
+                s_inv = 1.0 / (p_pp + r)
+                k_pos = p_pp * s_inv
+                k_vel = p_pv * s_inv
+
+                # Joseph form: (I - KH) P (I - KH)^T + K R K^T
+                one_minus_k = 1.0 - k_pos
+                cov[axis] = (
+                    one_minus_k * one_minus_k * p_pp + r * k_pos * k_pos,
+                    one_minus_k * (p_pv - k_vel * p_pp) + r * k_pos * k_vel,
+                    k_vel * k_vel * (p_pp + r) - 2.0 * k_vel * p_pv + p_vv
+                )
+
+            x[axis] = pos_pred + k_pos * innov
+            x[axis + 2] = vel + k_vel * innov
+            K[axis, axis] = k_pos
+            K[axis + 2, axis] = k_vel
+
+        if not self.fixed_gain:
+            # Switch to the fixed gain once P has converged, snapping P to P_ss
+            if self._cov_ss is not None and self._cov_converged():
+                self.fixed_gain = True
+                self._cov = list(self._cov_ss)
+                self._P[:] = self.P_ss
+                self.P = self._P
+            else:
+                self._store_fast_covariance()
+
+        return self._pos_view, self._pred_view, K
+
+    def _load_fast_state(self):
+        """Adopt the current x and P into the update_fast() buffers."""
+        self._x[:] = self.x
+        self.x = self._x
+        P = self.P
+        self._cov = [
+            (float(P[0, 0]), float(P[0, 2]), float(P[2, 2])),
+            (float(P[1, 1]), float(P[1, 3]), float(P[3, 3]))
+        ]
+        self._store_fast_covariance()
+
+    def _store_fast_covariance(self):
+        P = self._P
+        for axis in (0, 1):
+            p_pp, p_pv, p_vv = self._cov[axis]
+            P[axis, axis] = p_pp
+            P[axis, axis + 2] = p_pv
+            P[axis + 2, axis] = p_pv
+            P[axis + 2, axis + 2] = p_vv
+        self.P = P
+
+    def _cov_converged(self):
+        for axis in (0, 1):
+            for value, target in zip(self._cov[axis], self._cov_ss[axis]):
+                if abs(value - target) > self.switch_tol:
+                    return False
+        return True
+
+    def _fixed_gain_update(self, measured_pos):
+        """
+        Steady-state update: the gain is constant and has the block form
+        [[k_pos*I], [k_vel*I]], so each step is a few multiply-adds. Like
+        the exact path, it returns fresh arrays that callers may keep;
+        update_fast() is the variant that reuses its buffers.
+        """
+        x = self.x
+        dt = self._dt
+        x_pred = np.empty(4)
+        x_new = np.empty(4)
+        for axis in (0, 1):
+            pos_pred = x[axis] + dt * x[axis + 2]
+            vel = x[axis + 2]
+            x_pred[axis] = pos_pred
+            x_pred[axis + 2] = vel
+            innov = measured_pos[axis] - pos_pred
+            x_new[axis] = pos_pred + self._k_pos * innov
+            x_new[axis + 2] = vel + self._k_vel * innov
+        self.x = x_new
+        return x_new[:2], x_pred[:2], self.K_ss
+
+
+class BatchKalman2D:
+    """
+    N independent Kalman2D filters sharing the same model, advanced together.
+    States are stored as (N, 4) and covariances as (N, 4, 4).
+
+    The update runs as a handful of stacked matmul/einsum passes into
+    preallocated buffers, and inverts the 2x2 innovation covariance in closed
+    form instead of calling np.linalg.inv.
+    """
+
+    def __init__(self, starts, process_var, meas_var, dt):
+        starts = np.asarray(starts, dtype=float)
+        n = len(starts)
+
+        # State: [x, y, vx, vy] per filter
+        self.x = np.zeros((n, 4))
+        self.x[:, :2] = starts
+
+        # Covariance matrices (N x 4 x 4)
+        self.P = np.tile(np.eye(4), (n, 1, 1))
+
+        # Shared model, identical to Kalman2D
+        self.F, self.H, self.Q, self.R = kalman2d_model(dt, process_var, meas_var)
+        self.FT = np.ascontiguousarray(self.F.T)
+
+        # Scratch buffers, sized for all N filters; subsets use leading views
+        self._x = np.empty((n, 4))
+        self._x_pred = np.empty((n, 4))
+        self._P = np.empty((n, 4, 4))
+        self._FP = np.empty((n, 4, 4))
+        self._P_pred = np.empty((n, 4, 4))
+        self._KHP = np.empty((n, 4, 4))
+        self._S = np.empty((n, 2, 2))
+        self._S_inv = np.empty((n, 2, 2))
+        self._K = np.empty((n, 4, 2))
+        self._y = np.empty((n, 2))
+        self._x_new = np.empty((n, 4))
+        self._det = np.empty(n)
+        self._tmp = np.empty(n)
+
+    def update(self, measured_pos, idx=None, mask=None):
+        """
+        measured_pos : (n, 2) GPS positions for the filters selected by idx
+        idx          : indices of the filters to update (default: all);
+                       filters not listed are skipped entirely
+        mask         : optional (n,) bool, False where the sensor reading was
+                       dropped; those filters only run the prediction step
+
+        Returns the (n, 2) position estimates, (n, 2) predictions and
+        (n, 4, 2) Kalman gains of the selected filters. The returned arrays
+        are views into scratch buffers and are overwritten by the next call.
+        """
+        if idx is None:
+            n = len(self.x)
+            x, P = self.x, self.P
+        else:
+            n = len(idx)
+            x = np.take(self.x, idx, axis=0, out=self._x[:n])
+            P = np.take(self.P, idx, axis=0, out=self._P[:n])
+
+        x_pred = self._x_pred[:n]
+        FP = self._FP[:n]
+        P_pred = self._P_pred[:n]
+        KHP = self._KHP[:n]
+        S = self._S[:n]
+        S_inv = self._S_inv[:n]
+        K = self._K[:n]
+        y = self._y[:n]
+        x_new = self._x_new[:n]
+        det = self._det[:n]
+        tmp = self._tmp[:n]
+
+        # ========== PREDICTION ==========
+        np.matmul(x, self.FT, out=x_pred)
+        np.matmul(self.F, P, out=FP)
+        np.matmul(FP, self.FT, out=P_pred)
+        P_pred += self.Q
+
+        # ========== UPDATE ==========
+        # Innovation
+        np.subtract(measured_pos, x_pred[:, :2], out=y)
+
+        # Innovation covariance S = H P_pred H^T + R and its closed-form inverse
+        np.add(P_pred[:, :2, :2], self.R, out=S)
+        np.multiply(S[:, 0, 0], S[:, 1, 1], out=det)
+        np.multiply(S[:, 0, 1], S[:, 1, 0], out=tmp)
+        det -= tmp
+        np.divide(S[:, 1, 1], det, out=S_inv[:, 0, 0])
+        np.divide(S[:, 0, 0], det, out=S_inv[:, 1, 1])
+        np.divide(S[:, 0, 1], det, out=S_inv[:, 0, 1])
+        np.divide(S[:, 1, 0], det, out=S_inv[:, 1, 0])
+        S_inv[:, 0, 1] *= -1.0
+        S_inv[:, 1, 0] *= -1.0
+
+        # Kalman gain K = P_pred H^T S^-1 (N x 4 x 2)
+        np.matmul(P_pred[:, :, :2], S_inv, out=K)
+        if mask is not None:
+            # Dropped readings: zero gain and innovation (the reading may be
+            # NaN), so the update reduces to prediction
+            dropped = ~np.asarray(mask, dtype=bool)
+            K[dropped] = 0.0
+            y[dropped] = 0.0
+
+        # Update state and covariance
+        np.einsum('nij,nj->ni', K, y, out=x_new)
+        x_new += x_pred
+        np.matmul(K, P_pred[:, :2, :], out=KHP)
+        P_pred -= KHP
+
+        if idx is None:
+            self.x[...] = x_new
+            self.P[...] = P_pred
+        else:
+            self.x[idx] = x_new
+            self.P[idx] = P_pred
+
+        return x_new[:, :2], x_pred[:, :2], K
+
+
+# ============================================================
+# PARTICLE FILTER
+# ============================================================
+
+def kld_particle_count(k, epsilon=0.05, z=2.326):
+    """
+    KLD-sampling bound (Fox, 2003): particles needed so that, with
+    probability given by the standard normal quantile z, the KL divergence
+    between the sample-based and the true posterior stays below epsilon,
+    when the posterior covers k histogram bins.
+    """
+    if k < 2:
+        return 1
+    a = 2.0 / (9.0 * (k - 1))
+    return int(math.ceil((k - 1) / (2.0 * epsilon) * (1.0 - a + math.sqrt(a) * z) ** 3))
+
+
+def systematic_resample(weights, n, rng):
+    """
+    Indices of n particles drawn in proportion to weights (normalized) with
+    a single uniform offset: low variance, O(len(weights) + n).
+    """
+    positions = (rng.random() + np.arange(n)) / n
+    cumulative = np.cumsum(weights)
+    cumulative[-1] = 1.0
+    return np.searchsorted(cumulative, positions, side='right')
+
+
+class ParticleFilter2D:
+    """
+    Particle filter that, unlike Kalman2D, uses the commanded velocity and
+    the world's constraints: particles move with the command plus motion
+    noise, are clamped to the boundary as the simulator clamps the vehicle,
+    and particles that end up inside an (inflated) obstacle get zero weight.
+
+    Particles are one (P, 4) array of [x, y, vx, vy] rows; propagation,
+    weighting and resampling are vectorized over it. When a fix lands far
+    from every feasible particle (the vehicle slid along a contact the
+    particles didn't follow), the particles are redrawn around the fix. Every correction
+    resamples systematically, to a number of particles chosen by
+    KLD-sampling from the number of position bins the posterior occupies:
+    few particles while the estimate is tight, more while it is spread out
+    (e.g. when a wall or obstacle cuts the distribution).
+    """
+
+    def __init__(self, start, process_var, meas_var, dt, boundary_constraints=None,
+                 obstacle_constraints=None, rng=None, min_particles=100, max_particles=2000,
+                 bin_size=0.5, kld_epsilon=0.05, kld_z=2.326, reset_gate=16.0):
+        """
+        Args:
+            start: initial position; particles start around it with unit
+                variance in position and velocity, like Kalman2D's P
+            process_var, meas_var, dt: as for Kalman2D
+            boundary_constraints, obstacle_constraints: optional constraints
+                to clamp / reject particles with
+            rng: np.random.Generator (default: a fresh one)
+            min_particles, max_particles: bounds of the particle count
+            bin_size: edge of the position bins counted by KLD-sampling
+            kld_epsilon, kld_z: KLD-sampling error bound and normal quantile
+            reset_gate: squared Mahalanobis distance of the fix to the
+                nearest feasible particle above which the particles are
+                redrawn around the fix
+        """
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.q = float(process_var)
+        self.r = float(meas_var)
+        self.dt = float(dt)
+        self.boundary_constraints = boundary_constraints
+        self.obstacle_constraints = obstacle_constraints
+        self.min_particles = int(min_particles)
+        self.max_particles = int(max_particles)
+        self.bin_size = float(bin_size)
+        self.kld_epsilon = kld_epsilon
+        self.kld_z = kld_z
+
+        self.reset_gate = float(reset_gate)
+
+        n = self.max_particles
+        self.particles = self._particles_around(start, (0.0, 0.0), n, pos_var=1.0, vel_var=1.0)
+        self.weights = np.full(n, 1.0 / n)
+
+        # Estimate: weighted mean of the particles
+        self.x = np.array([start[0], start[1], 0.0, 0.0], dtype=float)
+
+        # Corrections that redrew the particles around the fix
+        self.resets = 0
+
+    @property
+    def n_particles(self):
+        return len(self.particles)
+
+    def _particles_around(self, pos, vel, n, pos_var=None, vel_var=None):
+        """n particles drawn around pos / vel (default variances: meas_var / process_var)."""
+        pos_std = math.sqrt(self.r if pos_var is None else pos_var)
+        vel_std = math.sqrt(self.q if vel_var is None else vel_var)
+        particles = self.rng.standard_normal((n, 4))
+        particles[:, :2] *= pos_std
+        particles[:, 2:] *= vel_std
+        particles[:, :2] += pos
+        particles[:, 2:] += vel
+        return particles
+
+    def update(self, measured_pos, control_velocity, dt):
+        """
+        Predict by dt with the velocity commanded over it, then correct
+        with measured_pos (the interface of Kalman2D.update).
+
+        Returns:
+            est_pos: position estimate after the correction
+            pred_pos: position estimate before it
+            K: equivalent Kalman gain (4x2), see correct()
+        """
+        self.predict(dt, control_velocity)
+        return self.correct(measured_pos)
+
+    def predict(self, dt=None, control_velocity=None):
+        """
+        Propagate every particle by dt (default: the filter's dt).
+
+        With a control_velocity, particles move at the command plus velocity
+        noise of variance process_var, the simulator's motion model. Without
+        one, they keep their velocity up to a random acceleration of
+        variance process_var (the constant velocity model of Kalman2D's Q).
+
+        Returns:
+            predicted position (view of the estimate)
+        """
+        dt = self.dt if dt is None else dt
+        p = self.particles
+        noise = self.rng.standard_normal((len(p), 2)) * math.sqrt(self.q)
+        old_positions = p[:, :2].copy()
+        if control_velocity is not None:
+            p[:, 2:] = control_velocity
+            p[:, 2:] += noise
+            p[:, :2] += p[:, 2:] * dt
+        else:
+            p[:, :2] += p[:, 2:] * dt + noise * (0.5 * dt * dt)
+            p[:, 2:] += noise * dt
+        if self.boundary_constraints is not None:
+            p[:, :2] = self.boundary_constraints.corrected_boundary_violated_many(
+                p[:, :2], old_positions)
+        self.x = self.weights @ p
+        return self.x[:2]
+
+    def correct(self, measured_pos):
+        """
+        Weight the particles by the measurement likelihood and the
+        constraints, then resample them (KLD-sampling count).
+
+        Returns:
+            est_pos: corrected position estimate
+            pred_pos: position before the correction
+            K: gain (4x2) of a Kalman filter with the particles' predicted
+               mean and covariance, for comparison with Kalman2D
+        """
+        p = self.particles
+        positions = p[:, :2]
+
+        # Predicted mean and covariance of the weighted particles
+        x_pred = self.weights @ p
+        centered = p - x_pred
+        P_pred = (centered * self.weights[:, None]).T @ centered
+        K = P_pred[:, :2] @ np.linalg.inv(P_pred[:2, :2] + self.r * np.eye(2))
+
+        # Particles the vehicle can't be at: inside an obstacle
+        feasible = np.ones(len(p), dtype=bool)
+        if self.obstacle_constraints is not None:
+            feasible &= ~self.obstacle_constraints.is_colliding_many(positions)
+
+        # Squared Mahalanobis distances of the particles to the fix
+        d = positions - measured_pos
+        d2 = np.einsum('ij,ij->i', d, d) / self.r
+
+        if not feasible.any() or d2[feasible].min() > self.reset_gate:
+            # The fix is far from every feasible particle (the motion model
+            # missed, e.g. at a contact): redraw the particles from the
+            # measurement, keeping the predicted velocity
+            self.resets += 1
+            p = self._particles_around(measured_pos, x_pred[2:], len(p))
+            positions = p[:, :2]
+            w = np.ones(len(p))
+            if self.obstacle_constraints is not None:
+                w[self.obstacle_constraints.is_colliding_many(positions)] = 0.0
+                if not w.any():
+                    w[:] = 1.0
+        else:
+            # Gaussian log-likelihood, shifted so the best particle has weight 1
+            log_w = np.log(self.weights) - 0.5 * d2
+            log_w -= log_w[feasible].max()
+            w = np.where(feasible, np.exp(log_w), 0.0)
+        w /= w.sum()
+
+        # KLD-sampling: size the resampled set by the bins it occupies
+        idx = systematic_resample(w, len(p), self.rng)
+        bins = np.floor(positions[idx] / self.bin_size).astype(np.int64)
+        k = len(np.unique(bins, axis=0))
+        n = min(max(kld_particle_count(k, self.kld_epsilon, self.kld_z), self.min_particles),
+                self.max_particles)
+        if n != len(idx):
+            idx = systematic_resample(w, n, self.rng)
+
+        self.x = w @ p
+        self.particles = p[idx]
+        self.weights = np.full(n, 1.0 / n)
+        return self.x[:2], x_pred[:2], K
@@ -1,30 +1,36 @@
+import argparse
+import dataclasses
+
 from simulator import Simulator2D
 from sensors import PositionSensor
 from planner import Planner2D
 from plots import Plot2D
 from plots import ErrorPlotter
-from filters import Kalman2D
-from boundaries import BoundaryConstraints, ObstacleConstraints
+from stats import StepStats
+from recorder import TrajectoryRecorder, TrajectoryLog
+from batchplots import render_log
+from telemetry import TelemetryPublisher
+from profiling import StageProfiler
+from campaign import SimulationConfig, run_monte_carlo
+from multirate import Rates, run_multirate
+from swarm import run_swarm
+from resultcache import ResultCache
+from adaptive import run_adaptive
+from sweep import parse_sweep, parse_value, expand_sweep, run_sweep, format_table, config_field
+from variance import antithetic_variance_reduction, compare_configs, replicate_variance_reduction
 import numpy as np
-import random
 
 WIDTH, HEIGHT = 100, 100
-GOAL_TOLERANCE = 1.0
-
-sensor_noise_std = 0.5
-max_speed = 2
-dt = 1.0
-mu = 40.0
-sigma = 2.0
-motion_noise_std = 0.1
-plotting_on = 0  # Set to 1 to see the boundaries in action
-radius=0.5
-MAX_STEPS = 500   # safety cap
-
-if plotting_on == 1:
-    N_RUNS = 1      # Monte Carlo runs
-else: 
-    N_RUNS = 500
+
+N_RUNS = 500  # Monte Carlo runs (1 when plotting or streaming telemetry)
+
+# Start / goal of the plotted (or streamed) runs
+VISUAL_START = (0, -10)
+VISUAL_GOAL = (-98, -68)
+
+# main.py's defaults that differ from SimulationConfig's: the signed
+# distance field only skips collision checks, so results are unchanged
+MAIN_DEFAULTS = {'distance_map': True}
 
 def error_computation(pos, measured_pos, kf_pos, pred_pos):
     measured_error = np.linalg.norm(measured_pos - pos)
@@ -32,172 +38,459 @@ def error_computation(pos, measured_pos, kf_pos, pred_pos):
     pred_error = np.linalg.norm(pred_pos - pos)
     return measured_error, kf_error, pred_error
 
-all_meas_errors = []
-all_kf_errors = []
-all_pred_errors = []
-all_collision_counts = []
 
-for run in range(N_RUNS):
-    print(f"Monte Carlo run {run+1}/{N_RUNS}")
+def run_visual(config, start, goal, n_runs=1, plotting_on=True, telemetry=None, recorder=None,
+               profiler=None, plot_blit=True, plot_render_every=1):
+    """
+    Run the sense -> filter -> plan -> act loop one run at a time, with live
+    plotting and / or a telemetry stream, from start to goal.
 
-    if plotting_on == 1:
-        start = [0, -10]
-        goal = [-98, -68]
-    else:
-        start = np.array([random.randint(-100, 100), random.randint(1, 100)])
-        goal = np.array([random.randint(-100, 100), random.randint(-100, 100)])
-
-    print(f"start {start}")
-    print(f"goal {goal}")
+    Returns:
+        error_stats: StepStats of the measured / KF / predicted errors
+        all_collision_counts: collision count of every run
+    """
+    # Streaming per-timestep error statistics (measured / KF / predicted)
+    error_stats = StepStats()
+    all_collision_counts = []
 
     # ============================================================
     # BOUNDARY CONFIGURATION
     # ============================================================
-    # Define boundary limits
-    boundary_constraints = BoundaryConstraints(
-        radius,
-        max_speed,
-        dt,
-        x_min=-100, 
-        x_max=10, 
-        y_min=-100, 
-        y_max=10
-    )
-
-    # Optional: Add obstacles
-    obstacle_constraints = ObstacleConstraints(max_speed,dt,radius)
-    # Uncomment to add obstacles:
-    obstacle_constraints.add_obstacle(x_min=-50, x_max=-30, y_min=-50, y_max=-30)
-    obstacle_constraints.add_obstacle(x_min=-20, x_max=-10, y_min=-20, y_max=10)
-
-    # To disable boundaries, set boundary_constraints=None
-    # To disable obstacles, set obstacle_constraints=None
+    # To disable boundaries / obstacles, pass --no-boundary / --no-obstacles
+    boundary_constraints, obstacle_constraints = config.build_constraints()
+
+    # Planning / collision maps; the world is the same in every run, so they
+    # are built once and reused
+    distance_map = config.build_distance_map(boundary_constraints, obstacle_constraints)
+    navigation = config.build_navigation(boundary_constraints, obstacle_constraints, distance_map)
     # ============================================================
 
-    sim = Simulator2D(
-        start,
-        goal,
-        dt,
-        motion_noise_std,
-        max_speed,
-        boundary_constraints=boundary_constraints,
-        obstacle_constraints=obstacle_constraints
-    )
-
-    sensor = PositionSensor(sensor_noise_std, start)
-
-    planner = Planner2D(
-        goal,
-        max_speed,
-        dt,
-        mu,
-        sigma
-    )
-
-    if plotting_on == 1:
-        # IMPORTANT: Pass boundary_constraints and obstacle_constraints here!
-        plotter = Plot2D(
-            WIDTH,
-            HEIGHT,
+    dt = config.dt
+    for run in range(n_runs):
+        print(f"Monte Carlo run {run+1}/{n_runs}")
+        print(f"start {start}")
+        print(f"goal {goal}")
+
+        sim = Simulator2D(
             start,
             goal,
+            dt,
+            config.motion_noise_std,
+            config.max_speed,
             boundary_constraints=boundary_constraints,
-            obstacle_constraints=obstacle_constraints
+            obstacle_constraints=obstacle_constraints,
+            log_path=plotting_on,
+            distance_map=distance_map if config.distance_map else None,
+            profiler=profiler
         )
 
-        #error_plotter = ErrorPlotter()
+        sensor = PositionSensor(config.sensor_noise_std, start, log_path=plotting_on)
 
-    kf = Kalman2D(
-        start,
-        motion_noise_std ** 2,
-        sensor_noise_std ** 2,
-        dt
-    )
-
-    vel = planner.velocity_vector(start)
-
-    meas_error_history = []
-    kf_error_history = []
-    pred_error_history = []
+        planner = Planner2D(
+            goal,
+            config.max_speed,
+            dt,
+            config.mu,
+            config.sigma,
+            navigation=navigation,
+            distance_map=distance_map if config.slow_clearance is not None else None,
+            slow_clearance=config.slow_clearance
+        )
 
-    step_count = 0
-    while True:
-        measured_pos = sensor.sense_position(sim.pos)
+        if plotting_on:
+            # IMPORTANT: Pass boundary_constraints and obstacle_constraints here!
+            plotter = Plot2D(
+                WIDTH,
+                HEIGHT,
+                start,
+                goal,
+                boundary_constraints=boundary_constraints,
+                obstacle_constraints=obstacle_constraints,
+                blit=plot_blit,
+                render_every=plot_render_every
+            )
+
+            #error_plotter = ErrorPlotter()
+
+        if telemetry is not None:
+            telemetry.publish_scene(start, goal, boundary_constraints, obstacle_constraints)
+
+        kf = config.build_estimator(start, dt, boundary_constraints, obstacle_constraints)
+
+        vel = planner.velocity_vector(start)
+
+        meas_error_history = []
+        kf_error_history = []
+        pred_error_history = []
+
+        step_count = 0
+        while True:
+            if profiler is not None:
+                profiler.start()
+            measured_pos = sensor.sense_position(sim.pos)
+            if profiler is not None:
+                profiler.lap('sense')
+            kf_pos, pred_pos, k = kf.update(measured_pos, vel, dt)
+            if profiler is not None:
+                profiler.lap('filter')
+            vel = planner.velocity_vector(kf_pos)
+            if profiler is not None:
+                profiler.lap('plan')
+            vel_noisy = sim.add_motion_noise(vel)
+            collisions_before = sim.get_collision_count()
+            pos, speed = sim.step(vel_noisy)
+            if profiler is not None:
+                profiler.lap('act')
+
+            if recorder is not None:
+                recorder.record(pos, measured_pos, kf.x, pred_pos, speed,
+                                sim.get_collision_count() > collisions_before)
+
+            # Error computation
+            measured_error, kf_error, pred_error = error_computation(pos, measured_pos, kf_pos, pred_pos)
+            meas_error_history.append(measured_error)
+            kf_error_history.append(kf_error)
+            pred_error_history.append(pred_error)
+
+            if plotting_on:
+                plotter.update(pos, measured_pos, kf_pos, pred_pos, speed, sim.get_collision_count())
+                #error_plotter.update(measured_error, pred_error, kf_error)
+
+                k_scalar = np.trace(k) / 4.0
+                #plotter.kalman_plot_update(k_scalar)
+
+            if telemetry is not None:
+                telemetry.publish(pos, measured_pos, kf_pos, pred_pos, speed,
+                                  sim.get_collision_count(), np.trace(k) / 4.0)
+
+            if profiler is not None:
+                profiler.lap('log')
+
+            step_count += 1
+            if step_count > config.max_steps:
+                print(f"Max steps ({config.max_steps}) reached!")
+                break
+
+            if sim.distance_to_goal(pred_pos) <= config.goal_tolerance:
+                print("Goal reached!")
+                break
+
+        # Final update
         kf_pos, pred_pos, k = kf.update(measured_pos, vel, dt)
-        vel = planner.velocity_vector(kf_pos)
         vel_noisy = sim.add_motion_noise(vel)
-        pos, speed = sim.step(vel_noisy)
-        
-        # Error computation
-        measured_error, kf_error, pred_error = error_computation(pos, measured_pos, kf_pos, pred_pos)
-        meas_error_history.append(measured_error)
-        kf_error_history.append(kf_error)
-        pred_error_history.append(pred_error)
-
-        if plotting_on == 1:
+
+        if plotting_on:
             plotter.update(pos, measured_pos, kf_pos, pred_pos, speed, sim.get_collision_count())
-            #error_plotter.update(measured_error, pred_error, kf_error)
 
             k_scalar = np.trace(k) / 4.0
             #plotter.kalman_plot_update(k_scalar)
-
-        step_count += 1
-        if step_count > MAX_STEPS:
-            print(f"Max steps ({MAX_STEPS}) reached!")
-            break
-
-        if sim.distance_to_goal(pred_pos) <= GOAL_TOLERANCE:
-            print("Goal reached!")
-            break
-
-    # Final update
-    kf_pos, pred_pos, k = kf.update(measured_pos, vel, dt)
-    vel_noisy = sim.add_motion_noise(vel)
-    
-    if plotting_on == 1:
-        plotter.update(pos, measured_pos, kf_pos, pred_pos, speed, sim.get_collision_count())
-        
-        k_scalar = np.trace(k) / 4.0
-        #plotter.kalman_plot_update(k_scalar)
-        plotter.show()
-
-    all_meas_errors.append(meas_error_history)
-    all_kf_errors.append(kf_error_history)
-    all_pred_errors.append(pred_error_history)
-    all_collision_counts.append(sim.get_collision_count())
-
-# Statistics
-print(f"\n{'='*50}")
-print(f"Total Collisions across all runs: {sum(all_collision_counts)}")
-print(f"Average Collisions per run: {np.mean(all_collision_counts):.2f}")
-print(f"{'='*50}\n")
-
-# Convert to numpy (ragged runs → pad or truncate)
-min_len = min(len(e) for e in all_kf_errors)
-
-all_meas_errors = np.array([e[:min_len] for e in all_meas_errors])
-all_kf_errors = np.array([e[:min_len] for e in all_kf_errors])
-all_pred_errors = np.array([e[:min_len] for e in all_pred_errors])
-
-# RMSE over Monte Carlo runs (square, mean, then sqrt)
-rmse_meas = np.sqrt(np.mean(all_meas_errors ** 2, axis=0))
-rmse_kf = np.sqrt(np.mean(all_kf_errors ** 2, axis=0))
-rmse_pred = np.sqrt(np.mean(all_pred_errors ** 2, axis=0))
-
-# Overall RMSE (across all timesteps and runs)
-overall_rmse_meas = np.sqrt(np.mean(all_meas_errors ** 2))
-overall_rmse_kf = np.sqrt(np.mean(all_kf_errors ** 2))
-overall_rmse_pred = np.sqrt(np.mean(all_pred_errors ** 2))
-
-print("Overall RMSE GPS error:", overall_rmse_meas)
-print("Overall RMSE KF error:", overall_rmse_kf)
-print("Overall RMSE Prediction error:", overall_rmse_pred)
-
-# If you want time-averaged RMSE (RMSE at each timestep, then average)
-time_avg_rmse_meas = np.mean(rmse_meas)
-time_avg_rmse_kf = np.mean(rmse_kf)
-time_avg_rmse_pred = np.mean(rmse_pred)
-
-print("\nTime-averaged RMSE GPS error:", time_avg_rmse_meas)
-print("Time-averaged RMSE KF error:", time_avg_rmse_kf)
-print("Time-averaged RMSE Prediction error:", time_avg_rmse_pred)
\ No newline at end of file
+            plotter.show()
+
+        if recorder is not None:
+            recorder.end_run()
+
+        error_stats.add_run(np.column_stack((meas_error_history, kf_error_history, pred_error_history)))
+        all_collision_counts.append(sim.get_collision_count())
+
+        if profiler is not None:
+            profiler.count('runs')
+            profiler.count('goals_reached', step_count <= config.max_steps)
+
+    return error_stats, all_collision_counts
+
+
+def print_report(error_stats, all_collision_counts):
+    # Statistics
+    print(f"\n{'='*50}")
+    print(f"Total Collisions across all runs: {sum(all_collision_counts)}")
+    print(f"Average Collisions per run: {np.mean(all_collision_counts):.2f}")
+    print(f"{'='*50}\n")
+
+    # RMSE over Monte Carlo runs (square, mean, then sqrt), per timestep over
+    # the runs still active at that timestep
+    rmse_meas, rmse_kf, rmse_pred = error_stats.rmse().T
+
+    # Overall RMSE (across all timesteps and runs)
+    overall_rmse_meas, overall_rmse_kf, overall_rmse_pred = error_stats.overall_rmse()
+    overall_lo, overall_hi = error_stats.overall_confidence_interval()
+
+    print("Overall RMSE GPS error:", overall_rmse_meas)
+    print("Overall RMSE KF error:", overall_rmse_kf)
+    print("Overall RMSE Prediction error:", overall_rmse_pred)
+    print(f"95% CI KF RMSE: [{overall_lo[1]:.4f}, {overall_hi[1]:.4f}]")
+
+    # If you want time-averaged RMSE (RMSE at each timestep, then average)
+    time_avg_rmse_meas = np.mean(rmse_meas)
+    time_avg_rmse_kf = np.mean(rmse_kf)
+    time_avg_rmse_pred = np.mean(rmse_pred)
+
+    print("\nTime-averaged RMSE GPS error:", time_avg_rmse_meas)
+    print("Time-averaged RMSE KF error:", time_avg_rmse_kf)
+    print("Time-averaged RMSE Prediction error:", time_avg_rmse_pred)
+    print(f"Timesteps: {error_stats.length} (runs at last step: {error_stats.counts[-1]})")
+
+
+# ============================================================
+# COMMAND LINE
+# ============================================================
+
+_SCALAR_FIELDS = [f for f in dataclasses.fields(SimulationConfig) if f.name not in ('boundary', 'obstacles')]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Monte Carlo campaigns of the 2D sense -> filter -> plan -> act loop.",
+        epilog="Sweep example: python main.py --sweep sensor_noise_std=0.25,0.5,1.0 "
+               "--sweep motion_noise_std=0.05:0.2:4 --sweep max_speed=1,2 --runs 200")
+
+    config = parser.add_argument_group("simulation config (SimulationConfig fields)")
+    for field in _SCALAR_FIELDS:
+        default = MAIN_DEFAULTS.get(field.name, field.default)
+        config.add_argument('--' + field.name.replace('_', '-'), dest=field.name, metavar='VALUE',
+                            help=f"default: {default}")
+    config.add_argument('--boundary', nargs=4, type=float, metavar=('X_MIN', 'X_MAX', 'Y_MIN', 'Y_MAX'))
+    config.add_argument('--no-boundary', action='store_true')
+    config.add_argument('--obstacle', nargs=4, type=float, action='append',
+                        metavar=('X_MIN', 'X_MAX', 'Y_MIN', 'Y_MAX'),
+                        help="replaces the default obstacles; repeat for several")
+    config.add_argument('--no-obstacles', action='store_true')
+
+    campaign = parser.add_argument_group("campaign")
+    campaign.add_argument('--runs', type=int, help=f"Monte Carlo runs (default: {N_RUNS}, 1 with --plot/--telemetry)")
+    campaign.add_argument('--engine', choices=('batch', 'serial'),
+                          help="batch (default): all runs in lockstep in one process; "
+                               "serial: one run at a time over a process pool")
+    campaign.add_argument('--workers', type=int, help="processes (default: all cores)")
+    campaign.add_argument('--rates', nargs=3, type=float, metavar=('SIM', 'CONTROL', 'GPS'),
+                          help="run the event-driven multi-rate loop with these rates in Hz "
+                               "(simulator, planner + Kalman predict, GPS + Kalman correct)")
+    campaign.add_argument('--swarm', action='store_true',
+                          help="fly the runs together as one swarm, agents colliding with each other")
+    campaign.add_argument('--sweep', action='append', default=[], metavar='NAME=VALUES',
+                          help="sweep axis, 'name=v1,v2,...' or 'name=start:stop:num'; "
+                               "repeat for a grid, points run in parallel")
+    campaign.add_argument('--cache-dir', help="reuse (and extend) campaigns stored in this result cache")
+    campaign.add_argument('--cache-size', type=float, default=1024, metavar='MB',
+                          help="size bound of the result cache (default: 1024 MB)")
+    campaign.add_argument('--precision', type=float, metavar='REL',
+                          help="run until the 95%% CIs of KF RMSE and mean collisions are within "
+                               "REL of the estimates (serial engine, --min-runs..--max-runs runs)")
+    campaign.add_argument('--min-runs', type=int, default=100, help="adaptive runs lower bound (default: 100)")
+    campaign.add_argument('--max-runs', type=int, default=10000,
+                          help="adaptive runs upper bound (default: 10000)")
+    campaign.add_argument('--compare', action='append', default=[], metavar='NAME=VALUE',
+                          help="compare the config with a copy where NAME=VALUE, on common random "
+                               "numbers (serial engine); repeat to change several fields")
+    campaign.add_argument('--vr-replicates', type=int, metavar='R',
+                          help="measure the variance reduction of --scenarios / --antithetic over "
+                               "plain sampling on R replicated campaigns of --runs runs each")
+    campaign.add_argument('--record-dir', help="record every run's trajectories (batch engine)")
+    campaign.add_argument('--render-dir', help="render trajectory density / error bands (needs --record-dir)")
+    campaign.add_argument('--profile', action='store_true', help="time every stage of the loop")
+    campaign.add_argument('--profile-dump', help="also write the machine-readable profile (.json)")
+
+    visual = parser.add_argument_group("live view")
+    visual.add_argument('--plot', action='store_true', help="plot the runs as they go")
+    visual.add_argument('--no-blit', action='store_true', help="redraw the whole figure on every step")
+    visual.add_argument('--render-every', type=int, default=1, help="render one frame every k steps")
+    visual.add_argument('--telemetry', action='store_true',
+                        help="stream frames to a viewer process (python telemetry.py)")
+    visual.add_argument('--start', nargs=2, type=float, default=VISUAL_START, metavar=('X', 'Y'))
+    visual.add_argument('--goal', nargs=2, type=float, default=VISUAL_GOAL, metavar=('X', 'Y'))
+    return parser
+
+
+def config_from_args(args):
+    values = dict(MAIN_DEFAULTS)
+    for field in _SCALAR_FIELDS:
+        text = getattr(args, field.name)
+        if text is not None:
+            values[field.name] = parse_value(field, text)
+    if args.no_boundary:
+        values['boundary'] = None
+    elif args.boundary is not None:
+        values['boundary'] = tuple(args.boundary)
+    if args.no_obstacles:
+        values['obstacles'] = ()
+    elif args.obstacle is not None:
+        values['obstacles'] = tuple(tuple(box) for box in args.obstacle)
+    return SimulationConfig(**values)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        config = config_from_args(args)
+        axes = parse_sweep(args.sweep)
+    except ValueError as e:
+        parser.error(str(e))
+
+    visual = args.plot or args.telemetry
+    n_runs = args.runs if args.runs is not None else (1 if visual else N_RUNS)
+    engine = args.engine or 'batch'
+    vectorized = engine == 'batch'
+    if args.render_dir is not None and args.record_dir is None:
+        parser.error("--render-dir needs --record-dir")
+
+    adaptive = None
+    if args.precision is not None:
+        if (visual or args.rates is not None or args.swarm or args.record_dir is not None or args.profile
+                or args.engine == 'batch'):
+            parser.error("--precision runs serial campaigns and can't be combined with --plot, --telemetry, "
+                         "--rates, --swarm, --record-dir, --profile or --engine batch")
+        adaptive = {'precision': args.precision, 'min_runs': args.min_runs, 'max_runs': args.max_runs}
+
+    study = '--compare' if args.compare else '--vr-replicates' if args.vr_replicates is not None else None
+    if study is not None and (visual or args.rates is not None or args.swarm or args.record_dir is not None
+                              or args.profile or args.engine == 'batch' or axes or adaptive is not None
+                              or args.cache_dir is not None):
+        parser.error(f"{study} runs serial campaigns and can't be combined with --plot, --telemetry, "
+                     "--rates, --swarm, --record-dir, --profile, --engine batch, --sweep, --precision "
+                     "or --cache-dir")
+    if args.compare and args.vr_replicates is not None:
+        parser.error("--compare can't be combined with --vr-replicates")
+
+    if args.compare:
+        changes = {}
+        for spec in args.compare:
+            name, sep, value = spec.partition('=')
+            try:
+                if not sep:
+                    raise ValueError(f"Bad comparison {spec!r}, expected name=value")
+                field = config_field(name)
+                changes[field.name] = parse_value(field, value)
+            except ValueError as e:
+                parser.error(str(e))
+        if 'seed' in changes:
+            parser.error("--compare runs both configs on common random numbers and can't change the seed")
+        print(f"Comparing {changes} to the base config, {n_runs} runs each on common random numbers")
+        report = compare_configs(config, dataclasses.replace(config, **changes), n_runs, workers=args.workers)
+        for name, r in report.items():
+            print(f"{name:>10}: {r['a']:.4f} -> {r['b']:.4f}, difference {r['difference']:+.4f} "
+                  f"+/- {r['half_width']:.4f} (95% CI), variance reduction x{r['variance_reduction']:.1f}")
+        return
+
+    if args.vr_replicates is not None:
+        print(f"Variance reduction of scenarios={config.scenarios!r} antithetic={config.antithetic} "
+              f"over plain sampling, {args.vr_replicates} replicates x {n_runs} runs")
+        factors = replicate_variance_reduction(config, n_runs, args.vr_replicates, workers=args.workers)
+        for name, factor in factors.items():
+            print(f"{name:>16}: x{factor:.1f}")
+        return
+
+    if axes:
+        if visual or args.record_dir is not None:
+            parser.error("--sweep can't be combined with --plot, --telemetry or --record-dir")
+        configs = expand_sweep(config, axes)
+        if adaptive is not None:
+            print(f"Sweeping {len(configs)} points to {args.precision:.1%} precision "
+                  f"({args.min_runs}-{args.max_runs} runs, serial engine)")
+        else:
+            print(f"Sweeping {len(configs)} points x {n_runs} runs ({engine} engine)")
+        summaries = run_sweep(configs, n_runs, vectorized=vectorized, workers=args.workers,
+                              cache_dir=args.cache_dir, cache_bytes=int(args.cache_size * 2 ** 20),
+                              adaptive=adaptive)
+        print(format_table(axes, configs, summaries))
+        return
+
+    if args.rates is not None and (visual or args.record_dir is not None or args.profile):
+        parser.error("--rates can't be combined with --plot, --telemetry, --record-dir or --profile")
+    if args.swarm and (visual or args.rates is not None or args.cache_dir is not None):
+        parser.error("--swarm can't be combined with --plot, --telemetry, --rates or --cache-dir")
+    batch = vectorized and not visual and args.rates is None and adaptive is None
+    if config.estimator != 'kalman' and (args.swarm or batch):
+        parser.error("--estimator particle needs --engine serial, --rates or --plot / --telemetry")
+    if config.antithetic and (args.swarm or batch):
+        parser.error("--antithetic needs --engine serial or --rates")
+    if args.record_dir is not None and not (vectorized or visual):
+        parser.error("--record-dir needs the batch engine or --plot / --telemetry")
+
+    # Optional on-disk trajectory recording (see recorder.TrajectoryLog)
+    recorder = TrajectoryRecorder(args.record_dir) if args.record_dir is not None else None
+
+    # Optional per-stage timing (see profiling.StageProfiler)
+    profiler = None
+
+    if visual:
+        # Optional telemetry stream for an out-of-process viewer
+        telemetry = TelemetryPublisher() if args.telemetry else None
+        profiler = StageProfiler() if args.profile else None
+        error_stats, all_collision_counts = run_visual(
+            config, np.array(args.start), np.array(args.goal), n_runs,
+            plotting_on=args.plot, telemetry=telemetry, recorder=recorder, profiler=profiler,
+            plot_blit=not args.no_blit, plot_render_every=args.render_every)
+
+        if telemetry is not None:
+            telemetry.close()
+            print(f"Telemetry: {telemetry.sent} frames sent, {telemetry.dropped} dropped")
+    elif args.rates is not None:
+        result = run_multirate(config, n_runs, Rates(*args.rates))
+        print(f"Multi-rate runs {n_runs} at {Rates(*args.rates)}: "
+              f"{int(result.goal_reached.sum())} reached goal, "
+              f"{int((~result.goal_reached).sum())} ran out of time")
+        error_stats = result.stats
+        all_collision_counts = list(result.collision_counts)
+    elif adaptive is not None:
+        cache = None
+        if args.cache_dir is not None:
+            cache = ResultCache(args.cache_dir, int(args.cache_size * 2 ** 20))
+        result = run_adaptive(config, workers=args.workers, cache=cache, **adaptive)
+        stopping = result.stopping
+        print(f"Adaptive Monte Carlo: {stopping['runs']} runs "
+              f"({'converged' if stopping['converged'] else 'stopped at --max-runs'}), relative 95% CI "
+              f"half-width KF RMSE {stopping['precision']['rmse_kf']:.2%}, "
+              f"collisions {stopping['precision']['collisions']:.2%}")
+        print(f"{int(result.goal_reached.sum())} reached goal, "
+              f"{int((~result.goal_reached).sum())} hit max steps")
+        error_stats = result.stats
+        all_collision_counts = list(result.collision_counts)
+    elif args.swarm:
+        profiler = StageProfiler() if args.profile else None
+        result = run_swarm(config, n_runs, recorder=recorder, profiler=profiler)
+        print(f"Swarm of {n_runs}: {int(result.goal_reached.sum())} reached goal, "
+              f"{int((~result.goal_reached).sum())} hit max steps, "
+              f"{result.agent_collision_counts.mean():.2f} inter-agent collisions per agent")
+        error_stats = result.stats
+        all_collision_counts = list(result.collision_counts)
+    else:
+        cache = None
+        if args.cache_dir is not None:
+            cache = ResultCache(args.cache_dir, int(args.cache_size * 2 ** 20))
+        # Histories only for the antithetic pair report; the rest streams
+        result = run_monte_carlo(config, n_runs, vectorized=vectorized, workers=args.workers,
+                                 keep_histories=config.antithetic, recorder=recorder,
+                                 profile=args.profile, cache=cache)
+        if cache is not None:
+            print(f"Result cache: {cache.hits} hit(s), {cache.misses} miss(es), "
+                  f"{cache.computed_runs} run(s) simulated")
+        print(f"Monte Carlo runs {n_runs}: {int(result.goal_reached.sum())} reached goal, "
+              f"{int((~result.goal_reached).sum())} hit max steps")
+        if config.antithetic and result.kf_errors is not None and n_runs >= 4:
+            factors = antithetic_variance_reduction(result)
+            print(f"Antithetic pairs: variance reduction x{factors['mse']:.2f} (KF MSE), "
+                  f"x{factors['collisions']:.2f} (collisions)")
+        profiler = result.profile
+        error_stats = result.stats
+        all_collision_counts = list(result.collision_counts)
+
+    if recorder is not None:
+        recorder.close()
+        print(f"Recorded {recorder.n_runs} runs ({recorder.n_rows} steps) to {args.record_dir}")
+
+        if args.render_dir is not None:
+            boundary_constraints, obstacle_constraints = config.build_constraints()
+            images = render_log(TrajectoryLog(args.record_dir), args.render_dir,
+                                boundary_constraints, obstacle_constraints)
+            print(f"Rendered {', '.join(images)}")
+
+    if profiler is not None:
+        print(f"\n{profiler.summary()}")
+        if args.profile_dump is not None:
+            print(f"Profile written to {profiler.dump(args.profile_dump)}")
+
+    print_report(error_stats, all_collision_counts)
+
+
+if __name__ == '__main__':
+    main()
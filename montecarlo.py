@@ -0,0 +1,308 @@
+import numpy as np
+
+from simulator import BatchSimulator2D
+from sensors import BatchPositionSensor
+from planner import BatchPlanner2D
+from filters import BatchKalman2D
+from noise import NoiseSource
+from stats import StepStats
+from recorder import RECORD_FIELDS
+
+
+class MonteCarloResult:
+    """
+    Per-run output of a lockstep Monte Carlo campaign.
+
+    Error histories are stored as (N, max_steps + 1) arrays; only the first
+    steps[i] entries of row i are valid. They are None when the campaign
+    only kept streaming statistics (see stats).
+    """
+
+    def __init__(self, meas_errors, kf_errors, pred_errors, steps,
+                 collision_counts, goal_reached, stats=None, profile=None):
+        self.meas_errors = meas_errors
+        self.kf_errors = kf_errors
+        self.pred_errors = pred_errors
+        self.steps = steps
+        self.collision_counts = collision_counts
+        self.goal_reached = goal_reached
+        self._stats = stats
+        # profiling.StageProfiler of the campaign, if it was profiled
+        self.profile = profile
+
+    @property
+    def stats(self):
+        """StepStats of the measured / KF / predicted errors."""
+        if self._stats is None:
+            self._stats = StepStats()
+            for first in range(0, self.n_runs, 1024):
+                rows = slice(first, first + 1024)
+                self._stats.add_runs(
+                    np.stack((self.meas_errors[rows], self.kf_errors[rows],
+                              self.pred_errors[rows]), axis=-1),
+                    self.steps[rows])
+        return self._stats
+
+    @property
+    def n_runs(self):
+        return len(self.steps)
+
+    def histories(self, errors):
+        """Split an (N, max_steps + 1) error array into ragged per-run lists."""
+        return [errors[i, :n] for i, n in enumerate(self.steps)]
+
+    def summary(self, level=0.95):
+        """
+        Scalar metrics of the campaign: goal rate, mean steps and collisions
+        per run, overall measured / KF / predicted RMSE and the confidence
+        interval of the KF RMSE.
+        """
+        stats = self.stats
+        rmse = stats.overall_rmse()
+        lo, hi = stats.overall_confidence_interval(level)
+        kf = stats.channel('kf')
+        return {
+            'runs': self.n_runs,
+            'reached': float(np.mean(self.goal_reached)) if self.n_runs else float('nan'),
+            'mean_steps': float(np.mean(self.steps)) if self.n_runs else float('nan'),
+            'mean_collisions': float(np.mean(self.collision_counts)) if self.n_runs else float('nan'),
+            'rmse_meas': float(rmse[stats.channel('meas')]),
+            'rmse_kf': float(rmse[kf]),
+            'rmse_pred': float(rmse[stats.channel('pred')]),
+            'rmse_kf_lo': float(lo[kf]),
+            'rmse_kf_hi': float(hi[kf]),
+        }
+
+
+def concat_results(head, tail):
+    """Runs of head followed by runs of tail; histories kept only if both have them."""
+    stats = StepStats.from_dict(head.stats.to_dict()).merge(tail.stats)
+    if head.kf_errors is not None and tail.kf_errors is not None:
+        errors = [np.concatenate([a, b]) for a, b in
+                  ((head.meas_errors, tail.meas_errors), (head.kf_errors, tail.kf_errors),
+                   (head.pred_errors, tail.pred_errors))]
+    else:
+        errors = [None, None, None]
+    return MonteCarloResult(
+        *errors,
+        np.concatenate([head.steps, tail.steps]),
+        np.concatenate([head.collision_counts, tail.collision_counts]),
+        np.concatenate([head.goal_reached, tail.goal_reached]),
+        stats=stats
+    )
+
+
+class _InflightRecords:
+    """
+    Per-step records (RECORD_FIELDS) of the runs still in flight, one row
+    per run, handed to a TrajectoryRecorder as each run finishes. Rows grow
+    by doubling along time and are compacted once most runs are done, so
+    memory follows the runs in flight, not the whole campaign.
+    """
+
+    def __init__(self, n_runs, width, initial_steps=64, runs=None):
+        """runs: ids of the runs to hold (default: all n_runs)"""
+        self.width = width
+        self.row = np.arange(n_runs)
+        if runs is not None:
+            self.row[runs] = np.arange(len(runs))
+        self.n_rows = n_runs if runs is None else len(runs)
+        self.data = {
+            name: np.zeros((self.n_rows, min(width, initial_steps)) + shape, dtype=dtype)
+            for name, (dtype, shape) in RECORD_FIELDS.items()
+        }
+
+    def store(self, idx, t, **columns):
+        """Records of timestep t of runs idx."""
+        capacity = self.data['speed'].shape[1]
+        if t == capacity:
+            capacity = min(2 * capacity, self.width)
+            for name, data in self.data.items():
+                grown = np.zeros((data.shape[0], capacity) + data.shape[2:], dtype=data.dtype)
+                grown[:, :t] = data
+                self.data[name] = grown
+        rows = self.row[idx]
+        for name, values in columns.items():
+            self.data[name][rows, t] = values
+
+    def finish(self, recorder, done, steps, remaining):
+        """Write runs done to recorder, and drop their rows if most are unused."""
+        for i in done:
+            row, n = self.row[i], steps[i]
+            recorder.record_run(run_id=int(i), **{name: data[row, :n] for name, data in self.data.items()})
+        if 2 * len(remaining) < self.n_rows:
+            rows = self.row[remaining]
+            for name, data in self.data.items():
+                self.data[name] = data[rows]
+            self.row[remaining] = np.arange(len(remaining))
+            self.n_rows = len(remaining)
+
+
+class MonteCarlo2D:
+    """
+    Lockstep Monte Carlo engine.
+
+    Holds all N runs as (N, 2) / (N, 4) arrays and advances them together
+    through the same sense -> filter -> plan -> act loop as main.py.
+    Runs that reach their goal (or MAX_STEPS) are masked out of later steps.
+    With navigation the runs go through in goal-grouped batches
+    (BatchPlanner2D.batches), so only a bounded number of goal distance
+    fields exist at a time.
+    """
+
+    def __init__(self, starts, goals, dt, sensor_noise_std, motion_noise_std,
+                 max_speed, boundary_constraints=None, obstacle_constraints=None,
+                 goal_tolerance=1.0, max_steps=500, rng=None, navigation=None,
+                 distance_map=None, slow_clearance=None, profiler=None, simulator=None,
+                 sdf_collisions=True):
+        """
+        navigation: optional NavigationMap for the planner
+        distance_map: optional sdf.DistanceMap; the simulator uses it to skip
+            exact collision checks of moves that cannot hit anything
+        slow_clearance: with a distance_map, slow down below this clearance
+        sdf_collisions: let the simulator use distance_map (False when it is
+            only there for slow_clearance, see SimulationConfig.distance_map)
+        profiler: optional profiling.StageProfiler; times every lockstep
+            stage (each covering all active runs) and counts collision events
+        simulator: factory of the simulator, called like BatchSimulator2D
+            (default: BatchSimulator2D)
+        """
+        self.starts = np.array(starts, dtype=float)
+        self.goals = np.array(goals, dtype=float)
+        self.goal_tolerance = goal_tolerance
+        self.max_steps = max_steps
+        self.profiler = profiler
+
+        # Sensor and motion noise share one block-buffered stream
+        noise = rng if isinstance(rng, NoiseSource) else NoiseSource(
+            rng, block_size=max(8192, 32 * len(self.starts)))
+
+        simulator = simulator if simulator is not None else BatchSimulator2D
+        self.sim = simulator(
+            self.starts,
+            self.goals,
+            dt,
+            motion_noise_std,
+            max_speed,
+            boundary_constraints=boundary_constraints,
+            obstacle_constraints=obstacle_constraints,
+            rng=noise,
+            distance_map=distance_map if sdf_collisions else None,
+            profiler=profiler
+        )
+        self.sensor = BatchPositionSensor(sensor_noise_std, rng=noise)
+        self.planner = BatchPlanner2D(
+            self.goals, max_speed, dt, navigation=navigation,
+            distance_map=distance_map if slow_clearance is not None else None,
+            slow_clearance=slow_clearance
+        )
+        self.kf = BatchKalman2D(
+            self.starts,
+            motion_noise_std ** 2,
+            sensor_noise_std ** 2,
+            dt
+        )
+
+    def run(self, recorder=None, keep_histories=False):
+        """
+        Run all runs to completion.
+
+        recorder: optional TrajectoryRecorder; every run's per-step records
+        are written to it as the run finishes, so in completion order (the
+        recorder keeps the run ids)
+        keep_histories: also return the (N, max_steps + 1) error histories;
+        otherwise only the StepStats, fed one timestep at a time, whose size
+        doesn't depend on the number of runs.
+        """
+        n = len(self.starts)
+        width = self.max_steps + 1
+
+        if keep_histories:
+            meas_errors = np.zeros((n, width))
+            kf_errors = np.zeros((n, width))
+            pred_errors = np.zeros((n, width))
+        stats = StepStats()
+        sq_sums = np.zeros((n, 3))
+        errors = np.empty((n, 3))
+        steps = np.zeros(n, dtype=int)
+        goal_reached = np.zeros(n, dtype=bool)
+
+        prof = self.profiler
+        for idx in self.planner.batches():
+            if recorder is not None:
+                inflight = _InflightRecords(n, width, runs=idx)
+            t = 0
+            while idx.size:
+                if prof is not None:
+                    prof.start()
+                measured_pos = self.sensor.sense_positions(self.sim.pos[idx])
+                if prof is not None:
+                    prof.lap('sense')
+                kf_pos, pred_pos, _ = self.kf.update(measured_pos, idx)
+                if prof is not None:
+                    prof.lap('filter')
+                vel = self.planner.velocity_vectors(kf_pos, idx)
+                if prof is not None:
+                    prof.lap('plan')
+                vel_noisy = self.sim.add_motion_noise(vel)
+                collisions_before = self.sim.collision_count[idx]
+                pos, speed = self.sim.step(vel_noisy, idx)
+                if prof is not None:
+                    prof.lap('act')
+
+                # Error computation: every active run is at timestep t
+                if recorder is not None:
+                    inflight.store(
+                        idx, t,
+                        true_pos=pos,
+                        measured_pos=measured_pos,
+                        kf_state=self.kf.x[idx],
+                        pred_pos=pred_pos,
+                        speed=speed,
+                        collision=self.sim.collision_count[idx] > collisions_before
+                    )
+                step_errors = errors[:idx.size]
+                step_errors[:, 0] = np.linalg.norm(measured_pos - pos, axis=1)
+                step_errors[:, 1] = np.linalg.norm(kf_pos - pos, axis=1)
+                step_errors[:, 2] = np.linalg.norm(pred_pos - pos, axis=1)
+                stats.add_step(t, step_errors)
+                sq_sums[idx] += step_errors ** 2
+                if keep_histories:
+                    meas_errors[idx, t] = step_errors[:, 0]
+                    kf_errors[idx, t] = step_errors[:, 1]
+                    pred_errors[idx, t] = step_errors[:, 2]
+                steps[idx] += 1
+                t += 1
+
+                arrived = self.sim.distance_to_goal(pred_pos, idx) <= self.goal_tolerance
+                timed_out = steps[idx] > self.max_steps
+                goal_reached[idx[arrived & ~timed_out]] = True
+
+                finished = arrived | timed_out
+                done = idx[finished]
+                idx = idx[~finished]
+                self.planner.release(done)
+                if prof is not None:
+                    prof.lap('log')
+                if recorder is not None and done.size:
+                    inflight.finish(recorder, done, steps, idx)
+                    if prof is not None:
+                        prof.lap('record')
+        stats.add_run_totals(sq_sums, steps)
+
+        if prof is not None:
+            prof.count('runs', n)
+            prof.count('goals_reached', np.count_nonzero(goal_reached))
+
+        if not keep_histories:
+            meas_errors = kf_errors = pred_errors = None
+        return MonteCarloResult(
+            meas_errors,
+            kf_errors,
+            pred_errors,
+            steps,
+            self.sim.get_collision_count().copy(),
+            goal_reached,
+            stats=stats,
+            profile=prof
+        )
@@ -0,0 +1,228 @@
+import heapq
+from dataclasses import dataclass
+
+import numpy as np
+
+from simulator import Simulator2D
+from sensors import PositionSensor
+from planner import Planner2D
+from montecarlo import MonteCarloResult
+from noise import NoiseSource
+from stats import StepStats
+from campaign import run_generators, filter_generator, run_start_goal, stream_index
+
+
+# ============================================================
+# EVENT CLOCK
+# ============================================================
+
+class Scheduler:
+    """
+    Heap-based discrete-event clock for periodic tasks.
+
+    Each task fires at phase + k * period (computed from the tick count k,
+    so long runs don't accumulate rounding drift). Tasks due at the same
+    time fire in order of priority, then of registration.
+    """
+
+    def __init__(self):
+        self.time = 0.0
+        self._heap = []
+        self._seq = 0
+        self._stopped = False
+
+    def every(self, period, callback, phase=0.0, priority=0):
+        """
+        Call callback(t) at t = phase, phase + period, ...
+
+        Args:
+            period: seconds between calls
+            callback: function of the event time
+            phase: time of the first call
+            priority: lower fires first among tasks due at the same time
+        """
+        if period <= 0:
+            raise ValueError("period must be positive")
+        heapq.heappush(self._heap, (phase, priority, self._seq, 0, period, phase, callback))
+        self._seq += 1
+
+    def stop(self):
+        """Stop run() after the current event."""
+        self._stopped = True
+
+    def run(self, until):
+        """Fire events in time order until stop() is called or the next one is after until."""
+        self._stopped = False
+        heap = self._heap
+        while heap and not self._stopped:
+            t, priority, seq, k, period, phase, callback = heap[0]
+            if t > until:
+                break
+            self.time = t
+            callback(t)
+            k += 1
+            heapq.heapreplace(heap, (phase + k * period, priority, seq, k, period, phase, callback))
+        return self.time
+
+
+# ============================================================
+# MULTI-RATE SENSE / FILTER / PLAN / ACT LOOP
+# ============================================================
+
+@dataclass(frozen=True)
+class Rates:
+    """Component rates in Hz."""
+    # Simulator (physics) steps
+    sim: float = 10.0
+    # Planner commands and Kalman predictions
+    control: float = 10.0
+    # GPS fixes and Kalman corrections
+    gps: float = 1.0
+
+
+# Priorities at equal times, in the lockstep order sense -> filter -> plan -> act
+_GPS, _CONTROL, _SIM = 0, 1, 2
+
+# Timesteps are rounded so each rate yields a single cached (F, Q)
+_DT_DECIMALS = 9
+
+
+def simulate_multirate_run(config, run_index, rates=Rates(), boundary_constraints=None,
+                           obstacle_constraints=None, navigation=None, distance_map=None):
+    """
+    Run one Monte Carlo run with every component at its own rate.
+
+    The simulator steps at rates.sim with dt = 1 / rates.sim. The planner
+    runs at rates.control on the Kalman estimate predicted to the current
+    time (the estimator's predict). GPS fixes arrive at rates.gps, and only
+    they pay for a correct. Noise standard deviations are per event
+    (motion noise per simulator step, sensor noise per fix). The run ends
+    when the estimate is within goal_tolerance of the goal, or after
+    config.max_steps * config.dt seconds.
+
+    Returns:
+        errors: (fixes, 3) measured / KF / predicted position errors at each GPS fix
+        collisions: collision count of the run
+        reached: True if the goal was reached in time
+    """
+    if boundary_constraints is None and obstacle_constraints is None:
+        boundary_constraints, obstacle_constraints = config.build_constraints()
+    if navigation is None:
+        navigation = config.build_navigation(boundary_constraints, obstacle_constraints)
+    if distance_map is None:
+        distance_map = config.build_distance_map(boundary_constraints, obstacle_constraints)
+
+    streams = stream_index(config, run_index)
+    scenario_rng, sensor_rng, motion_rng = run_generators(
+        config.seed, streams, config.bit_generator)
+    start, goal = run_start_goal(config, run_index, scenario_rng)
+    negate = config.antithetic and run_index % 2 == 1
+
+    sim_dt = 1.0 / rates.sim
+    control_dt = 1.0 / rates.control
+    max_time = config.max_steps * config.dt
+
+    sim = Simulator2D(
+        start,
+        goal,
+        sim_dt,
+        config.motion_noise_std,
+        config.max_speed,
+        boundary_constraints=boundary_constraints,
+        obstacle_constraints=obstacle_constraints,
+        rng=NoiseSource(motion_rng, block_size=8192, negate=negate),
+        log_path=False,
+        distance_map=distance_map if config.distance_map else None
+    )
+    sensor = PositionSensor(config.sensor_noise_std, start,
+                            rng=NoiseSource(sensor_rng, block_size=8192, negate=negate),
+                            log_path=False)
+    planner = Planner2D(goal, config.max_speed, control_dt, config.mu, config.sigma,
+                        navigation=navigation,
+                        distance_map=distance_map if config.slow_clearance is not None else None,
+                        slow_clearance=config.slow_clearance)
+    kf = config.build_estimator(start, control_dt, boundary_constraints, obstacle_constraints,
+                                rng=filter_generator(config.seed, streams, config.bit_generator))
+
+    clock = Scheduler()
+    errors = []
+    state = {'vel': planner.velocity_vector(start), 'kf_time': 0.0, 'reached': False}
+
+    def predict_to(t):
+        dt = round(t - state['kf_time'], _DT_DECIMALS)
+        if dt > 0:
+            kf.predict(dt)
+            state['kf_time'] = t
+
+    def gps(t):
+        measured_pos = sensor.sense_position(sim.pos)
+        predict_to(t)
+        kf_pos, pred_pos, _ = kf.correct(measured_pos)
+        pos = sim.pos
+        errors.append((np.linalg.norm(measured_pos - pos),
+                       np.linalg.norm(kf_pos - pos),
+                       np.linalg.norm(pred_pos - pos)))
+
+    def control(t):
+        predict_to(t)
+        kf_pos = kf.x[:2]
+        if sim.distance_to_goal(kf_pos) <= config.goal_tolerance:
+            state['reached'] = True
+            clock.stop()
+            return
+        state['vel'] = planner.velocity_vector(kf_pos)
+
+    def act(t):
+        sim.step(sim.add_motion_noise(state['vel']))
+
+    clock.every(1.0 / rates.gps, gps, priority=_GPS)
+    clock.every(control_dt, control, priority=_CONTROL)
+    clock.every(sim_dt, act, priority=_SIM)
+    clock.run(until=max_time)
+
+    return np.array(errors, dtype=float).reshape(-1, 3), sim.get_collision_count(), state['reached']
+
+
+def run_multirate(config, n_runs, rates=Rates(), keep_histories=False):
+    """
+    Run n_runs multi-rate runs of config in this process.
+
+    keep_histories: also return the (runs x fixes) error histories;
+    otherwise every run is streamed into the StepStats as it ends, in
+    memory independent of n_runs (see run_campaign)
+
+    Returns:
+        MonteCarloResult whose error histories (and per-step statistics)
+        are indexed by GPS fix
+    """
+    boundary_constraints, obstacle_constraints = config.build_constraints()
+    navigation = config.build_navigation(boundary_constraints, obstacle_constraints)
+    distance_map = config.build_distance_map(boundary_constraints, obstacle_constraints)
+
+    # Fixes arrive at t = k / rates.gps up to max_steps * dt seconds
+    width = int(np.floor(config.max_steps * config.dt * rates.gps + 1e-9)) + 1
+    if keep_histories:
+        histories = np.zeros((3, n_runs, width))
+    stats = StepStats()
+    steps = np.zeros(n_runs, dtype=np.int64)
+    collisions = np.zeros(n_runs, dtype=np.int64)
+    reached = np.zeros(n_runs, dtype=bool)
+    for run in range(n_runs):
+        errors, collisions[run], reached[run] = simulate_multirate_run(
+            config, run, rates, boundary_constraints, obstacle_constraints, navigation, distance_map)
+        steps[run] = len(errors)
+        stats.add_run(errors)
+        if keep_histories:
+            histories[:, run, :len(errors)] = errors.T
+
+    if not keep_histories:
+        histories = (None, None, None)
+    return MonteCarloResult(
+        histories[0],
+        histories[1],
+        histories[2],
+        steps,
+        collisions,
+        reached,
+        stats=stats
+    )
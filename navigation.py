@@ -0,0 +1,309 @@
+import hashlib
+import math
+
+import numpy as np
+
+
+# Navigation fields by (target, map hash); least recently used entries are
+# evicted first
+_FIELD_CACHE = {}
+_FIELD_CACHE_SIZE = 64
+
+# Cumulative cost across the padding between grid lines (keeps sums finite)
+_LINE_BREAK = 1e6
+
+
+class NavigationMap:
+    """
+    Rasterized traversal-cost map of the boundary box and obstacles.
+
+    Nodes sit on a regular grid with spacing `resolution` over the boundary
+    box. Moving through a node costs 1 per unit length when the vehicle can
+    stand there with `clearance` to spare, and `obstacle_cost` otherwise, so
+    distance fields stay finite (and point outwards) inside obstacles and
+    walls.
+    """
+
+    def __init__(self, boundary_constraints, obstacle_constraints=None,
+                 resolution=1.0, clearance=1.0, obstacle_cost=50.0, distance_map=None):
+        """
+        Args:
+            boundary_constraints: BoundaryConstraints giving the map extent
+            obstacle_constraints: optional ObstacleConstraints (inflated boxes are used)
+            resolution: node spacing in world units
+            clearance: extra margin kept around inflated obstacles and walls
+            obstacle_cost: cost per unit length of blocked nodes
+            distance_map: optional sdf.DistanceMap of the same world; blocked
+                nodes are then read from it instead of re-testing every box
+        """
+        b = boundary_constraints
+        self.origin = np.array([b.x_min, b.y_min], dtype=float)
+        self.resolution = float(resolution)
+        self.shape = (int(np.ceil((b.x_max - b.x_min) / resolution)) + 1,
+                      int(np.ceil((b.y_max - b.y_min) / resolution)) + 1)
+        self.xs = self.origin[0] + self.resolution * np.arange(self.shape[0])
+        self.ys = self.origin[1] + self.resolution * np.arange(self.shape[1])
+
+        margin = b.radius + clearance
+        self.free_box = (b.x_min + margin, b.x_max - margin, b.y_min + margin, b.y_max - margin)
+        x, y = np.meshgrid(self.xs, self.ys, indexing='ij')
+        boxes = np.empty((0, 4))
+        if obstacle_constraints is not None and obstacle_constraints.n_obstacles:
+            boxes = obstacle_constraints.inflated_boxes + np.array([-1.0, 1.0, -1.0, 1.0]) * clearance
+        if distance_map is not None:
+            blocked = (distance_map.distance(np.column_stack([x.ravel(), y.ravel()]))
+                       .reshape(x.shape) < clearance)
+        else:
+            blocked = ((x < b.x_min + margin) | (x > b.x_max - margin) |
+                       (y < b.y_min + margin) | (y > b.y_max - margin))
+            for x_min, x_max, y_min, y_max in boxes:
+                blocked |= (x > x_min) & (x < x_max) & (y > y_min) & (y < y_max)
+        self.blocked = blocked
+        self.cost = np.where(blocked, float(obstacle_cost), 1.0)
+        self.boxes = boxes
+
+        # Digest of the grid and of the cost grid itself (which depends on
+        # whether blocked nodes came from a distance map), plus the boxes
+        # that segments_clear() tests
+        digest = hashlib.sha1()
+        digest.update(np.array([b.x_min, b.x_max, b.y_min, b.y_max, b.radius,
+                                resolution, clearance, obstacle_cost]).tobytes())
+        digest.update(np.array(self.shape, dtype=np.int64).tobytes())
+        digest.update(np.ascontiguousarray(self.cost).tobytes())
+        digest.update(np.ascontiguousarray(boxes, dtype=float).tobytes())
+        self.hash = digest.hexdigest()
+
+        # Rows, columns and both diagonals as padded lines of flat node
+        # indices, with the cumulative edge cost along each line
+        self._lines = [self._line_set(di, dj) for di, dj in ((1, 0), (0, 1), (1, 1), (1, -1))]
+
+    def _line_set(self, di, dj):
+        nx, ny = self.shape
+        i, j = np.meshgrid(np.arange(nx), np.arange(ny), indexing='ij')
+        if (di, dj) == (1, 0):
+            line, pos = j, i
+        elif (di, dj) == (0, 1):
+            line, pos = i, j
+        elif (di, dj) == (1, 1):
+            line, pos = j - i + nx - 1, i
+        else:
+            line, pos = i + j, i
+        n_lines = int(line.max()) + 1
+        length = int(pos.max()) + 1
+
+        sentinel = nx * ny
+        index = np.full((n_lines, length), sentinel, dtype=np.int64)
+        index[line.ravel(), pos.ravel()] = np.arange(nx * ny)
+        real = index != sentinel
+
+        cost = np.append(self.cost.ravel(), _LINE_BREAK)[index]
+        step = self.resolution * np.hypot(di, dj)
+        edge = 0.5 * step * (cost[:, 1:] + cost[:, :-1])
+        edge = np.where(real[:, 1:] & real[:, :-1], edge, _LINE_BREAK)
+        cumulative = np.zeros(index.shape)
+        np.cumsum(edge, axis=1, out=cumulative[:, 1:])
+        return index, real, cumulative
+
+    def targets(self, goals):
+        """(n, 2) points actually steered to: goals clamped into the walls."""
+        x_min, x_max, y_min, y_max = self.free_box
+        goals = np.asarray(goals, dtype=float).reshape(-1, 2)
+        return np.column_stack([np.clip(goals[:, 0], x_min, x_max),
+                                np.clip(goals[:, 1], y_min, y_max)])
+
+    def field(self, goal):
+        """
+        Cached NavigationField of this map towards goal. Goals clamped to
+        the same target share one field (whose goal is the first of them).
+        """
+        target = self.targets(goal)[0]
+        key = ((float(target[0]), float(target[1])), self.hash)
+        # Least recently used fields are evicted first
+        field = _FIELD_CACHE.pop(key, None)
+        if field is None:
+            field = NavigationField(self, goal)
+            if len(_FIELD_CACHE) >= _FIELD_CACHE_SIZE:
+                del _FIELD_CACHE[next(iter(_FIELD_CACHE))]
+        _FIELD_CACHE[key] = field
+        return field
+
+    def segments_clear(self, points, goal):
+        """(n,) True where the segment from each point to goal misses every obstacle box."""
+        points = np.asarray(points, dtype=float)
+        clear = np.ones(len(points), dtype=bool)
+        if not len(self.boxes):
+            return clear
+        d = np.asarray(goal, dtype=float) - points
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv = 1.0 / d
+        t_lo = np.zeros((len(points), len(self.boxes)))
+        t_hi = np.ones((len(points), len(self.boxes)))
+        for axis, (lo, hi) in enumerate(((0, 1), (2, 3))):
+            lo_b = self.boxes[None, :, lo]
+            hi_b = self.boxes[None, :, hi]
+            p = points[:, axis, None]
+            parallel = d[:, axis, None] == 0.0
+            with np.errstate(invalid='ignore'):
+                t0 = (lo_b - p) * inv[:, axis, None]
+                t1 = (hi_b - p) * inv[:, axis, None]
+            t_near = np.where(parallel, np.where((p > lo_b) & (p < hi_b), -np.inf, np.inf), np.minimum(t0, t1))
+            t_far = np.where(parallel, np.where((p > lo_b) & (p < hi_b), np.inf, -np.inf), np.maximum(t0, t1))
+            t_lo = np.maximum(t_lo, t_near)
+            t_hi = np.minimum(t_hi, t_far)
+        return ~np.any(t_lo < t_hi, axis=1)
+
+
+def _relax_lines(values, lines):
+    """
+    Exact 1D shortest paths along every line of a line set, both ways:
+    v[k] = min_m v[m] + C[k] - C[m] (m before k), done as a running minimum
+    of v - C over the cumulative edge cost C, and mirrored for m after k.
+    """
+    index, real, cumulative = lines
+    v = np.append(values, np.inf)[index]
+    forward = np.minimum.accumulate(v - cumulative, axis=1) + cumulative
+    backward = np.minimum.accumulate((v + cumulative)[:, ::-1], axis=1)[:, ::-1] - cumulative
+    best = np.minimum(v, np.minimum(forward, backward))
+    values[index[real]] = best[real]
+
+
+class NavigationField:
+    """
+    Distance-to-goal field over a NavigationMap, and its steering directions.
+
+    Distances are 8-connected Dijkstra distances on the node grid. They are
+    computed by relaxing whole rows, columns and diagonals at once (each
+    pass is an exact 1D shortest path) until nothing changes, which takes
+    a handful of passes rather than one per node.
+
+    Goals outside the walls are replaced by the closest reachable point
+    (target). Where the straight segment to the target is clear of obstacles
+    the direction is its bearing, as in Planner2D; elsewhere it is
+    the negative gradient of the bilinear interpolant of the field. Either
+    way a lookup costs O(1).
+    """
+
+    def __init__(self, nav_map, goal, tol=1e-6, max_iter=1000):
+        self.map = nav_map
+        self.goal = np.array(goal, dtype=float)
+        nx, ny = nav_map.shape
+
+        # Goals off the map are steered to the closest point inside the walls
+        self.target = nav_map.targets(self.goal)[0]
+
+        # Seed the nodes around the target with their exact distance
+        dist = np.hypot(nav_map.xs[:, None] - self.target[0], nav_map.ys[None, :] - self.target[1])
+        values = np.full(nav_map.shape, np.inf)
+        gx, gy = (self.target - nav_map.origin) / nav_map.resolution
+        i0, j0 = min(int(gx), nx - 2), min(int(gy), ny - 2)
+        values[i0:i0 + 2, j0:j0 + 2] = dist[i0:i0 + 2, j0:j0 + 2]
+
+        values = values.ravel()
+        self.iterations = 0
+        while self.iterations < max_iter:
+            previous = values.copy()
+            for lines in nav_map._lines:
+                _relax_lines(values, lines)
+            self.iterations += 1
+            # Finite values only ever decrease; stop once they have settled
+            # (what is left is rounding noise of the cumulative sums)
+            if np.all(previous - values <= tol):
+                break
+        self.values = values.reshape(nav_map.shape).astype(np.float32)
+
+        nodes = np.column_stack([np.repeat(nav_map.xs, ny), np.tile(nav_map.ys, nx)])
+        self.visible = nav_map.segments_clear(nodes, self.target).reshape(nav_map.shape)
+
+        # Nested lists for the scalar lookup in direction(), built on first
+        # use (they are ~8x the arrays, and the batch planner never needs them)
+        self._values_list = None
+        self._visible_list = None
+
+    def distance(self, points):
+        """Bilinearly interpolated distance-to-goal at (n, 2) points."""
+        i, j, fx, fy = _locate(self.map, np.asarray(points, dtype=float).reshape(-1, 2))
+        v = self.values
+        return ((v[i, j] * (1 - fx) + v[i + 1, j] * fx) * (1 - fy) +
+                (v[i, j + 1] * (1 - fx) + v[i + 1, j + 1] * fx) * fy)
+
+    def directions(self, points):
+        """(n, 2) unit steering directions (zero where the gradient vanishes)."""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return field_directions(self.values[None], self.visible[None], self.target[None],
+                                self.map, np.zeros(len(points), dtype=np.int64), points)
+
+    def direction(self, pos):
+        """Unit steering direction at a single position (scalar fast path)."""
+        m = self.map
+        h = m.resolution
+        x, y = float(pos[0]), float(pos[1])
+        rx = (x - m.origin[0]) / h
+        ry = (y - m.origin[1]) / h
+        i = min(max(math.floor(rx), 0), m.shape[0] - 2)
+        j = min(max(math.floor(ry), 0), m.shape[1] - 2)
+        fx = min(max(rx - i, 0.0), 1.0)
+        fy = min(max(ry - j, 0.0), 1.0)
+
+        if self._values_list is None:
+            self._values_list = self.values.astype(float).tolist()
+            self._visible_list = self.visible.tolist()
+        vis = self._visible_list
+        if vis[i][j] and vis[i + 1][j] and vis[i][j + 1] and vis[i + 1][j + 1]:
+            sx = self.target[0] - x
+            sy = self.target[1] - y
+        else:
+            v = self._values_list
+            v00, v10, v01, v11 = v[i][j], v[i + 1][j], v[i][j + 1], v[i + 1][j + 1]
+            sx = (v00 - v10) * (1 - fy) + (v01 - v11) * fy
+            sy = (v00 - v01) * (1 - fx) + (v10 - v11) * fx
+        norm = math.hypot(sx, sy)
+        if norm <= 1e-12:
+            return np.zeros(2)
+        return np.array([sx / norm, sy / norm])
+
+
+def _locate(nav_map, points):
+    """Cell indices and fractional offsets of (n, 2) points, clamped to the map."""
+    rel = (points - nav_map.origin) / nav_map.resolution
+    i = np.clip(np.floor(rel[:, 0]).astype(np.int64), 0, nav_map.shape[0] - 2)
+    j = np.clip(np.floor(rel[:, 1]).astype(np.int64), 0, nav_map.shape[1] - 2)
+    fx = np.clip(rel[:, 0] - i, 0.0, 1.0)
+    fy = np.clip(rel[:, 1] - j, 0.0, 1.0)
+    return i, j, fx, fy
+
+
+def field_directions(values, visible, goals, nav_map, which, points):
+    """
+    Steering directions for many runs sharing one map.
+
+    Args:
+        values: (F, nx, ny) stacked NavigationField.values
+        visible: (F, nx, ny) stacked NavigationField.visible
+        goals: (F, 2) target of each field
+        nav_map: the NavigationMap the fields were built on
+        which: (n,) index of each point's field
+        points: (n, 2) positions
+
+    Returns:
+        (n, 2) unit vectors (zero where there is no preferred direction)
+    """
+    i, j, fx, fy = _locate(nav_map, points)
+
+    v00 = values[which, i, j]
+    v10 = values[which, i + 1, j]
+    v01 = values[which, i, j + 1]
+    v11 = values[which, i + 1, j + 1]
+    step = np.empty((len(points), 2))
+    step[:, 0] = (v00 - v10) * (1 - fy) + (v01 - v11) * fy
+    step[:, 1] = (v00 - v01) * (1 - fx) + (v10 - v11) * fx
+
+    # Goal in sight from the whole cell: steer straight at it
+    direct = (visible[which, i, j] & visible[which, i + 1, j] &
+              visible[which, i, j + 1] & visible[which, i + 1, j + 1])
+    step[direct] = goals[which[direct]] - points[direct]
+
+    norm = np.hypot(step[:, 0], step[:, 1])
+    out = np.zeros_like(step)
+    moving = norm > 1e-12
+    out[moving] = step[moving] / norm[moving, None]
+    return out
@@ -0,0 +1,91 @@
+import math
+import numbers
+
+import numpy as np
+
+
+# Bit generators selectable by name. Philox is counter-based, so streams
+# seeded from different SeedSequence children never overlap.
+BIT_GENERATORS = {
+    'pcg64': np.random.PCG64,
+    'philox': np.random.Philox,
+    'sfc64': np.random.SFC64,
+    'mt19937': np.random.MT19937,
+}
+
+
+def make_generator(seed=None, bit_generator='pcg64'):
+    """
+    Build a np.random.Generator from a seed (int, SeedSequence or None)
+    and a bit generator name from BIT_GENERATORS.
+    """
+    try:
+        bit_generator_cls = BIT_GENERATORS[bit_generator]
+    except KeyError:
+        raise ValueError(f"Unknown bit generator {bit_generator!r}, "
+                         f"expected one of {sorted(BIT_GENERATORS)}") from None
+    return np.random.Generator(bit_generator_cls(seed))
+
+
+class NoiseSource:
+    """
+    Block-buffered Gaussian noise stream.
+
+    Standard normals are drawn from a np.random.Generator in large blocks
+    and handed out as read-only views, in strict stream order. The values
+    are the same as drawing them one request at a time from the generator,
+    whatever the block size, so results stay reproducible from the seed.
+
+    normal() has the same signature as Generator.normal, so a NoiseSource
+    can be passed wherever PositionSensor / Simulator2D take an rng.
+
+    With negate=True every value is negated: a source and its negated twin
+    on identically seeded generators give antithetic noise.
+    """
+
+    def __init__(self, rng=None, block_size=8192, negate=False):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.block_size = int(block_size)
+        self.negate = negate
+        self._block = np.empty(0)
+        self._pos = 0
+
+    @classmethod
+    def from_seed(cls, seed=None, bit_generator='pcg64', block_size=8192, negate=False):
+        return cls(make_generator(seed, bit_generator), block_size=block_size, negate=negate)
+
+    def _refill(self, count):
+        """Make at least count values available, keeping the unread tail."""
+        remaining = self._block[self._pos:]
+        block = np.empty(max(self.block_size, count))
+        block[:len(remaining)] = remaining
+        fresh = block[len(remaining):]
+        self.rng.standard_normal(size=len(fresh), out=fresh)
+        if self.negate:
+            np.negative(fresh, out=fresh)
+        block.setflags(write=False)
+        self._block = block
+        self._pos = 0
+
+    def standard_normal(self, size=None):
+        """Next standard normals as a read-only view (a float if size is None)."""
+        if size is None:
+            return float(self.standard_normal(1)[0])
+        if isinstance(size, numbers.Integral):
+            count, shape = int(size), None
+        else:
+            shape = tuple(size)
+            count = math.prod(shape)
+        start = self._pos
+        if start + count > len(self._block):
+            self._refill(count)
+            start = 0
+        self._pos = start + count
+        view = self._block[start:start + count]
+        return view if shape is None else view.reshape(shape)
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        noise = scale * self.standard_normal(size)
+        if loc == 0.0:
+            return noise
+        return noise + loc
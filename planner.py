@@ -1,12 +1,36 @@
 import numpy as np
 
+from navigation import field_directions
+
+
+# Lowest speed factor of clearance-aware speed scaling
+MIN_SPEED_SCALE = 0.25
+
+
+def clearance_speed_scale(clearance, slow_clearance):
+    """(n,) speed factors: 1 beyond slow_clearance, falling linearly to MIN_SPEED_SCALE at contact."""
+    return np.clip(clearance / slow_clearance, MIN_SPEED_SCALE, 1.0)
+
+
 class Planner2D:
-    def __init__(self, goal, max_speed, dt, mu, sigma):
+    def __init__(self, goal, max_speed, dt, mu, sigma, navigation=None,
+                 distance_map=None, slow_clearance=3.0):
+        """
+        navigation: optional NavigationMap; when given, the heading follows
+        the (cached) goal distance field instead of the straight line
+        distance_map: optional sdf.DistanceMap; when given, the speed is
+        scaled down linearly once the clearance drops below slow_clearance
+        """
         self.goal = np.array(goal, dtype=float)
         self.max_speed = max_speed
         self.dt = dt
         self.mu = mu
         self.sigma = sigma
+        self.field = navigation.field(self.goal) if navigation is not None else None
+        # Point actually steered to (goals outside the walls are clamped)
+        self.target = self.field.target if self.field is not None else self.goal
+        self.distance_map = distance_map
+        self.slow_clearance = slow_clearance
 
     def gaussian_speed(self, distance):
         return self.max_speed * np.exp(
@@ -17,20 +41,149 @@ class Planner2D:
         return min(self.max_speed,2)
 
     def velocity_vector(self, kf_pos):
-        direction = self.goal - kf_pos
+        direction = self.target - kf_pos
         distance = np.linalg.norm(direction)
 
         if distance < 1e-6:
             return np.zeros(2)
 
-        unit_direction = direction / distance
+        if self.field is not None:
+            unit_direction = self.field.direction(kf_pos)
+        else:
+            unit_direction = direction / distance
         #speed = self.gaussian_speed(distance)
         #print(f"Gauss: {speed}")
         speed = Planner2D.constant_speed(self)
         speed = min(speed,self.max_speed)
+        if self.distance_map is not None:
+            clearance = self.distance_map.distance_at(kf_pos[0], kf_pos[1])
+            speed *= float(clearance_speed_scale(clearance, self.slow_clearance))
         
         max_allowed_speed = distance / self.dt
         speed = min(speed, max_allowed_speed)
 
         vel = unit_direction * speed
-        return vel
\ No newline at end of file
+        return vel
+
+
+class BatchPlanner2D:
+    """
+    Planner2D for N runs at once, each run steering to its own goal.
+
+    With navigation, runs with the same target share a goal distance field.
+    Fields are built on first use into a pool of slots and released once
+    all of their runs are done (see release), so memory follows the targets
+    in flight. batches() splits the runs into goal-grouped batches that
+    need at most max_fields fields each (None: a single batch).
+    """
+
+    def __init__(self, goals, max_speed, dt, navigation=None, distance_map=None, slow_clearance=3.0,
+                 max_fields=256):
+        self.goals = np.array(goals, dtype=float)
+        self.max_speed = max_speed
+        self.dt = dt
+        self.distance_map = distance_map
+        self.slow_clearance = slow_clearance
+        self.max_fields = max_fields
+
+        self.navigation = navigation
+        if navigation is not None:
+            # Run i steers by the field of target _group[i]
+            self._group_targets, self._group = np.unique(
+                navigation.targets(self.goals), axis=0, return_inverse=True)
+            self._group = self._group.reshape(-1)
+            self._group_runs = np.bincount(self._group, minlength=len(self._group_targets))
+            self._group_slot = np.full(len(self._group_targets), -1, dtype=np.int64)
+            self.targets = self._group_targets[self._group]
+
+            # Slots of the fields in use, grown on demand
+            nx, ny = navigation.shape
+            self._slot_values = np.zeros((0, nx, ny), dtype=np.float32)
+            self._slot_visible = np.zeros((0, nx, ny), dtype=bool)
+            self._slot_targets = np.zeros((0, 2))
+            self._free_slots = []
+        else:
+            self.targets = self.goals
+
+    @property
+    def n_fields(self):
+        """Number of fields currently held."""
+        if self.navigation is None:
+            return 0
+        return int(np.count_nonzero(self._group_slot >= 0))
+
+    def batches(self):
+        """
+        Index arrays of the runs, grouped by target so that each batch
+        needs at most max_fields fields (one batch of all runs without
+        navigation, without max_fields, or when there are few targets).
+        """
+        n = len(self.goals)
+        if (self.navigation is None or self.max_fields is None
+                or len(self._group_targets) <= self.max_fields):
+            return [np.arange(n)]
+        order = np.argsort(self._group, kind='stable')
+        cuts = np.searchsorted(self._group[order],
+                               np.arange(self.max_fields, len(self._group_targets), self.max_fields))
+        return np.split(order, cuts)
+
+    def release(self, done):
+        """Runs done are finished: free the fields no remaining run needs."""
+        if self.navigation is None or not len(done):
+            return
+        groups, counts = np.unique(self._group[done], return_counts=True)
+        self._group_runs[groups] -= counts
+        finished = groups[(self._group_runs[groups] <= 0) & (self._group_slot[groups] >= 0)]
+        self._free_slots.extend(self._group_slot[finished].tolist())
+        self._group_slot[finished] = -1
+
+    def _slots(self, groups):
+        """Slot of each of groups, building the fields missing from the pool."""
+        missing = np.unique(groups[self._group_slot[groups] < 0])
+        for group in missing:
+            if not self._free_slots:
+                self._grow(max(len(missing), len(self._slot_targets)))
+            slot = self._free_slots.pop()
+            field = self.navigation.field(self._group_targets[group])
+            self._slot_values[slot] = field.values
+            self._slot_visible[slot] = field.visible
+            self._slot_targets[slot] = field.target
+            self._group_slot[group] = slot
+        return self._group_slot[groups]
+
+    def _grow(self, extra):
+        size = len(self._slot_targets)
+        pad = ((0, extra), (0, 0), (0, 0))
+        self._slot_values = np.pad(self._slot_values, pad)
+        self._slot_visible = np.pad(self._slot_visible, pad)
+        self._slot_targets = np.pad(self._slot_targets, pad[:2])
+        self._free_slots.extend(range(size + extra - 1, size - 1, -1))
+
+    def constant_speed(self):
+        return min(self.max_speed,2)
+
+    def velocity_vectors(self, kf_pos, idx=None):
+        """
+        kf_pos : (n, 2) position estimates of the runs selected by idx
+        idx    : indices of the runs (default: all)
+        """
+        targets = self.targets if idx is None else self.targets[idx]
+        direction = targets - kf_pos
+        distance = np.linalg.norm(direction, axis=1)
+
+        speed = min(self.constant_speed(), self.max_speed)
+        if self.distance_map is not None:
+            speed = speed * clearance_speed_scale(self.distance_map.distance(kf_pos), self.slow_clearance)
+        speed = np.minimum(speed, distance / self.dt)
+
+        # Runs sitting on their goal get a zero command, as in Planner2D
+        moving = distance >= 1e-6
+        vel = np.zeros_like(direction)
+        if self.navigation is not None:
+            which = self._slots(self._group if idx is None else self._group[idx])
+            heading = field_directions(self._slot_values, self._slot_visible, self._slot_targets,
+                                       self.navigation, which, kf_pos)
+            vel[moving] = heading[moving] * speed[moving, None]
+        else:
+            vel[moving] = direction[moving] * (speed[moving] / distance[moving])[:, None]
+        return vel
@@ -1,23 +1,70 @@
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 
+from trajectory import TrajectoryBuffer, douglas_peucker
+
+
+class _DisplayPath:
+    """
+    Decimated display copy of a TrajectoryBuffer.
+
+    Completed chunks of the path are simplified once with Douglas-Peucker
+    and frozen; only the raw tail since the last chunk is added on every
+    redraw. When the frozen part grows past max_points / 2 it is simplified
+    again with a doubled tolerance, so the number of drawn vertices stays
+    bounded however long the run gets.
+    """
+
+    def __init__(self, buffer, tolerance, chunk=256, max_points=2000):
+        self.buffer = buffer
+        self.base_tolerance = tolerance
+        self.chunk = chunk
+        self.max_points = max_points
+        self.reset()
+
+    def reset(self):
+        self.tolerance = self.base_tolerance
+        self._frozen = np.empty((0, 2))
+        self._done = 0
+
+    def points(self):
+        data = self.buffer.data
+        if len(data) < self._done:
+            self.reset()
+        while len(data) - self._done > self.chunk:
+            end = self._done + self.chunk
+            piece = douglas_peucker(data[self._done:end + 1], self.tolerance)
+            self._frozen = np.concatenate([self._frozen, piece[:-1]])
+            self._done = end
+            if len(self._frozen) > self.max_points // 2:
+                self.tolerance *= 2.0
+                self._frozen = douglas_peucker(self._frozen, self.tolerance)
+        if not len(self._frozen):
+            return data
+        return np.concatenate([self._frozen, data[self._done:]])
+
 
 class Plot2D:
     """Enhanced Plot2D that can visualize boundaries and obstacles."""
     
-    def __init__(self, width, height, start, goal, boundary_constraints=None, obstacle_constraints=None):
-        # ---- Path histories ----
-        self.path_x = [start[0]]
-        self.path_y = [start[1]]
-
-        self.measured_path_x = [start[0]]
-        self.measured_path_y = [start[1]]
-
-        self.kf_path_x = [start[0]]
-        self.kf_path_y = [start[1]]
-
-        self.pred_path_x = [start[0]]
-        self.pred_path_y = [start[1]]
+    def __init__(self, width, height, start, goal, boundary_constraints=None, obstacle_constraints=None,
+                 log_every=1, blit=False, render_every=1, simplify_tolerance=None, max_display_points=2000):
+        """
+        Args:
+            log_every: keep one path point out of every log_every steps
+            blit: redraw only the moving artists over a cached background
+                  (boundaries, obstacles, grid) instead of the whole figure
+            render_every: render one frame every render_every updates
+            simplify_tolerance: Douglas-Peucker tolerance (data units) for the
+                  displayed paths; None uses half a pixel
+            max_display_points: rough cap on the vertices drawn per path
+        """
+        # ---- Path histories (log_every decimates them) ----
+        self.path = TrajectoryBuffer(start, every=log_every)
+        self.measured_path = TrajectoryBuffer(start, every=log_every)
+        self.kf_path = TrajectoryBuffer(start, every=log_every)
+        self.pred_path = TrajectoryBuffer(start, every=log_every)
 
         # ---- Main 2D plot ----
         self.fig, self.ax = plt.subplots(figsize=(9, 9))
@@ -97,6 +144,100 @@ class Plot2D:
                 zorder=20
             )
 
+        # ---- Rendering ----
+        self.render_every = max(1, int(render_every))
+        self._updates = 0
+        self._path_lines = [
+            (self.path_line, self.path),
+            (self.measured_path_line, self.measured_path),
+            (self.kf_path_line, self.kf_path),
+            (self.pred_path_line, self.pred_path),
+        ]
+        self._dynamic = [line for line, _ in self._path_lines] + [
+            self.pos, self.measured_pos, self.kf_pos_plot, self.pred_pos_plot]
+        if self.collision_text is not None:
+            self._dynamic.append(self.collision_text)
+
+        if simplify_tolerance is None:
+            # Half a pixel, in data units
+            x0, x1 = self.ax.get_xlim()
+            y0, y1 = self.ax.get_ylim()
+            simplify_tolerance = 0.5 * min(abs(x1 - x0) / self.ax.bbox.width,
+                                           abs(y1 - y0) / self.ax.bbox.height)
+        self._display_paths = [
+            _DisplayPath(buffer, simplify_tolerance, max_points=max_display_points)
+            for _, buffer in self._path_lines
+        ]
+
+        self.blit = blit and getattr(self.fig.canvas, 'supports_blit', False)
+        self._background = None
+        if self.blit:
+            for artist in self._dynamic:
+                artist.set_animated(True)
+            self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+            plt.show(block=False)
+            self.fig.canvas.draw()
+
+    @property
+    def path_x(self):
+        return self.path.x
+
+    @property
+    def path_y(self):
+        return self.path.y
+
+    @property
+    def measured_path_x(self):
+        return self.measured_path.x
+
+    @property
+    def measured_path_y(self):
+        return self.measured_path.y
+
+    @property
+    def kf_path_x(self):
+        return self.kf_path.x
+
+    @property
+    def kf_path_y(self):
+        return self.kf_path.y
+
+    @property
+    def pred_path_x(self):
+        return self.pred_path.x
+
+    @property
+    def pred_path_y(self):
+        return self.pred_path.y
+
+    def _on_draw(self, event):
+        """Re-capture the static background after every full draw (e.g. resize)."""
+        canvas = self.fig.canvas
+        self._background = canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_dynamic()
+
+    def _draw_dynamic(self):
+        for artist in self._dynamic:
+            self.ax.draw_artist(artist)
+
+    def _render(self):
+        for (line, _), display in zip(self._path_lines, self._display_paths):
+            points = display.points()
+            line.set_data(points[:, 0], points[:, 1])
+
+        if not self.blit:
+            plt.pause(0.05)
+            return
+
+        canvas = self.fig.canvas
+        if self._background is None:
+            canvas.draw()
+        else:
+            canvas.restore_region(self._background)
+            self._draw_dynamic()
+            canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+
     def _draw_boundaries(self, boundary_constraints):
         """Draw boundary walls on the plot with enhanced visualization."""
         x_min = boundary_constraints.x_min
@@ -270,19 +411,16 @@ class Plot2D:
 
         plt.pause(0.05)
 
+    def append(self, pos, measured_pos, kf_pos, pred_pos):
+        """Store a step in the path histories without drawing it."""
+        self.path.append(pos)
+        self.measured_path.append(measured_pos)
+        self.kf_path.append(kf_pos)
+        self.pred_path.append(pred_pos)
+
     def update(self, pos, measured_pos, kf_pos, pred_pos, speed, collision_count=None):
         # ---- Store paths ----
-        self.path_x.append(pos[0])
-        self.path_y.append(pos[1])
-
-        self.measured_path_x.append(measured_pos[0])
-        self.measured_path_y.append(measured_pos[1])
-
-        self.kf_path_x.append(kf_pos[0])
-        self.kf_path_y.append(kf_pos[1])
-
-        self.pred_path_x.append(pred_pos[0])
-        self.pred_path_y.append(pred_pos[1])
+        self.append(pos, measured_pos, kf_pos, pred_pos)
 
         # ---- Update current points (MUST be sequences) ----
         self.pos.set_data([pos[0]], [pos[1]])
@@ -290,12 +428,6 @@ class Plot2D:
         self.kf_pos_plot.set_data([kf_pos[0]], [kf_pos[1]])
         self.pred_pos_plot.set_data([pred_pos[0]], [pred_pos[1]])
 
-        # ---- Update paths ----
-        self.path_line.set_data(self.path_x, self.path_y)
-        self.measured_path_line.set_data(self.measured_path_x, self.measured_path_y)
-        self.kf_path_line.set_data(self.kf_path_x, self.kf_path_y)
-        self.pred_path_line.set_data(self.pred_path_x, self.pred_path_y)
-
         # ---- Speed plot ----
         #self.speed_history.append(speed)
         #self.speed_line.set_data(
@@ -310,9 +442,19 @@ class Plot2D:
         if self.collision_text is not None and collision_count is not None:
             self.collision_text.set_text(f"Collisions: {collision_count}")
 
-        plt.pause(0.05)
+        # ---- Render (paths are decimated for display) ----
+        self._updates += 1
+        if self._updates % self.render_every == 0:
+            self._render()
 
     def show(self):
+        # Final frame: full-resolution paths, drawn as regular artists
+        for line, buffer in self._path_lines:
+            line.set_data(buffer.x, buffer.y)
+        if self.blit:
+            for artist in self._dynamic:
+                artist.set_animated(False)
+            self.blit = False
         plt.show()
 
 
@@ -335,10 +477,12 @@ class ErrorPlotter:
 
         self.ax.legend()
 
-    def update(self, measured_error, pred_error, kf_error):
+    def update(self, measured_error, pred_error, kf_error, render=True):
         self.measured_error_hist.append(measured_error)
         self.pred_error_hist.append(pred_error)
         self.kf_error_hist.append(kf_error)
+        if not render:
+            return
 
         t = range(len(self.measured_error_hist))
 
@@ -0,0 +1,185 @@
+import json
+from time import perf_counter_ns
+
+import numpy as np
+
+
+# Histogram bucket b holds durations of bit length b, i.e. [2^(b-1), 2^b) ns
+N_BUCKETS = 64
+
+
+class TimingHistogram:
+    """Log2-bucketed histogram of durations in nanoseconds, plus exact count / total / min / max."""
+
+    __slots__ = ('count', 'total_ns', 'min_ns', 'max_ns', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        self.buckets = [0] * N_BUCKETS
+
+    def add(self, ns):
+        self.count += 1
+        self.total_ns += ns
+        if self.min_ns is None or ns < self.min_ns:
+            self.min_ns = ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.buckets[ns.bit_length()] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total_ns += other.total_ns
+        if other.min_ns is not None and (self.min_ns is None or other.min_ns < self.min_ns):
+            self.min_ns = other.min_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        return self
+
+    @property
+    def mean_ns(self):
+        return self.total_ns / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """
+        Approximate q-th percentile (0-100), interpolated linearly within
+        the bucket holding it and clipped to the exact min / max.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(q / 100.0 * self.count, 1)
+        cumulative = np.cumsum(self.buckets)
+        b = int(np.searchsorted(cumulative, rank))
+        lo = 0.0 if b == 0 else 2.0 ** (b - 1)
+        below = cumulative[b] - self.buckets[b]
+        value = lo + lo * (rank - below) / self.buckets[b]
+        return float(min(max(value, self.min_ns), self.max_ns))
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_ns': self.total_ns,
+            'min_ns': self.min_ns,
+            'max_ns': self.max_ns,
+            'buckets': self.buckets,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        h = cls()
+        h.count = data['count']
+        h.total_ns = data['total_ns']
+        h.min_ns = data['min_ns']
+        h.max_ns = data['max_ns']
+        h.buckets = list(data['buckets']) + [0] * (N_BUCKETS - len(data['buckets']))
+        return h
+
+
+class StageProfiler:
+    """
+    Per-stage timing histograms and event counters for the simulation loop.
+
+    Instrumented code takes an optional profiler and does nothing when it
+    is None, so profiling is off by default and costs one comparison per
+    stage. With a profiler, each stage costs one perf_counter_ns() call
+    and a histogram update (a few hundred nanoseconds).
+
+    The loop stages are timed back to back with lap(): start() sets the
+    mark and every lap(name) charges the time since the previous mark to
+    name. Nested timings (e.g. inside Simulator2D.step) use add() with
+    their own start times and are named '<stage>.<part>', so they don't
+    move the mark.
+
+    Profilers of different runs or worker processes are combined with
+    merge(); to_dict() / dump() give a JSON document that from_dict() /
+    load() read back.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self._mark = 0
+
+    def start(self):
+        """Set the lap mark (call at the top of every loop iteration)."""
+        self._mark = perf_counter_ns()
+
+    def lap(self, stage):
+        """Charge the time since the last start() / lap() to stage."""
+        now = perf_counter_ns()
+        self.add(stage, now - self._mark)
+        self._mark = now
+
+    def add(self, stage, ns):
+        """Record one duration of stage, in nanoseconds."""
+        hist = self.stages.get(stage)
+        if hist is None:
+            hist = self.stages[stage] = TimingHistogram()
+        hist.add(ns)
+
+    def count(self, name, n=1):
+        """Increment event counter name by n."""
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def merge(self, other):
+        """Fold another StageProfiler (e.g. from a worker) into this one."""
+        for stage, hist in other.stages.items():
+            if stage in self.stages:
+                self.stages[stage].merge(hist)
+            else:
+                self.stages[stage] = TimingHistogram().merge(hist)
+        for name, n in other.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + n
+        return self
+
+    def to_dict(self):
+        return {
+            'stages': {stage: hist.to_dict() for stage, hist in self.stages.items()},
+            'counters': dict(self.counters),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        profiler = cls()
+        profiler.stages = {stage: TimingHistogram.from_dict(h) for stage, h in data['stages'].items()}
+        profiler.counters = dict(data['counters'])
+        return profiler
+
+    def dump(self, path):
+        """Write the machine-readable dump (JSON) to path."""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        return path
+
+    @classmethod
+    def load(cls, *paths):
+        """Read and merge one or more dumps."""
+        profiler = cls()
+        for path in paths:
+            with open(path) as f:
+                profiler.merge(cls.from_dict(json.load(f)))
+        return profiler
+
+    def summary(self):
+        """
+        Summary table: calls, total and share of the loop time (sum of the
+        top-level stages), mean / p50 / p99 / max per call, then counters.
+        """
+        loop_ns = sum(h.total_ns for stage, h in self.stages.items() if '.' not in stage) or 1
+        lines = [f"{'stage':<20}{'calls':>10}{'total ms':>11}{'share':>8}"
+                 f"{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'max us':>10}"]
+        for stage in sorted(self.stages):
+            h = self.stages[stage]
+            name = stage if '.' not in stage else '  ' + stage
+            lines.append(
+                f"{name:<20}{h.count:>10}{h.total_ns / 1e6:>11.1f}{h.total_ns / loop_ns:>8.1%}"
+                f"{h.mean_ns / 1e3:>10.2f}{h.percentile(50) / 1e3:>10.2f}"
+                f"{h.percentile(99) / 1e3:>10.2f}{h.max_ns / 1e3:>10.2f}")
+        if self.counters:
+            lines.append('')
+            lines.append(f"{'counter':<30}{'count':>12}")
+            for name in sorted(self.counters):
+                lines.append(f"{name:<30}{self.counters[name]:>12}")
+        return '\n'.join(lines)
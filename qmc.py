@@ -0,0 +1,112 @@
+import numpy as np
+
+
+# Primitive polynomials and initial direction numbers of Sobol dimensions
+# 2.. (Joe & Kuo, new-joe-kuo-6.21201): (degree s, coefficients a, m_1..m_s).
+# Dimension 1 is the van der Corput sequence.
+_JOE_KUO = (
+    (1, 0, (1,)),
+    (2, 1, (1, 3)),
+    (3, 1, (1, 3, 1)),
+    (3, 2, (1, 1, 1)),
+    (4, 1, (1, 1, 3, 3)),
+    (4, 4, (1, 3, 5, 13)),
+    (5, 2, (1, 1, 5, 5, 17)),
+)
+
+MAX_DIMS = len(_JOE_KUO) + 1
+
+# Bits of every coordinate: points 0 .. 2^BITS - 1 are distinct
+BITS = 32
+
+
+def _direction_numbers(dims):
+    """(dims, BITS) uint64 direction numbers v_k, most significant bit first."""
+    v = np.zeros((dims, BITS), dtype=np.uint64)
+    v[0] = [1 << (BITS - 1 - k) for k in range(BITS)]
+    for d in range(1, dims):
+        s, a, m_init = _JOE_KUO[d - 1]
+        m = list(m_init)
+        for k in range(s, BITS):
+            value = m[k - s] ^ (m[k - s] << s)
+            for j in range(1, s):
+                if (a >> (s - 1 - j)) & 1:
+                    value ^= m[k - j] << j
+            m.append(value)
+        v[d] = [m[k] << (BITS - 1 - k) for k in range(BITS)]
+    return v
+
+
+def _parity(x):
+    """Bitwise parity of every uint64 in x."""
+    x = x.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        x ^= x >> np.uint64(shift)
+    return x & np.uint64(1)
+
+
+class SobolSequence:
+    """
+    Sobol low-discrepancy sequence in up to MAX_DIMS dimensions, optionally
+    scrambled.
+
+    Scrambling is Matousek's linear matrix scramble plus a random digital
+    shift: every coordinate's direction numbers are multiplied (over GF(2))
+    by a random unit lower-triangular bit matrix, and the points are XORed
+    with a random shift. Each scramble is again a (t, s)-sequence, so the
+    points keep their even spread, while the randomization makes the
+    estimates of independent scrambles unbiased and independent (which is
+    how their variance is measured).
+    """
+
+    def __init__(self, dims, seed=None, scramble=True):
+        """
+        Args:
+            dims: number of coordinates
+            seed: seed of the scramble (int, SeedSequence or None)
+            scramble: False gives the plain Sobol points
+        """
+        if not 1 <= dims <= MAX_DIMS:
+            raise ValueError(f"SobolSequence supports 1 to {MAX_DIMS} dimensions, got {dims}")
+        self.dims = dims
+        v = _direction_numbers(dims)
+        self._shift = np.zeros(dims, dtype=np.uint64)
+
+        if scramble:
+            rng = np.random.default_rng(seed)
+            for d in range(dims):
+                # Row i of L: bit i (its diagonal) plus random more significant bits
+                rows = rng.integers(0, 2, size=(BITS, BITS), dtype=np.uint64)
+                rows = np.tril(rows, -1)
+                rows[np.arange(BITS), np.arange(BITS)] = 1
+                masks = (rows << np.arange(BITS - 1, -1, -1, dtype=np.uint64)).sum(
+                    axis=1, dtype=np.uint64)
+                scrambled = np.zeros(BITS, dtype=np.uint64)
+                for i in range(BITS):
+                    bit = _parity(v[d] & masks[i])
+                    scrambled |= bit << np.uint64(BITS - 1 - i)
+                v[d] = scrambled
+            self._shift = rng.integers(0, 1 << BITS, size=dims, dtype=np.uint64)
+        self._v = v
+
+    def integers(self, indices):
+        """(n, dims) BITS-bit integer coordinates of the points with these indices."""
+        indices = np.asarray(indices, dtype=np.uint64).reshape(-1)
+        x = np.broadcast_to(self._shift, (len(indices), self.dims)).copy()
+        one = np.uint64(1)
+        for k in range(BITS):
+            bit = ((indices >> np.uint64(k)) & one).astype(bool)
+            if not bit.any():
+                if not (indices >> np.uint64(k)).any():
+                    break
+                continue
+            x[bit] ^= self._v[:, k]
+        return x
+
+    def points(self, indices):
+        """(n, dims) points in [0, 1) with these indices."""
+        return (self.integers(indices).astype(float) + 0.5) / float(1 << BITS)
+
+    def random(self, n):
+        """The first n points; balanced when n is a power of two."""
+        return self.points(np.arange(n))
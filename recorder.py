@@ -0,0 +1,200 @@
+import os
+import struct
+
+import numpy as np
+
+
+# Per-step record layout: field -> (dtype, per-step shape)
+RECORD_FIELDS = {
+    'true_pos': (np.float64, (2,)),
+    'measured_pos': (np.float64, (2,)),
+    'kf_state': (np.float64, (4,)),
+    'pred_pos': (np.float64, (2,)),
+    'speed': (np.float64, ()),
+    'collision': (np.bool_, ()),
+}
+
+INDEX_FILE = 'runs.npy'
+RUN_IDS_FILE = 'run_ids.npy'
+_HEADER_SIZE = 128
+
+
+def _npy_header(dtype, shape):
+    """
+    Fixed-size .npy (v1.0) header, so it can be rewritten in place with the
+    final row count once the file has been streamed.
+    """
+    text = repr({
+        'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+        'fortran_order': False,
+        'shape': tuple(shape),
+    })
+    pad = _HEADER_SIZE - 10 - len(text) - 1
+    if pad < 0:
+        raise ValueError(f"Header for shape {shape} does not fit in {_HEADER_SIZE} bytes")
+    header = (text + ' ' * pad + '\n').encode('latin1')
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header
+
+
+class TrajectoryRecorder:
+    """
+    Streams per-step records (true, measured, KF, predicted position, speed,
+    collision flag) of many runs into one columnar .npy file per field, plus
+    runs.npy with the row offset of every run and run_ids.npy with its id
+    (runs may be stored out of order, e.g. as a batch finishes them).
+
+    Records are collected in an in-memory block of buffer_steps rows and
+    written out in bulk when it fills up, never per step. The .npy headers
+    get their final row counts in close().
+    """
+
+    def __init__(self, directory, buffer_steps=4096):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.buffer_steps = int(buffer_steps)
+
+        self._files = {}
+        self._buffers = {}
+        for name, (dtype, shape) in RECORD_FIELDS.items():
+            f = open(os.path.join(directory, name + '.npy'), 'wb')
+            f.write(_npy_header(dtype, (0,) + shape))
+            self._files[name] = f
+            self._buffers[name] = np.empty((self.buffer_steps,) + shape, dtype=dtype)
+
+        self._buffered = 0
+        self.n_rows = 0
+        self.offsets = [0]
+        self.run_ids = []
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def n_runs(self):
+        return len(self.offsets) - 1
+
+    def record(self, true_pos, measured_pos, kf_state, pred_pos, speed, collision):
+        """Append one step of the current run."""
+        i = self._buffered
+        b = self._buffers
+        b['true_pos'][i] = true_pos
+        b['measured_pos'][i] = measured_pos
+        b['kf_state'][i] = kf_state
+        b['pred_pos'][i] = pred_pos
+        b['speed'][i] = speed
+        b['collision'][i] = collision
+        self._buffered = i + 1
+        if self._buffered == self.buffer_steps:
+            self.flush()
+
+    def end_run(self, run_id=None):
+        """
+        Close the current run; the next record starts a new one. run_id
+        defaults to the run's position in the recording.
+        """
+        self.run_ids.append(self.n_runs if run_id is None else int(run_id))
+        self.offsets.append(self.n_rows + self._buffered)
+
+    def record_run(self, run_id=None, **columns):
+        """
+        Append a whole run at once: one (steps, ...) array per field of
+        RECORD_FIELDS. Goes through the same block buffer as record().
+
+        Raises:
+            ValueError: if a run started with record() hasn't been ended
+        """
+        if self.offsets[-1] != self.n_rows + self._buffered:
+            raise ValueError("record_run() during an unfinished run, call end_run() first")
+        steps = len(columns['true_pos'])
+        done = 0
+        while done < steps:
+            n = min(steps - done, self.buffer_steps - self._buffered)
+            for name, buffer in self._buffers.items():
+                buffer[self._buffered:self._buffered + n] = columns[name][done:done + n]
+            self._buffered += n
+            done += n
+            if self._buffered == self.buffer_steps:
+                self.flush()
+        self.end_run(run_id)
+
+    def flush(self):
+        """Write the buffered rows out."""
+        n = self._buffered
+        if n:
+            for name, f in self._files.items():
+                f.write(self._buffers[name][:n].tobytes())
+            self.n_rows += n
+            self._buffered = 0
+
+    def close(self):
+        if self.closed:
+            return
+        if self.offsets[-1] != self.n_rows + self._buffered:
+            self.end_run()
+        self.flush()
+        for name, f in self._files.items():
+            dtype, shape = RECORD_FIELDS[name]
+            f.seek(0)
+            f.write(_npy_header(dtype, (self.n_rows,) + shape))
+            f.close()
+        np.save(os.path.join(self.directory, INDEX_FILE), np.asarray(self.offsets, dtype=np.int64))
+        np.save(os.path.join(self.directory, RUN_IDS_FILE), np.asarray(self.run_ids, dtype=np.int64))
+        self.closed = True
+
+
+class TrajectoryLog:
+    """
+    Read-only, memory-mapped view of a TrajectoryRecorder directory.
+    Single runs or slices of runs are returned as zero-copy views.
+
+    run(i) looks runs up by id; runs(), steps() and iteration follow the
+    storage order, whose ids are run_ids.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.offsets = np.load(os.path.join(directory, INDEX_FILE))
+        ids_path = os.path.join(directory, RUN_IDS_FILE)
+        if os.path.exists(ids_path):
+            self.run_ids = np.load(ids_path)
+        else:
+            self.run_ids = np.arange(len(self.offsets) - 1)
+        self._position = {int(run_id): k for k, run_id in enumerate(self.run_ids)}
+        self.fields = {
+            name: np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+            for name in RECORD_FIELDS
+        }
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def steps(self):
+        """(n_runs,) number of recorded steps per run."""
+        return np.diff(self.offsets)
+
+    def run(self, i):
+        """Dict of field -> (steps, ...) view for the run with id i."""
+        return self._stored(self._position[int(i)])
+
+    def _stored(self, k):
+        start, stop = self.offsets[k], self.offsets[k + 1]
+        return {name: data[start:stop] for name, data in self.fields.items()}
+
+    def runs(self, start=None, stop=None):
+        """
+        Fields of a contiguous slice of stored runs (ids run_ids[start:stop]),
+        plus their row offsets relative to the returned views (for np.split
+        or reduceat).
+        """
+        first, last, _ = slice(start, stop).indices(len(self))
+        rows = slice(self.offsets[first], self.offsets[last])
+        views = {name: data[rows] for name, data in self.fields.items()}
+        return views, self.offsets[first:last + 1] - self.offsets[first]
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self._stored(k)
@@ -0,0 +1,276 @@
+import dataclasses
+import hashlib
+import json
+import numbers
+import os
+import tempfile
+
+import numpy as np
+
+from campaign import run_batch, run_campaign
+from montecarlo import MonteCarloResult, concat_results
+from stats import StepStats
+
+
+# Modules whose code determines a campaign's results; editing any of them
+# changes code_version() and so invalidates every cached entry
+SOURCE_MODULES = ('boundaries', 'campaign', 'filters', 'montecarlo', 'navigation', 'noise',
+                  'planner', 'qmc', 'sdf', 'sensors', 'simulator', 'stats', 'trajectory')
+
+_code_version = None
+
+
+def code_version():
+    """SHA-256 of the source of SOURCE_MODULES."""
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in SOURCE_MODULES:
+            with open(os.path.join(here, name + '.py'), 'rb') as f:
+                digest.update(name.encode() + b'\0' + f.read() + b'\0')
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+def _as_float(value):
+    """Numbers (also inside tuples) as floats; bools and None unchanged."""
+    if isinstance(value, (tuple, list)):
+        return [_as_float(v) for v in value]
+    if isinstance(value, numbers.Real) and not isinstance(value, (bool, np.bool_)):
+        return float(value)
+    return value
+
+
+def _normalized(config):
+    """
+    Field values of config in one canonical form, so equal configs hash the
+    same: float fields (and the geometry tuples) as floats, int fields as
+    ints, whatever number types they were given as.
+    """
+    values = {}
+    for field in dataclasses.fields(config):
+        value = getattr(config, field.name)
+        if value is None or isinstance(value, (bool, np.bool_, str)):
+            values[field.name] = value if not isinstance(value, np.bool_) else bool(value)
+        elif field.type is int:
+            values[field.name] = int(value)
+        else:
+            values[field.name] = _as_float(value)
+    return values
+
+
+def config_key(config, engine='campaign', n_runs=None):
+    """
+    Content address of a campaign: SHA-256 of every SimulationConfig field
+    (noise levels, dt, boundary, obstacles, filter mode, seed, ...), the
+    engine and the code version.
+
+    Campaign-engine runs are independent of each other (one SeedSequence
+    child per run), so their key leaves out n_runs and one entry serves
+    any number of runs. The batch engine shares one noise stream between
+    runs, so its key includes n_runs, as does the 'prefix' entry holding
+    the first n_runs campaign runs when they can't be sliced out of the
+    campaign entry. Number types don't matter: configs that compare equal
+    (e.g. max_speed=2 and max_speed=2.0) get the same key.
+    """
+    spec = {
+        'config': _normalized(config),
+        'engine': engine,
+        'n_runs': n_runs if engine in ('batch', 'prefix') else None,
+        'code': code_version(),
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _slice_result(result, n_runs):
+    """The first n_runs runs of a result with histories (statistics recomputed)."""
+    return MonteCarloResult(
+        result.meas_errors[:n_runs],
+        result.kf_errors[:n_runs],
+        result.pred_errors[:n_runs],
+        result.steps[:n_runs],
+        result.collision_counts[:n_runs],
+        result.goal_reached[:n_runs]
+    )
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of Monte Carlo campaign results.
+
+    Each entry is one .npz file named by config_key(): the per-run steps,
+    collision counts and goal flags, the aggregated StepStats and, if the
+    campaign kept them, the per-run error histories. Entries are written
+    atomically, so several processes (e.g. sweep workers) can share a
+    directory.
+
+    Reading an entry refreshes its modification time; when the directory
+    grows past max_bytes the least recently used entries are removed.
+
+    For the campaign engine, asking for more runs than an entry holds only
+    simulates the missing runs (run_campaign(first_run=...)) and stores the
+    extended entry. Its per-run results are identical to a fresh campaign;
+    the merged statistics agree up to floating-point rounding. Fewer runs
+    are sliced out of an entry with histories; without them the per-step
+    statistics of the first runs are unknown, so those runs are simulated
+    once and kept in a prefix entry of their own. Extending an entry
+    without histories keeps the runs it had as such a prefix entry, so
+    growing a campaign step by step (e.g. adaptive.run_adaptive) leaves
+    every step servable.
+    """
+
+    SUFFIX = '.npz'
+
+    def __init__(self, directory, max_bytes=1 << 30):
+        """
+        Args:
+            directory: cache directory (created if missing)
+            max_bytes: size bound of the directory, enforced on every store
+        """
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        os.makedirs(directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.computed_runs = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def load(self, key):
+        """Cached MonteCarloResult for key, or None."""
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                stats = StepStats.from_dict({name[6:]: data[name] for name in data.files
+                                             if name.startswith('stats_')})
+                has_errors = 'errors' in data.files
+                errors = data['errors'] if has_errors else (None, None, None)
+                result = MonteCarloResult(
+                    errors[0], errors[1], errors[2],
+                    data['steps'], data['collisions'], data['reached'],
+                    stats=stats
+                )
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return result
+
+    def store(self, key, result):
+        """Write result under key, then evict down to max_bytes."""
+        arrays = {
+            'steps': np.asarray(result.steps),
+            'collisions': np.asarray(result.collision_counts),
+            'reached': np.asarray(result.goal_reached),
+        }
+        arrays.update({'stats_' + name: value for name, value in result.stats.to_dict().items()})
+        if result.kf_errors is not None:
+            arrays['errors'] = np.stack((result.meas_errors, result.kf_errors, result.pred_errors))
+
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.evict()
+
+    def entries(self):
+        """(path, size, last use) of every entry, least recently used first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, st.st_size, st.st_mtime))
+        return sorted(entries, key=lambda e: e[2])
+
+    @property
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            os.remove(path)
+
+    def campaign_runs(self, config):
+        """Number of campaign-engine runs of config in the cache (0 if none)."""
+        cached = self.load(config_key(config))
+        return cached.n_runs if cached is not None else 0
+
+    def run(self, config, n_runs, vectorized=False, workers=None, keep_histories=False):
+        """
+        Cached run_monte_carlo(): return the stored result if it covers the
+        request, extend it with the missing runs (campaign engine), or run
+        the campaign and store it.
+        """
+        if vectorized:
+            key = config_key(config, 'batch', n_runs)
+            result = self.load(key)
+            if result is not None and (result.kf_errors is not None or not keep_histories):
+                self.hits += 1
+                return result
+            self.misses += 1
+            result = run_batch(config, n_runs, keep_histories=keep_histories)
+            self.computed_runs += n_runs
+            self.store(key, result)
+            return result
+
+        key = config_key(config)
+        cached = self.load(key)
+        has_histories = cached is not None and cached.kf_errors is not None
+        if cached is not None and (has_histories or not keep_histories):
+            if cached.n_runs == n_runs:
+                self.hits += 1
+                return cached
+            if cached.n_runs > n_runs and has_histories:
+                self.hits += 1
+                return _slice_result(cached, n_runs)
+            if cached.n_runs < n_runs:
+                self.hits += 1
+                tail = run_campaign(config, n_runs - cached.n_runs, workers,
+                                    keep_histories=has_histories, first_run=cached.n_runs)
+                self.computed_runs += n_runs - cached.n_runs
+                if not has_histories:
+                    self.store(config_key(config, 'prefix', cached.n_runs), cached)
+                result = concat_results(cached, tail)
+                self.store(key, result)
+                return result
+
+        # The first runs of a bigger entry without histories: prefix entry
+        if cached is not None and cached.n_runs > n_runs:
+            key = config_key(config, 'prefix', n_runs)
+            prefix = self.load(key)
+            if prefix is not None and (prefix.kf_errors is not None or not keep_histories):
+                self.hits += 1
+                return prefix
+
+        # Nothing usable: run from scratch
+        self.misses += 1
+        result = run_campaign(config, n_runs, workers, keep_histories=keep_histories)
+        self.computed_runs += n_runs
+        self.store(key, result)
+        return result
@@ -0,0 +1,132 @@
+import math
+
+import numpy as np
+
+
+def _box_distance(x, y, box):
+    """Signed distance from grid points to an axis-aligned box (negative inside)."""
+    x_min, x_max, y_min, y_max = box
+    cx, cy = 0.5 * (x_min + x_max), 0.5 * (y_min + y_max)
+    qx = np.abs(x - cx) - 0.5 * (x_max - x_min)
+    qy = np.abs(y - cy) - 0.5 * (y_max - y_min)
+    outside = np.hypot(np.maximum(qx, 0.0), np.maximum(qy, 0.0))
+    inside = np.minimum(np.maximum(qx, qy), 0.0)
+    return outside + inside
+
+
+class DistanceMap:
+    """
+    Signed distance field of the free space, shared by collision checking
+    and planning.
+
+    The forbidden set is everything outside the boundary box shrunk by the
+    vehicle radius, plus every obstacle inflated by it, so the field is the
+    clearance of the vehicle's centre: positive in free space, negative
+    inside walls and obstacles. It is stored as a float32 node grid
+    (slightly larger than the boundary box) and read with bilinear
+    interpolation, which is off by at most `margin`.
+
+    Obstacles added to the ObstacleConstraints later are folded in lazily,
+    on the next query, without rebuilding the rest of the field.
+    """
+
+    def __init__(self, boundary_constraints, obstacle_constraints=None, resolution=0.5, pad=2.0):
+        """
+        Args:
+            boundary_constraints: BoundaryConstraints (extent, radius)
+            obstacle_constraints: optional ObstacleConstraints (inflated boxes)
+            resolution: node spacing in world units
+            pad: extra map extent around the boundary box
+        """
+        b = boundary_constraints
+        self.boundary = b
+        self.obstacles = obstacle_constraints
+        self.resolution = float(resolution)
+        self.origin = np.array([b.x_min - pad, b.y_min - pad], dtype=float)
+        self._origin_x, self._origin_y = float(self.origin[0]), float(self.origin[1])
+        self.shape = (int(np.ceil((b.x_max - b.x_min + 2 * pad) / resolution)) + 1,
+                      int(np.ceil((b.y_max - b.y_min + 2 * pad) / resolution)) + 1)
+        # Upper bound of the bilinear interpolation error of a 1-Lipschitz field
+        self.margin = self.resolution
+        # Largest distance from a point to its nearest node (plus float32 slack)
+        self._node_margin = self.resolution * math.sqrt(0.5) + 1e-4
+
+        xs = self.origin[0] + self.resolution * np.arange(self.shape[0])
+        ys = self.origin[1] + self.resolution * np.arange(self.shape[1])
+        self._x, self._y = np.meshgrid(xs, ys, indexing='ij')
+
+        walls = (b.x_min + b.radius, b.x_max - b.radius, b.y_min + b.radius, b.y_max - b.radius)
+        self.values = (-_box_distance(self._x, self._y, walls)).astype(np.float32)
+        self.n_obstacles = 0
+        self.refresh()
+
+    def refresh(self):
+        """Fold in obstacles added since the last call. Returns True if any were."""
+        if self.obstacles is None or self.obstacles.n_obstacles == self.n_obstacles:
+            return False
+        boxes = self.obstacles.inflated_boxes
+        for box in boxes[self.n_obstacles:]:
+            np.minimum(self.values, _box_distance(self._x, self._y, box), out=self.values)
+        self.n_obstacles = len(boxes)
+        return True
+
+    def _locate(self, points):
+        rel = (points - self.origin) / self.resolution
+        i = np.clip(np.floor(rel[:, 0]).astype(np.int64), 0, self.shape[0] - 2)
+        j = np.clip(np.floor(rel[:, 1]).astype(np.int64), 0, self.shape[1] - 2)
+        fx = np.clip(rel[:, 0] - i, 0.0, 1.0)
+        fy = np.clip(rel[:, 1] - j, 0.0, 1.0)
+        return i, j, fx, fy
+
+    def distance(self, points):
+        """(n,) interpolated clearance at (n, 2) points."""
+        self.refresh()
+        i, j, fx, fy = self._locate(np.asarray(points, dtype=float).reshape(-1, 2))
+        v = self.values
+        return ((v[i, j] * (1 - fx) + v[i + 1, j] * fx) * (1 - fy) +
+                (v[i, j + 1] * (1 - fx) + v[i + 1, j + 1] * fx) * fy)
+
+    def gradient(self, points):
+        """(n, 2) gradient of the interpolated clearance (points away from walls)."""
+        self.refresh()
+        i, j, fx, fy = self._locate(np.asarray(points, dtype=float).reshape(-1, 2))
+        v = self.values
+        grad = np.empty((len(i), 2))
+        grad[:, 0] = ((v[i + 1, j] - v[i, j]) * (1 - fy) + (v[i + 1, j + 1] - v[i, j + 1]) * fy)
+        grad[:, 1] = ((v[i, j + 1] - v[i, j]) * (1 - fx) + (v[i + 1, j + 1] - v[i + 1, j]) * fx)
+        return grad / self.resolution
+
+    def distance_at(self, x, y):
+        """Scalar distance() for a single point, without numpy overhead."""
+        if self.obstacles is not None and self.obstacles.n_obstacles != self.n_obstacles:
+            self.refresh()
+        rx = (x - self._origin_x) / self.resolution
+        ry = (y - self._origin_y) / self.resolution
+        i = min(max(math.floor(rx), 0), self.shape[0] - 2)
+        j = min(max(math.floor(ry), 0), self.shape[1] - 2)
+        fx = min(max(rx - i, 0.0), 1.0)
+        fy = min(max(ry - j, 0.0), 1.0)
+        v = self.values.item
+        return ((v(i, j) * (1 - fx) + v(i + 1, j) * fx) * (1 - fy) +
+                (v(i, j + 1) * (1 - fx) + v(i + 1, j + 1) * fx) * fy)
+
+    def clear_at(self, x, y, reach):
+        """
+        Scalar clear_of() from the nearest node alone: the field is
+        1-Lipschitz, so clearance >= node value - distance to the node.
+        """
+        if self.obstacles is not None and self.obstacles.n_obstacles != self.n_obstacles:
+            self.refresh()
+        i = round((x - self._origin_x) / self.resolution)
+        j = round((y - self._origin_y) / self.resolution)
+        if not (0 <= i < self.shape[0] and 0 <= j < self.shape[1]):
+            return False
+        return self.values.item(i, j) > reach + self._node_margin
+
+    def clear_of(self, points, reach):
+        """
+        (n,) True where a disc of radius reach around each point certainly
+        contains no wall or obstacle, e.g. reach = length of the next move.
+        False only means "check exactly".
+        """
+        return self.distance(points) > np.asarray(reach) + self.margin
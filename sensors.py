@@ -1,22 +1,49 @@
 import numpy as np
 
+from trajectory import TrajectoryBuffer
+
 class PositionSensor:
-    def __init__(self, sensor_noise_std, start):
+    def __init__(self, sensor_noise_std, start, rng=None, log_path=True, log_every=1):
         self.sensor_noise_std = sensor_noise_std
+        # Noise source: a np.random.Generator, or the global np.random state
+        self.rng = rng if rng is not None else np.random
         self.measured_pos = start
 
-        self.measured_path_x = [start[0]]
-        self.measured_path_y = [start[1]]
+        # Logging (log_path=False turns it off, log_every decimates it)
+        self.measured_path = TrajectoryBuffer(start, enabled=log_path, every=log_every)
+
+    @property
+    def measured_path_x(self):
+        return self.measured_path.x
+
+    @property
+    def measured_path_y(self):
+        return self.measured_path.y
 
     def sense_position(self, true_pos):
-        noise = np.random.normal(
+        noise = self.rng.normal(
             loc=0.0,
             scale=self.sensor_noise_std,
             size=2
         )
         self.measured_pos = true_pos + noise
 
-        self.measured_path_x.append(self.measured_pos[0])
-        self.measured_path_y.append(self.measured_pos[1])
+        self.measured_path.append(self.measured_pos)
+
+        return self.measured_pos
+
+
+class BatchPositionSensor:
+    """PositionSensor for N runs at once: senses an (N, 2) array of positions."""
 
-        return self.measured_pos
\ No newline at end of file
+    def __init__(self, sensor_noise_std, rng=None):
+        self.sensor_noise_std = sensor_noise_std
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    def sense_positions(self, true_pos):
+        noise = self.rng.normal(
+            loc=0.0,
+            scale=self.sensor_noise_std,
+            size=np.shape(true_pos)
+        )
+        return true_pos + noise
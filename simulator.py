@@ -1,34 +1,52 @@
+import math
+from time import perf_counter_ns
+
 import numpy as np
 from boundaries import BoundaryConstraints, ObstacleConstraints
+from trajectory import TrajectoryBuffer
 
 class Simulator2D:
     def __init__(self, start, goal, dt, motion_noise_std, max_speed, 
-                 boundary_constraints, obstacle_constraints=None):
+                 boundary_constraints, obstacle_constraints=None, rng=None,
+                 log_path=True, log_every=1, distance_map=None, profiler=None):
         self.pos = np.array(start, dtype=float)
         self.goal = np.array(goal, dtype=float)
 
         self.dt = dt
         self.motion_noise_std = motion_noise_std
         self.max_speed = max_speed
+        # Noise source: a np.random.Generator, or the global np.random state
+        self.rng = rng if rng is not None else np.random
 
         # Velocity tracking
         self.vel = np.zeros(2)
 
         self.boundarycon=boundary_constraints
         self.obscon=obstacle_constraints
+        # Optional sdf.DistanceMap of the same world, for fast free-move rejection
+        self.distance_map = distance_map
+        # Optional profiling.StageProfiler: times the parts of step() as act.*
+        self.profiler = profiler
 
-        # Logging
-        self.path_x = [self.pos[0]]
-        self.path_y = [self.pos[1]]
+        # Logging (log_path=False turns it off, log_every decimates it)
+        self.path = TrajectoryBuffer(self.pos, enabled=log_path, every=log_every)
         
         # Collision tracking
         self.collision_count = 0
 
+    @property
+    def path_x(self):
+        return self.path.x
+
+    @property
+    def path_y(self):
+        return self.path.y
+
     def distance_to_goal(self, pred_pos):
         return np.linalg.norm(self.goal - pred_pos)
 
     def add_motion_noise(self, vel):
-        noise = np.random.normal(
+        noise = self.rng.normal(
             loc=0.0,
             scale=self.motion_noise_std,
             size=2
@@ -50,28 +68,174 @@ class Simulator2D:
             pos: New position
             speed: Current speed
         """
+        prof = self.profiler
+        if prof is not None:
+            t0 = perf_counter_ns()
+
         old_pos = self.pos.copy()
         
         # Compute desired new position
         new_pos = self.pos + vel_noisy * self.dt
         
-        if self.obscon is not None and self.obscon.is_colliding(new_pos):
-            new_pos = self.obscon._multi_direction_collision(new_pos, old_pos)
-            self.collision_count += 1
+        # Clearance larger than the move: nothing can be hit, skip the checks
+        dmap = self.distance_map
+        if dmap is not None:
+            vx, vy = vel_noisy
+            clear = dmap.clear_at(old_pos[0], old_pos[1], math.hypot(vx, vy) * self.dt)
+            if prof is not None:
+                t1 = perf_counter_ns()
+                prof.add('act.clearance', t1 - t0)
+                t0 = t1
+                if clear:
+                    prof.count('clearance_skips')
+        else:
+            clear = False
+
+        # Swept collision: stop at the first contact and slide along it
+        if self.obscon is not None and not clear:
+            if prof is not None:
+                fallbacks = self.obscon.slide_fallbacks
+            new_pos, hit = self.obscon.slide(old_pos, new_pos)
+            if hit:
+                self.collision_count += 1
+            if prof is not None:
+                t1 = perf_counter_ns()
+                prof.add('act.collision', t1 - t0)
+                t0 = t1
+                prof.count('collision_resolutions', hit)
+                prof.count('slide_fallbacks', self.obscon.slide_fallbacks - fallbacks)
         
         # Apply boundary constraints (if they exist)
-        if self.boundarycon is not None and self.boundarycon.is_outside(new_pos):
-            new_pos = self.boundarycon.corrected_boundary_violated(new_pos, old_pos)
-            self.collision_count += 1
+        if self.boundarycon is not None and not clear:
+            outside = self.boundarycon.is_outside(new_pos)
+            if outside:
+                new_pos = self.boundarycon.corrected_boundary_violated(new_pos, old_pos)
+                self.collision_count += 1
+            if prof is not None:
+                t1 = perf_counter_ns()
+                prof.add('act.boundary', t1 - t0)
+                t0 = t1
+                prof.count('boundary_clamps', outside)
 
         # Logging
-        self.path_x.append(new_pos[0])
-        self.path_y.append(new_pos[1])
+        self.path.append(new_pos)
         self.pos=new_pos.copy()
 
         speed = np.linalg.norm(vel_noisy)
+        if prof is not None:
+            prof.add('act.log', perf_counter_ns() - t0)
         return self.pos, speed
     
     def get_collision_count(self):
         """Return number of collisions."""
-        return self.collision_count
\ No newline at end of file
+        return self.collision_count
+
+
+class BatchSimulator2D:
+    """
+    Simulator2D for N runs at once. Positions are held as an (N, 2) array and
+    every method works on the subset of runs selected by an index array, so
+    finished runs can be masked out of the lockstep loop.
+    """
+
+    def __init__(self, starts, goals, dt, motion_noise_std, max_speed,
+                 boundary_constraints, obstacle_constraints=None, rng=None, distance_map=None,
+                 profiler=None):
+        self.pos = np.array(starts, dtype=float)
+        self.goal = np.array(goals, dtype=float)
+
+        self.dt = dt
+        self.motion_noise_std = motion_noise_std
+        self.max_speed = max_speed
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        self.boundarycon=boundary_constraints
+        self.obscon=obstacle_constraints
+        self.distance_map = distance_map
+        self.profiler = profiler
+
+        # Collision tracking, per run
+        self.collision_count = np.zeros(len(self.pos), dtype=int)
+
+    def distance_to_goal(self, pred_pos, idx=None):
+        goal = self.goal if idx is None else self.goal[idx]
+        return np.linalg.norm(goal - pred_pos, axis=1)
+
+    def add_motion_noise(self, vel):
+        noise = self.rng.normal(
+            loc=0.0,
+            scale=self.motion_noise_std,
+            size=np.shape(vel)
+        )
+
+        vel_noisy = vel + noise
+        # Clamp speed
+        speed = np.linalg.norm(vel_noisy, axis=1)
+        too_fast = speed > self.max_speed
+        vel_noisy[too_fast] *= (self.max_speed / speed[too_fast])[:, None]
+
+        return vel_noisy
+
+    def step(self, vel_noisy, idx=None):
+        """
+        Execute one simulation step for the runs selected by idx.
+
+        Returns:
+            pos: (n, 2) new positions
+            speed: (n,) current speeds
+        """
+        if idx is None:
+            idx = np.arange(len(self.pos))
+
+        old_pos = self.pos[idx]
+        new_pos = old_pos + vel_noisy * self.dt
+        speed = np.linalg.norm(vel_noisy, axis=1)
+
+        # Only moves that might touch something go through the exact checks
+        if self.distance_map is not None:
+            if self.profiler is not None:
+                t0 = perf_counter_ns()
+            near = np.flatnonzero(~self.distance_map.clear_of(old_pos, speed * self.dt))
+            if self.profiler is not None:
+                self.profiler.add('act.clearance', perf_counter_ns() - t0)
+                self.profiler.count('clearance_skips', len(idx) - near.size)
+            if near.size:
+                new_pos[near] = self._constrain(old_pos[near], new_pos[near], idx[near])
+        else:
+            new_pos = self._constrain(old_pos, new_pos, idx)
+
+        self.pos[idx] = new_pos
+        return new_pos, speed
+
+    def _constrain(self, old_pos, new_pos, idx):
+        """Obstacle slide and boundary correction of the moves of runs idx."""
+        prof = self.profiler
+        if prof is not None:
+            t0 = perf_counter_ns()
+
+        if self.obscon is not None:
+            if prof is not None:
+                fallbacks = self.obscon.slide_fallbacks
+            new_pos, hit = self.obscon.slide_many(old_pos, new_pos)
+            self.collision_count[idx[hit]] += 1
+            if prof is not None:
+                t1 = perf_counter_ns()
+                prof.add('act.collision', t1 - t0)
+                t0 = t1
+                prof.count('collision_resolutions', np.count_nonzero(hit))
+                prof.count('slide_fallbacks', self.obscon.slide_fallbacks - fallbacks)
+
+        if self.boundarycon is not None:
+            out = self.boundarycon.is_outside_many(new_pos)
+            if out.any():
+                new_pos[out] = self.boundarycon.corrected_boundary_violated_many(
+                    new_pos[out], old_pos[out])
+                self.collision_count[idx[out]] += 1
+            if prof is not None:
+                prof.add('act.boundary', perf_counter_ns() - t0)
+                prof.count('boundary_clamps', np.count_nonzero(out))
+        return new_pos
+
+    def get_collision_count(self):
+        """Return number of collisions per run."""
+        return self.collision_count
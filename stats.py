@@ -0,0 +1,276 @@
+from statistics import NormalDist
+
+import numpy as np
+
+
+def _z_score(level):
+    return NormalDist().inv_cdf(0.5 + level / 2.0)
+
+
+class RunningStats:
+    """
+    Streaming mean / variance of a scalar per-run metric (e.g. collision
+    counts): a Welford accumulator updated a batch at a time (Chan et al.),
+    mergeable like StepStats.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, values):
+        """Add a batch of values."""
+        values = np.asarray(values, dtype=float).reshape(-1)
+        n = len(values)
+        if not n:
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        self._combine(n, mean, m2)
+
+    def _combine(self, n, mean, m2):
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+    def merge(self, other):
+        """Fold another RunningStats into this one."""
+        if other.count:
+            self._combine(other.count, other.mean, other._m2)
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance (NaN below two values)."""
+        return self._m2 / (self.count - 1) if self.count > 1 else float('nan')
+
+    def confidence_interval(self, level=0.95):
+        """(lower, upper) normal confidence interval of the mean."""
+        if self.count < 2:
+            return float('nan'), float('nan')
+        half = _z_score(level) * np.sqrt(self.variance / self.count)
+        return self.mean - half, self.mean + half
+
+
+class StepStats:
+    """
+    Streaming per-timestep statistics of squared errors.
+
+    Keeps a Welford (count, mean, M2) accumulator of e^2 for every timestep
+    and error channel (e.g. measured / KF / predicted), growing on demand,
+    plus run-level sums for the overall RMSE and its confidence interval.
+    Memory is O(timesteps x channels), independent of the number of runs,
+    and two accumulators can be merged, e.g. across worker processes.
+    """
+
+    def __init__(self, channels=('meas', 'kf', 'pred'), capacity=512):
+        self.channels = tuple(channels)
+        c = len(self.channels)
+
+        # Per-timestep Welford accumulators
+        self.length = 0
+        self._count = np.zeros(capacity, dtype=np.int64)
+        self._mean = np.zeros((capacity, c))
+        self._m2 = np.zeros((capacity, c))
+
+        # Run-level sums: runs, sum(S), sum(n), sum(S^2), sum(n^2), sum(S*n),
+        # where S is a run's sum of squared errors and n its step count
+        self.n_runs = 0
+        self._sum_s = np.zeros(c)
+        self._sum_n = 0
+        self._sum_s2 = np.zeros(c)
+        self._sum_n2 = 0
+        self._sum_sn = np.zeros(c)
+
+    def _reserve(self, length):
+        capacity = len(self._count)
+        if length <= capacity:
+            return
+        while capacity < length:
+            capacity *= 2
+        grow = capacity - len(self._count)
+        self._count = np.concatenate([self._count, np.zeros(grow, dtype=np.int64)])
+        self._mean = np.concatenate([self._mean, np.zeros((grow, self._mean.shape[1]))])
+        self._m2 = np.concatenate([self._m2, np.zeros((grow, self._m2.shape[1]))])
+
+    def _combine(self, count, mean, m2):
+        """Chan et al. parallel update with per-timestep batch moments."""
+        t = len(count)
+        self._reserve(t)
+        n_a = self._count[:t]
+        n = n_a + count
+        safe_n = np.maximum(n, 1)[:, None]
+        delta = mean - self._mean[:t]
+        self._mean[:t] += delta * (count[:, None] / safe_n)
+        self._m2[:t] += m2 + delta ** 2 * (n_a[:, None] * count[:, None] / safe_n)
+        self._count[:t] = n
+        self.length = max(self.length, t)
+
+    def add_run(self, errors):
+        """Add one run: errors is a (steps, channels) array of errors."""
+        errors = np.asarray(errors, dtype=float).reshape(len(errors), -1)
+        self.add_runs(errors[None], [len(errors)])
+
+    def add_runs(self, errors, steps):
+        """
+        Add a batch of runs: errors is (runs, width, channels), and only the
+        first steps[i] rows of run i are used.
+        """
+        errors = np.asarray(errors, dtype=float)
+        steps = np.asarray(steps, dtype=np.int64)
+        if not len(steps):
+            return
+        t = int(steps.max())
+        sq = errors[:, :t] ** 2
+        valid = np.arange(t)[None, :] < steps[:, None]
+        sq[~valid] = 0.0
+
+        # Batch moments per timestep
+        count = valid.sum(axis=0)
+        safe = np.maximum(count, 1)[:, None]
+        mean = sq.sum(axis=0) / safe
+        dev = (sq - mean[None]) * valid[:, :, None]
+        m2 = (dev ** 2).sum(axis=0)
+        self._combine(count, mean, m2)
+
+        self.add_run_totals(sq.sum(axis=1), steps)
+
+    def add_step(self, t, errors):
+        """
+        Add timestep t of a batch of runs: errors is (runs, channels), the
+        errors of every run that reached t. Only the per-timestep statistics
+        change; the runs' totals go to add_run_totals() once they end.
+        """
+        sq = np.asarray(errors, dtype=float) ** 2
+        count = len(sq)
+        if not count:
+            return
+        self._reserve(t + 1)
+        mean = sq.mean(axis=0)
+        m2 = ((sq - mean) ** 2).sum(axis=0)
+        n_a = self._count[t]
+        n = n_a + count
+        delta = mean - self._mean[t]
+        self._mean[t] += delta * (count / n)
+        self._m2[t] += m2 + delta ** 2 * (n_a * count / n)
+        self._count[t] = n
+        self.length = max(self.length, t + 1)
+
+    def add_run_totals(self, sq_sums, steps):
+        """
+        Add the run-level sums of finished runs: sq_sums is (runs, channels),
+        each run's sum of squared errors, and steps its step count.
+        """
+        run_s = np.asarray(sq_sums, dtype=float).reshape(len(steps), -1)
+        steps = np.asarray(steps, dtype=np.int64)
+        self.n_runs += len(steps)
+        self._sum_s += run_s.sum(axis=0)
+        self._sum_n += int(steps.sum())
+        self._sum_s2 += (run_s ** 2).sum(axis=0)
+        self._sum_n2 += int((steps ** 2).sum())
+        self._sum_sn += (run_s * steps[:, None]).sum(axis=0)
+
+    def merge(self, other):
+        """Fold another StepStats (same channels) into this one."""
+        if other.channels != self.channels:
+            raise ValueError("Cannot merge StepStats with different channels")
+        t = other.length
+        self._combine(other._count[:t], other._mean[:t], other._m2[:t])
+        self.n_runs += other.n_runs
+        self._sum_s += other._sum_s
+        self._sum_n += other._sum_n
+        self._sum_s2 += other._sum_s2
+        self._sum_n2 += other._sum_n2
+        self._sum_sn += other._sum_sn
+        return self
+
+    def to_dict(self):
+        """State as a dict of numpy arrays (e.g. for np.savez); see from_dict."""
+        t = self.length
+        return {
+            'channels': np.array(self.channels),
+            'count': self._count[:t].copy(),
+            'mean': self._mean[:t].copy(),
+            'm2': self._m2[:t].copy(),
+            'sums': np.array([self.n_runs, self._sum_n, self._sum_n2], dtype=np.int64),
+            'sum_s': self._sum_s.copy(),
+            'sum_s2': self._sum_s2.copy(),
+            'sum_sn': self._sum_sn.copy(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls([str(c) for c in state['channels']])
+        t = len(state['count'])
+        stats._reserve(t)
+        stats.length = t
+        stats._count[:t] = state['count']
+        stats._mean[:t] = state['mean']
+        stats._m2[:t] = state['m2']
+        stats.n_runs, stats._sum_n, stats._sum_n2 = (int(v) for v in state['sums'])
+        stats._sum_s[:] = state['sum_s']
+        stats._sum_s2[:] = state['sum_s2']
+        stats._sum_sn[:] = state['sum_sn']
+        return stats
+
+    # ============================================================
+    # REPORTING
+    # ============================================================
+
+    @property
+    def counts(self):
+        """(T,) number of runs that reached each timestep."""
+        return self._count[:self.length].copy()
+
+    def channel(self, name):
+        return self.channels.index(name)
+
+    def rmse(self):
+        """(T, channels) RMSE at each timestep over the runs that reached it."""
+        return np.sqrt(self._mean[:self.length])
+
+    def rmse_confidence_interval(self, level=0.95):
+        """
+        (lower, upper) per-timestep RMSE bounds, from a normal interval on
+        the mean squared error. Timesteps with fewer than two samples get
+        NaN bounds.
+        """
+        count = self._count[:self.length, None]
+        mean = self._mean[:self.length]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sem = np.sqrt(self._m2[:self.length] / (count - 1) / count)
+        sem = np.where(count > 1, sem, np.nan)
+        half = _z_score(level) * sem
+        return np.sqrt(np.maximum(mean - half, 0.0)), np.sqrt(mean + half)
+
+    def time_averaged_rmse(self):
+        """(channels,) mean of the per-timestep RMSE."""
+        if not self.length:
+            return np.full(len(self.channels), np.nan)
+        return self.rmse().mean(axis=0)
+
+    def overall_rmse(self):
+        """(channels,) RMSE across all timesteps of all runs."""
+        if not self._sum_n:
+            return np.full(len(self.channels), np.nan)
+        return np.sqrt(self._sum_s / self._sum_n)
+
+    def overall_confidence_interval(self, level=0.95):
+        """
+        (lower, upper) bounds on the overall RMSE. Runs are the independent
+        samples (steps within a run are correlated), so the MSE is treated
+        as a ratio estimator sum(S) / sum(n) over runs.
+        """
+        n = self.n_runs
+        if n < 2:
+            nan = np.full(len(self.channels), np.nan)
+            return nan, nan
+        mse = self._sum_s / self._sum_n
+        resid = self._sum_s2 - 2.0 * mse * self._sum_sn + mse ** 2 * self._sum_n2
+        mean_n = self._sum_n / n
+        sem = np.sqrt(np.maximum(resid, 0.0) / (n * (n - 1))) / mean_n
+        half = _z_score(level) * sem
+        return np.sqrt(np.maximum(mse - half, 0.0)), np.sqrt(mse + half)
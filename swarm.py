@@ -0,0 +1,442 @@
+from functools import partial
+from time import perf_counter_ns
+
+import numpy as np
+
+from simulator import BatchSimulator2D
+from montecarlo import MonteCarlo2D
+from campaign import run_scenarios
+from noise import make_generator
+
+
+# ============================================================
+# BROADPHASE
+# ============================================================
+
+# Half of the 3x3 cell neighbourhood: every pair of adjacent cells is
+# visited once, the cell itself included
+_HALF_NEIGHBOURHOOD = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+_NEIGHBOURHOOD = tuple((dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+
+
+class SpatialHash:
+    """
+    Uniform-grid hash of point positions, rebuilt from scratch on every
+    query.
+
+    Points are binned by cell and sorted by cell key; the neighbours of
+    each point are looked up in its own and 4 of its 8 adjacent cells
+    through a table of where each cell starts in the sorted order (or
+    searchsorted, when the occupied area is sparse). Building and querying
+    cost O(n log n) for n points
+    (the sort), plus the number of candidate pairs, which stays O(n) as
+    long as cells hold a bounded number of points. Restricting the query
+    to a subset of the points (e.g. the ones that moved) makes the
+    candidate pairs proportional to the subset.
+    """
+
+    def __init__(self, cell_size):
+        """
+        Args:
+            cell_size: grid cell edge; pairs() finds pairs closer than cell_size
+        """
+        self.cell_size = float(cell_size)
+
+    def pairs(self, points, query=None):
+        """
+        Every pair of points closer than cell_size; with query (indices),
+        only the pairs with at least one point in query.
+
+        Returns:
+            i, j: (m,) indices with i < j
+            distance: (m,) their distances
+        """
+        points = np.asarray(points, dtype=float)
+        n = len(points)
+        empty = np.empty(0, dtype=np.intp)
+        if n < 2:
+            return empty, empty, np.empty(0)
+
+        # Row-major cell keys; the margins keep neighbouring rows apart
+        cells = np.floor(points / self.cell_size).astype(np.int64)
+        cells -= cells.min(axis=0) - 1
+        span = int(cells[:, 1].max()) + 2
+        keys = cells[:, 0] * span + cells[:, 1]
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        # Where every cell starts in order; a table over the bounding box
+        # unless that has many more cells than points
+        n_cells = int(keys.max()) + span + 2
+        if n_cells <= 4 * n + 1024:
+            cell_start = np.searchsorted(sorted_keys, np.arange(n_cells + 1))
+        else:
+            cell_start = None
+
+        if query is None:
+            owners = np.arange(n)
+            neighbourhood = _HALF_NEIGHBOURHOOD
+        else:
+            owners = np.asarray(query, dtype=np.intp)
+            neighbourhood = _NEIGHBOURHOOD
+            in_query = np.zeros(n, dtype=bool)
+            in_query[owners] = True
+
+        first, second = [], []
+        for dx, dy in neighbourhood:
+            target = keys[owners] + (dx * span + dy)
+            if cell_start is not None:
+                lo = cell_start[target]
+                hi = cell_start[target + 1]
+            else:
+                lo = np.searchsorted(sorted_keys, target, side='left')
+                hi = np.searchsorted(sorted_keys, target, side='right')
+            counts = hi - lo
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Expand the ranges [lo, hi) of every point into candidate pairs
+            owner = np.repeat(owners, counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            other = order[np.repeat(lo, counts) + offsets]
+            if query is not None:
+                # Pairs within the query are found from both ends: keep one
+                keep = (owner < other) | ~in_query[other]
+                owner, other = owner[keep], other[keep]
+            elif dx == 0 and dy == 0:
+                keep = owner < other
+                owner, other = owner[keep], other[keep]
+            first.append(owner)
+            second.append(other)
+
+        if not first:
+            return empty, empty, np.empty(0)
+        i = np.concatenate(first)
+        j = np.concatenate(second)
+        distance = np.hypot(*(points[i] - points[j]).T)
+        close = distance < self.cell_size
+        i, j, distance = i[close], j[close], distance[close]
+        swap = i > j
+        i[swap], j[swap] = j[swap], i[swap]
+        return i, j, distance
+
+
+# ============================================================
+# SWARM SIMULATOR
+# ============================================================
+
+def _inside_boundary(points, boundary_constraints):
+    """points with every agent outside boundary_constraints moved onto its edge."""
+    points = np.array(points, dtype=float)
+    if boundary_constraints is not None and len(points):
+        points = boundary_constraints.corrected_boundary_violated_many(points, points)
+    return points
+
+
+# Rounds of redrawing spawn points before agents are allowed to overlap
+_SPAWN_ROUNDS = 32
+
+# Extra entropy word of the spawn point draws of run_swarm
+_SPAWN_STREAM = 0x5BA3
+
+
+def spawn_points(starts, radius, boundary_constraints, obstacle_constraints=None, rng=None):
+    """
+    Non-overlapping spawn points of a swarm inside the boundary.
+
+    Starts inside the boundary, clear of the obstacles and at least
+    2 * radius from the agents kept before them are kept. The others are
+    redrawn uniformly over the free space, so no agents pile up on the
+    walls. In a swarm too dense for that, agents still left after
+    _SPAWN_ROUNDS rounds may overlap, but stay in free space.
+
+    Returns:
+        (n, 2) spawn points
+    """
+    points = np.array(starts, dtype=float)
+    b = boundary_constraints
+    if b is None or not len(points):
+        return points
+    rng = rng if rng is not None else np.random.default_rng()
+    lo = np.array([b.x_min, b.y_min], dtype=float) + b.radius
+    hi = np.array([b.x_max, b.y_max], dtype=float) - b.radius
+    grid = SpatialHash(2.0 * radius)
+
+    def free(p):
+        ok = ~b.is_outside_many(p)
+        if obstacle_constraints is not None:
+            ok &= ~obstacle_constraints.is_colliding_many(p)
+        return ok
+
+    placed = np.zeros(len(points), dtype=bool)
+    candidates = free(points)
+    for _ in range(_SPAWN_ROUNDS):
+        # Candidates overlapping a placed agent or an earlier candidate drop out
+        sel = np.flatnonzero(placed | candidates)
+        new = np.flatnonzero(candidates[sel])
+        i, j, _ = grid.pairs(points[sel], query=new)
+        fresh = candidates[sel]
+        loser = np.where(fresh[j], j, i)
+        candidates[sel[loser]] = False
+        placed |= candidates
+
+        todo = np.flatnonzero(~placed)
+        if not todo.size:
+            return points
+        points[todo] = rng.uniform(lo, hi, size=(todo.size, 2))
+        candidates = np.zeros(len(points), dtype=bool)
+        candidates[todo] = free(points[todo])
+
+    # Too dense: settle for free space
+    left = np.flatnonzero(~placed & ~candidates)
+    for _ in range(_SPAWN_ROUNDS):
+        if not left.size:
+            break
+        points[left] = rng.uniform(lo, hi, size=(left.size, 2))
+        left = left[~free(points[left])]
+    return points
+
+
+class SwarmSimulator2D(BatchSimulator2D):
+    """
+    BatchSimulator2D whose vehicles are also dynamic obstacles for each other.
+
+    All agents share the boundary / obstacle constraints and are discs of
+    radius; two agents overlap when their centres come closer than
+    2 * radius. After the static-obstacle handling of BatchSimulator2D,
+    overlapping pairs are found with a SpatialHash, so a step costs
+    O(n log n) instead of O(n^2).
+
+    Overlaps are resolved by pushing each pair apart along its contact
+    normal, the moving agents taking the whole correction when the other
+    one stays put (finished agents keep blocking). The pushes of all pairs
+    are averaged per agent and repeated up to max_passes times, each pass
+    re-querying only the pairs of the agents it moved; overlaps still left
+    are counted as 'agent_overlaps_left' by the profiler.
+    Pushes never leave the boundary or enter an obstacle.
+
+    A collision is counted once per pair when it comes into contact, i.e.
+    overlaps at the end of a move without having touched (been within
+    2 * radius + skin) at the end of the previous step, so agents pressed
+    together are not counted again on every step. Agents start inside the
+    boundary (starts outside are moved onto its edge; see spawn_points for
+    spreading them out instead).
+    """
+
+    def __init__(self, starts, goals, dt, motion_noise_std, max_speed,
+                 boundary_constraints, obstacle_constraints=None, rng=None, distance_map=None,
+                 profiler=None, radius=None, max_passes=8, skin=1.0):
+        """
+        radius: agent radius (default: boundary_constraints.radius)
+        max_passes: rounds of overlap resolution per step
+        skin: gap, as a fraction of radius, below which agents still touch
+        """
+        super().__init__(_inside_boundary(starts, boundary_constraints), goals, dt,
+                         motion_noise_std, max_speed, boundary_constraints, obstacle_constraints,
+                         rng=rng, distance_map=distance_map, profiler=profiler)
+        if radius is None:
+            radius = boundary_constraints.radius if boundary_constraints is not None else 0.5
+        self.radius = float(radius)
+        self.max_passes = max_passes
+        self.grid = SpatialHash(2.0 * self.radius * (1.0 + skin))
+        self._contact_grid = SpatialHash(2.0 * self.radius)
+
+        # Inter-agent collisions, per agent (also included in collision_count)
+        self.agent_collision_count = np.zeros(len(self.pos), dtype=int)
+        # Pair keys i * n + j of the agents touching at the end of the last step
+        self._touching = self._pair_keys(*self.grid.pairs(self.pos)[:2])
+
+    def _pair_keys(self, i, j):
+        return np.sort(i.astype(np.int64) * len(self.pos) + j)
+
+    def step(self, vel_noisy, idx=None):
+        """
+        Move the agents selected by idx (the others stay put, but still
+        block the movers) and resolve inter-agent overlaps.
+
+        Returns:
+            pos: (n, 2) new positions of the agents in idx
+            speed: (n,) commanded speeds
+        """
+        if idx is None:
+            idx = np.arange(len(self.pos))
+        _, speed = super().step(vel_noisy, idx)
+
+        prof = self.profiler
+        if prof is not None:
+            t0 = perf_counter_ns()
+        moving = np.zeros(len(self.pos), dtype=bool)
+        moving[idx] = True
+        contact = 2.0 * self.radius
+
+        n = len(self.pos)
+        touch_i, touch_j, distance = self.grid.pairs(self.pos)
+        overlap = distance < contact
+        keys = self._pair_keys(touch_i[overlap], touch_j[overlap])
+        new = ~np.isin(keys, self._touching, assume_unique=True)
+        if new.any():
+            hits = np.bincount(np.concatenate([keys[new] // n, keys[new] % n]), minlength=n)
+            self.agent_collision_count += hits
+            self.collision_count += hits
+            if prof is not None:
+                prof.count('agent_contacts', int(new.sum()))
+
+        # Overlapping pairs, re-queried (at contact range) for the agents
+        # each pass moves; pairs of finished agents stay as they are
+        overlap &= moving[touch_i] | moving[touch_j]
+        i, j, distance = touch_i[overlap], touch_j[overlap], distance[overlap]
+        moved_any = np.zeros(n, dtype=bool)
+        for _ in range(self.max_passes):
+            if not i.size:
+                break
+            moved = self._separate(i, j, distance, moving)
+            moved_any |= moved
+            stale = moved[i] | moved[j]
+            new_i, new_j, new_distance = self._contact_grid.pairs(self.pos, query=np.flatnonzero(moved))
+            i = np.concatenate([i[~stale], new_i])
+            j = np.concatenate([j[~stale], new_j])
+            distance = np.concatenate([distance[~stale], new_distance])
+            overlap = (distance < contact * (1.0 - 1e-9)) & (moving[i] | moving[j])
+            i, j, distance = i[overlap], j[overlap], distance[overlap]
+        else:
+            if prof is not None and i.size:
+                prof.count('agent_overlaps_left', int(i.size))
+
+        # Touching pairs at the end of the step: the same update, once
+        if moved_any.any():
+            stale = moved_any[touch_i] | moved_any[touch_j]
+            new_i, new_j, _ = self.grid.pairs(self.pos, query=np.flatnonzero(moved_any))
+            touch_i = np.concatenate([touch_i[~stale], new_i])
+            touch_j = np.concatenate([touch_j[~stale], new_j])
+        self._touching = self._pair_keys(touch_i, touch_j)
+
+        if prof is not None:
+            prof.add('act.agents', perf_counter_ns() - t0)
+        return self.pos[idx].copy(), speed
+
+    def _separate(self, i, j, distance, moving):
+        """
+        One averaged round of pushing overlapping pairs (i, j) apart.
+
+        Returns:
+            (n,) True for the agents that moved
+        """
+        normal = self.pos[j] - self.pos[i]
+        coincident = distance < 1e-12
+        normal[coincident] = (1.0, 0.0)
+        distance = np.where(coincident, 1.0, distance)
+        normal /= distance[:, None]
+        depth = np.where(coincident, 2.0 * self.radius, 2.0 * self.radius - distance)
+
+        # Share of the push taken by each side: movers only
+        w_i = moving[i].astype(float)
+        w_j = moving[j].astype(float)
+        total = w_i + w_j
+        pushed = total > 0
+        share = np.zeros_like(depth)
+        share[pushed] = depth[pushed] / total[pushed]
+
+        n = len(self.pos)
+        push_i = -normal * (share * w_i)[:, None]
+        push_j = normal * (share * w_j)[:, None]
+        push = np.column_stack([
+            np.bincount(i, push_i[:, axis], n) + np.bincount(j, push_j[:, axis], n)
+            for axis in (0, 1)
+        ])
+        pairs = np.bincount(i, w_i, n) + np.bincount(j, w_j, n)
+        moved = np.zeros(n, dtype=bool)
+        agents = np.flatnonzero(pairs)
+        if not agents.size:
+            return moved
+
+        old = self.pos[agents]
+        new = old + push[agents] / pairs[agents, None]
+        if self.boundarycon is not None:
+            new = self.boundarycon.corrected_boundary_violated_many(new, old)
+        if self.obscon is not None:
+            blocked = self.obscon.is_colliding_many(new)
+            new[blocked] = old[blocked]
+        self.pos[agents] = new
+        moved[agents] = np.any(new != old, axis=1)
+        return moved
+
+
+class Swarm2D(MonteCarlo2D):
+    """
+    MonteCarlo2D whose runs are agents of one swarm sharing the world: the
+    same sense -> filter -> plan -> act loop, stepped by SwarmSimulator2D.
+    Agents that reach their goal stop there and keep blocking the others.
+    """
+
+    def __init__(self, starts, goals, dt, sensor_noise_std, motion_noise_std,
+                 max_speed, boundary_constraints=None, obstacle_constraints=None,
+                 goal_tolerance=1.0, max_steps=500, rng=None, navigation=None,
+                 distance_map=None, slow_clearance=None, profiler=None, radius=None,
+                 sdf_collisions=True, spawn_rng=None):
+        """
+        starts: wanted starts; the agents spawn at spawn_points() of them,
+            drawn from spawn_rng
+        See MonteCarlo2D for the other arguments.
+        """
+        if radius is None:
+            radius = boundary_constraints.radius if boundary_constraints is not None else 0.5
+        starts = spawn_points(starts, radius, boundary_constraints, obstacle_constraints, spawn_rng)
+        super().__init__(starts, goals, dt, sensor_noise_std, motion_noise_std, max_speed,
+                         boundary_constraints=boundary_constraints,
+                         obstacle_constraints=obstacle_constraints,
+                         goal_tolerance=goal_tolerance, max_steps=max_steps, rng=rng,
+                         navigation=navigation, distance_map=distance_map,
+                         slow_clearance=slow_clearance, profiler=profiler,
+                         simulator=partial(SwarmSimulator2D, radius=radius),
+                         sdf_collisions=sdf_collisions)
+        # All agents fly at once, so they can't go through in goal-grouped batches
+        self.planner.max_fields = None
+
+    def run(self, recorder=None, keep_histories=False):
+        """
+        Run the swarm to completion.
+
+        Returns:
+            MonteCarloResult with one run per agent; collision_counts include
+            inter-agent contacts, which are also given on their own as
+            result.agent_collision_counts
+        """
+        result = super().run(recorder, keep_histories)
+        result.agent_collision_counts = self.sim.agent_collision_count.copy()
+        return result
+
+
+def run_swarm(config, n_agents, recorder=None, profiler=None):
+    """
+    Fly n_agents agents of config together in one world. Agent i heads for
+    the goal of run i of run_campaign, from that run's start if it is free;
+    starts outside the boundary, in an obstacle or on another agent are
+    redrawn (spawn_points). With the default boundary that is most of them,
+    so the swarm's errors are not comparable with run_campaign's.
+    """
+    boundary_constraints, obstacle_constraints = config.build_constraints()
+    distance_map = config.build_distance_map(boundary_constraints, obstacle_constraints)
+    navigation = config.build_navigation(boundary_constraints, obstacle_constraints, distance_map)
+    starts, goals = run_scenarios(config, n_agents)
+
+    swarm = Swarm2D(
+        starts,
+        goals,
+        config.dt,
+        config.sensor_noise_std,
+        config.motion_noise_std,
+        config.max_speed,
+        boundary_constraints=boundary_constraints,
+        obstacle_constraints=obstacle_constraints,
+        goal_tolerance=config.goal_tolerance,
+        max_steps=config.max_steps,
+        rng=make_generator(np.random.SeedSequence(config.seed), config.bit_generator),
+        navigation=navigation,
+        distance_map=distance_map,
+        slow_clearance=config.slow_clearance,
+        profiler=profiler,
+        radius=config.radius,
+        sdf_collisions=config.distance_map,
+        spawn_rng=make_generator(np.random.SeedSequence([config.seed, _SPAWN_STREAM]),
+                                 config.bit_generator)
+    )
+    return swarm.run(recorder=recorder)
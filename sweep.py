@@ -0,0 +1,169 @@
+import dataclasses
+import itertools
+import os
+import time
+from multiprocessing import get_context
+
+import numpy as np
+
+from campaign import SimulationConfig, run_monte_carlo
+from resultcache import ResultCache
+from adaptive import run_adaptive
+
+
+# Fields that hold geometry rather than a single value, and can't be swept
+_COMPOUND_FIELDS = ('boundary', 'obstacles')
+
+
+def _field_type(field):
+    return field.type if isinstance(field.type, type) else type(field.default)
+
+
+def parse_value(field, text):
+    """Convert a command-line value to the type of a SimulationConfig field."""
+    text = text.strip()
+    if text.lower() == 'none':
+        # Only fields that default to None (e.g. slow_clearance) can be unset
+        if field.default is None:
+            return None
+        raise ValueError(f"{field.name}: can't be none")
+    kind = _field_type(field)
+    if kind is bool:
+        if text.lower() in ('1', 'true', 'yes', 'on'):
+            return True
+        if text.lower() in ('0', 'false', 'no', 'off'):
+            return False
+        raise ValueError(f"{field.name}: expected a boolean, got {text!r}")
+    if kind is int:
+        return int(text)
+    if kind is float:
+        return float(text)
+    return text
+
+
+def config_field(name):
+    """The SimulationConfig field called name (dashes allowed)."""
+    name = name.strip().replace('-', '_')
+    for field in dataclasses.fields(SimulationConfig):
+        if field.name == name:
+            if name in _COMPOUND_FIELDS:
+                raise ValueError(f"{name} can't be swept")
+            return field
+    raise ValueError(f"Unknown SimulationConfig field {name!r}")
+
+
+def parse_sweep(specs):
+    """
+    Parse sweep axes of the form "name=v1,v2,..." or "name=start:stop:num"
+    (num evenly spaced values, stop included; they must be whole numbers
+    for int fields).
+
+    Returns:
+        dict field name -> list of values, in the order given
+    """
+    axes = {}
+    for spec in specs:
+        name, sep, values = spec.partition('=')
+        if not sep or not values:
+            raise ValueError(f"Bad sweep axis {spec!r}, expected name=v1,v2,... or name=start:stop:num")
+        field = config_field(name)
+        if values.count(':') == 2:
+            start, stop, num = values.split(':')
+            grid = np.linspace(float(start), float(stop), int(num))
+            if _field_type(field) is int:
+                whole = np.round(grid)
+                if not np.allclose(grid, whole, rtol=0.0, atol=1e-9):
+                    raise ValueError(f"{field.name}: {values!r} gives non-integer values {grid.tolist()}")
+                axes[field.name] = [int(v) for v in whole]
+            else:
+                axes[field.name] = [parse_value(field, repr(float(v))) for v in grid]
+        else:
+            axes[field.name] = [parse_value(field, v) for v in values.split(',')]
+    return axes
+
+
+def expand_sweep(base, axes):
+    """Every point of the grid spanned by axes, as SimulationConfigs derived from base."""
+    names = list(axes)
+    return [dataclasses.replace(base, **dict(zip(names, values)))
+            for values in itertools.product(*(axes[name] for name in names))]
+
+
+def _run_point(config, n_runs, vectorized, cache_dir=None, cache_bytes=None, adaptive=None):
+    start = time.perf_counter()
+    cache = ResultCache(cache_dir, cache_bytes) if cache_dir is not None else None
+    if adaptive is not None:
+        result = run_adaptive(config, workers=1, cache=cache, **adaptive)
+    else:
+        result = run_monte_carlo(config, n_runs, vectorized=vectorized, workers=1, cache=cache)
+    summary = result.summary()
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def run_sweep(configs, n_runs=500, vectorized=True, workers=None, cache_dir=None, cache_bytes=1 << 30,
+              adaptive=None):
+    """
+    Run a Monte Carlo campaign for every config, the configs spread over a
+    process pool (each campaign runs in a single process).
+
+    All points share config.seed unless it is swept, so they see the same
+    scenarios, which keeps differences between points down to the
+    parameters rather than the draws.
+
+    With a cache_dir, every point goes through a ResultCache there, so
+    points computed by an earlier sweep are not simulated again.
+
+    With adaptive, a dict of adaptive.run_adaptive() arguments (precision,
+    min_runs, max_runs, ...), every point runs until its own metrics reach
+    that precision instead of a fixed n_runs; the 'runs' column then gives
+    the runs each point needed.
+
+    Returns:
+        list of MonteCarloResult.summary() dicts (plus 'seconds'), in the
+        order of configs
+    """
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(configs)))
+    tasks = [(config, n_runs, vectorized, cache_dir, cache_bytes, adaptive) for config in configs]
+    if workers == 1:
+        return [_run_point(*task) for task in tasks]
+    with get_context().Pool(workers) as pool:
+        return pool.starmap(_run_point, tasks, chunksize=1)
+
+
+# Summary columns of the results table: key -> (header, format)
+SUMMARY_COLUMNS = {
+    'runs': ("runs", "{:d}"),
+    'reached': ("reached", "{:.1%}"),
+    'mean_steps': ("steps/run", "{:.1f}"),
+    'mean_collisions': ("coll/run", "{:.2f}"),
+    'rmse_meas': ("RMSE GPS", "{:.4f}"),
+    'rmse_kf': ("RMSE KF", "{:.4f}"),
+    'rmse_pred': ("RMSE pred", "{:.4f}"),
+    'rmse_kf_ci': ("95% CI KF", "[{:.4f}, {:.4f}]"),
+    'seconds': ("time s", "{:.2f}"),
+}
+
+
+def format_table(axes, configs, summaries):
+    """Results table: one row per sweep point, swept parameters first."""
+    header = list(axes) + [h for h, _ in SUMMARY_COLUMNS.values()]
+    rows = []
+    for config, summary in zip(configs, summaries):
+        row = [f"{getattr(config, name):g}" if isinstance(getattr(config, name), float)
+               else str(getattr(config, name)) for name in axes]
+        for key, (_, fmt) in SUMMARY_COLUMNS.items():
+            if key == 'rmse_kf_ci':
+                row.append(fmt.format(summary['rmse_kf_lo'], summary['rmse_kf_hi']))
+            elif key in summary:
+                row.append(fmt.format(summary[key]))
+            else:
+                row.append('')
+        rows.append(row)
+
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    lines = ['  '.join(cell.rjust(w) for cell, w in zip(header, widths)),
+             '  '.join('-' * w for w in widths)]
+    lines += ['  '.join(cell.rjust(w) for cell, w in zip(row, widths)) for row in rows]
+    return '\n'.join(lines)
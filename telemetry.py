@@ -0,0 +1,273 @@
+import json
+import socket
+import struct
+import sys
+import time
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from boundaries import BoundaryConstraints, ObstacleConstraints
+from plots import Plot2D, ErrorPlotter
+
+
+DEFAULT_ADDRESS = ('127.0.0.1', 47800)
+
+# Datagram kinds (first byte)
+SCENE = b'S'
+FRAME = b'F'
+
+# step, run, pos(2), measured(2), kf(2), pred(2), speed, K trace, collisions
+FRAME_STRUCT = struct.Struct('<QI10dI')
+
+_MAX_DATAGRAM = 65507
+
+
+class TelemetryFrame:
+    """One decoded telemetry frame."""
+
+    __slots__ = ('step', 'run', 'pos', 'measured_pos', 'kf_pos', 'pred_pos',
+                 'speed', 'k_trace', 'collisions')
+
+    def __init__(self, step, run, pos, measured_pos, kf_pos, pred_pos,
+                 speed, k_trace, collisions):
+        self.step = step
+        self.run = run
+        self.pos = pos
+        self.measured_pos = measured_pos
+        self.kf_pos = kf_pos
+        self.pred_pos = pred_pos
+        self.speed = speed
+        self.k_trace = k_trace
+        self.collisions = collisions
+
+    @classmethod
+    def decode(cls, payload):
+        v = FRAME_STRUCT.unpack(payload)
+        return cls(v[0], v[1], np.array(v[2:4]), np.array(v[4:6]), np.array(v[6:8]),
+                   np.array(v[8:10]), v[10], v[11], v[12])
+
+
+def encode_frame(step, run, pos, measured_pos, kf_pos, pred_pos, speed, k_trace, collisions):
+    return FRAME + FRAME_STRUCT.pack(
+        step, run,
+        pos[0], pos[1], measured_pos[0], measured_pos[1],
+        kf_pos[0], kf_pos[1], pred_pos[0], pred_pos[1],
+        speed, k_trace, collisions)
+
+
+def encode_scene(run, start, goal, boundary_constraints=None, obstacle_constraints=None):
+    scene = {
+        'run': run,
+        'start': [float(v) for v in start],
+        'goal': [float(v) for v in goal],
+        'boundary': None,
+        'obstacles': None,
+    }
+    if boundary_constraints is not None:
+        b = boundary_constraints
+        scene['boundary'] = {
+            'radius': b.radius, 'max_speed': b.max_speed, 'dt': b.dt,
+            'x_min': b.x_min, 'x_max': b.x_max, 'y_min': b.y_min, 'y_max': b.y_max,
+        }
+    if obstacle_constraints is not None:
+        o = obstacle_constraints
+        scene['obstacles'] = {
+            'radius': o.radius, 'max_speed': o.max_speed, 'dt': o.dt,
+            'boxes': [[obs['x_min'], obs['x_max'], obs['y_min'], obs['y_max']]
+                      for obs in o.obstacles],
+        }
+    return SCENE + json.dumps(scene).encode('utf-8')
+
+
+def decode_scene(payload):
+    """
+    Returns:
+        run, start, goal, boundary_constraints, obstacle_constraints
+    """
+    scene = json.loads(payload.decode('utf-8'))
+    boundary = None
+    if scene['boundary'] is not None:
+        b = scene['boundary']
+        boundary = BoundaryConstraints(b['radius'], b['max_speed'], b['dt'],
+                                       x_min=b['x_min'], x_max=b['x_max'],
+                                       y_min=b['y_min'], y_max=b['y_max'])
+    obstacles = None
+    if scene['obstacles'] is not None:
+        o = scene['obstacles']
+        obstacles = ObstacleConstraints(o['max_speed'], o['dt'], o['radius'])
+        for x_min, x_max, y_min, y_max in o['boxes']:
+            obstacles.add_obstacle(x_min=x_min, x_max=x_max, y_min=y_min, y_max=y_max)
+    return scene['run'], scene['start'], scene['goal'], boundary, obstacles
+
+
+class TelemetryPublisher:
+    """
+    Non-blocking UDP telemetry sender used inside the simulation loop.
+
+    Frames are fixed-size binary datagrams (FRAME_STRUCT). Sending never
+    blocks: with no viewer listening, or a full socket buffer, the frame
+    is dropped and the loop carries on at full speed.
+
+    The scene (start, goal, boundaries, obstacles) is re-sent every
+    scene_every frames so that a viewer can attach at any time.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, scene_every=50):
+        self.address = address
+        self.scene_every = max(1, int(scene_every))
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.run = -1
+        self.sent = 0
+        self.dropped = 0
+        self._scene = None
+        self._step = 0
+
+    def _send(self, datagram):
+        try:
+            self.sock.sendto(datagram, self.address)
+            self.sent += 1
+        except OSError:
+            # No viewer (ICMP port unreachable) or full socket buffer
+            self.dropped += 1
+
+    def publish_scene(self, start, goal, boundary_constraints=None, obstacle_constraints=None):
+        """Start a new run."""
+        self.run += 1
+        self._step = 0
+        self._scene = encode_scene(self.run, start, goal,
+                                   boundary_constraints, obstacle_constraints)
+        self._send(self._scene)
+
+    def publish(self, pos, measured_pos, kf_pos, pred_pos, speed, collisions=0, k_trace=0.0):
+        if self._scene is not None and self._step and self._step % self.scene_every == 0:
+            self._send(self._scene)
+        self._send(encode_frame(self._step, max(self.run, 0), pos, measured_pos, kf_pos,
+                                pred_pos, speed, k_trace, collisions))
+        self._step += 1
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TelemetrySubscriber:
+    """Non-blocking UDP telemetry receiver used by the viewer process."""
+
+    def __init__(self, address=DEFAULT_ADDRESS, recv_buffer=1 << 22):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer)
+        self.sock.bind(address)
+        self.sock.setblocking(False)
+
+    def poll(self):
+        """
+        Drain every pending datagram.
+
+        Returns:
+            scene: latest decoded scene (see decode_scene) or None
+            frames: every frame received, oldest first
+        """
+        scene = None
+        frames = []
+        while True:
+            try:
+                datagram = self.sock.recv(_MAX_DATAGRAM)
+            except BlockingIOError:
+                break
+            kind, payload = datagram[:1], datagram[1:]
+            if kind == FRAME and len(payload) == FRAME_STRUCT.size:
+                frames.append(TelemetryFrame.decode(payload))
+            elif kind == SCENE:
+                scene = decode_scene(payload)
+        return scene, frames
+
+    def close(self):
+        self.sock.close()
+
+
+class TelemetryViewer:
+    """
+    Plot2D (and optionally ErrorPlotter) fed from a TelemetrySubscriber.
+
+    Each tick drains the socket, appends every new frame to the paths and
+    renders only the latest one, so a slow GUI drops frames instead of
+    slowing the simulation down.
+
+    Run it in its own process with: python telemetry.py [host:port] [--errors]
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, fps=20.0, show_errors=False):
+        self.subscriber = TelemetrySubscriber(address)
+        self.period = 1.0 / fps
+        self.show_errors = show_errors
+        self.run = None
+        self.plotter = None
+        self.error_plotter = None
+        self.frames = 0
+
+    def _open(self, scene):
+        run, start, goal, boundary, obstacles = scene
+        plt.close('all')
+        self.run = run
+        self.plotter = Plot2D(100, 100, start, goal,
+                              boundary_constraints=boundary,
+                              obstacle_constraints=obstacles,
+                              blit=True)
+        self.plotter.fig.canvas.manager.set_window_title(f"Telemetry run {run}")
+        self.error_plotter = ErrorPlotter() if self.show_errors else None
+
+    def tick(self):
+        scene, frames = self.subscriber.poll()
+        if scene is not None and scene[0] != self.run:
+            self._open(scene)
+        if self.plotter is None:
+            return
+        frames = [f for f in frames if f.run == self.run]
+        if not frames:
+            return
+        self.frames += len(frames)
+
+        for f in frames[:-1]:
+            self.plotter.append(f.pos, f.measured_pos, f.kf_pos, f.pred_pos)
+        last = frames[-1]
+        self.plotter.update(last.pos, last.measured_pos, last.kf_pos, last.pred_pos,
+                            last.speed, last.collisions)
+
+        if self.error_plotter is not None:
+            for f in frames:
+                self.error_plotter.update(np.linalg.norm(f.measured_pos - f.pos),
+                                          np.linalg.norm(f.pred_pos - f.pos),
+                                          np.linalg.norm(f.kf_pos - f.pos),
+                                          render=f is last)
+
+    def loop(self):
+        print(f"Telemetry viewer listening on {self.subscriber.sock.getsockname()}")
+        try:
+            while True:
+                t0 = time.perf_counter()
+                self.tick()
+                wait = self.period - (time.perf_counter() - t0)
+                if self.plotter is not None and plt.fignum_exists(self.plotter.fig.number):
+                    self.plotter.fig.canvas.start_event_loop(max(wait, 1e-3))
+                elif wait > 0:
+                    time.sleep(wait)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.subscriber.close()
+
+
+if __name__ == '__main__':
+    host, port = DEFAULT_ADDRESS
+    addresses = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if addresses:
+        host, _, port = addresses[0].rpartition(':')
+        host, port = host or '127.0.0.1', int(port)
+    TelemetryViewer((host, port), show_errors='--errors' in sys.argv).loop()
@@ -0,0 +1,30 @@
+from adaptive import run_adaptive
+from campaign import SimulationConfig
+from resultcache import ResultCache
+
+CONFIG = SimulationConfig(max_steps=40)
+
+
+def test_rerun_reuses_cached_campaign(tmp_path):
+    options = dict(precision=0.02, min_runs=10, max_runs=60, batch_runs=10, workers=1)
+    cache = ResultCache(str(tmp_path))
+    first = run_adaptive(CONFIG, cache=cache, **options)
+    computed = cache.computed_runs
+    assert computed == first.n_runs
+
+    cache = ResultCache(str(tmp_path))
+    second = run_adaptive(CONFIG, cache=cache, **options)
+    assert (cache.misses, cache.computed_runs) == (0, 0)
+    assert second.n_runs == first.n_runs
+    assert second.summary() == first.summary()
+
+
+def test_reported_runs_do_not_depend_on_the_cache(tmp_path):
+    options = dict(precision=0.1, min_runs=10, max_runs=200, batch_runs=10, workers=1)
+    cold = run_adaptive(CONFIG, **options)
+
+    cache = ResultCache(str(tmp_path))
+    cache.run(CONFIG, 200, workers=1)
+    warm = run_adaptive(CONFIG, cache=cache, **options)
+    assert warm.stopping['runs'] == cold.stopping['runs']
+    assert [n for n, _ in warm.stopping['history']] == [n for n, _ in cold.stopping['history']]
@@ -0,0 +1,36 @@
+import numpy as np
+
+from batchplots import error_bands_from_log, error_percentiles, errors_from_log, render_log
+from campaign import SimulationConfig, run_batch
+from recorder import TrajectoryLog, TrajectoryRecorder
+
+
+def _record(directory, config, n_runs):
+    with TrajectoryRecorder(str(directory), buffer_steps=256) as recorder:
+        run_batch(config, n_runs, recorder=recorder)
+    return TrajectoryLog(str(directory))
+
+
+def test_chunked_bands_match_dense_errors(tmp_path):
+    log = _record(tmp_path, SimulationConfig(max_steps=30), 25)
+    errors, _ = errors_from_log(log)
+    percentiles = (5, 25, 75, 95)
+    bands = error_bands_from_log(log, percentiles, runs_per_chunk=7)
+    for name, data in errors.items():
+        expected = error_percentiles(data, percentiles)
+        for got, want in zip(bands[name], expected):
+            assert np.allclose(got, want, equal_nan=True)
+
+    # A sample of the runs: exact RMSE and counts, percentiles of the sample
+    sampled = error_bands_from_log(log, percentiles, sample_runs=5, runs_per_chunk=7)
+    for name, data in errors.items():
+        _, rmse, counts = error_percentiles(data, percentiles)
+        assert np.allclose(sampled[name][1], rmse) and np.array_equal(sampled[name][2], counts)
+
+
+def test_render_log_without_boundary(tmp_path):
+    config = SimulationConfig(max_steps=20, boundary=None, obstacles=())
+    log = _record(tmp_path / 'log', config, 6)
+    images = render_log(log, str(tmp_path / 'images'), None)
+    assert all((tmp_path / 'images' / name).exists() for name in ('density.png', 'errors.png'))
+    assert len(images) == 2
@@ -0,0 +1,25 @@
+import numpy as np
+
+from boundaries import ObstacleConstraints
+
+
+def _obstacles():
+    obstacles = ObstacleConstraints(2.0, 1.0, 0.5)
+    for box in ((-50, -30, -50, -30), (-20, -10, -20, 10), (0, 4, 0, 4)):
+        obstacles.add_obstacle(*box)
+    return obstacles
+
+
+def test_slide_many_matches_slide():
+    obstacles = _obstacles()
+    rng = np.random.default_rng(4)
+    old = rng.uniform(-60, 10, size=(2000, 2))
+    new = old + rng.uniform(-6, 6, size=old.shape)
+
+    corrected, hit = obstacles.slide_many(old, new)
+    for k in range(len(old)):
+        pos, point_hit = obstacles.slide(old[k], new[k])
+        assert np.allclose(corrected[k], pos, rtol=0, atol=1e-12)
+        assert hit[k] == point_hit
+    # Contacts and overlapping starts are both exercised
+    assert hit.any() and obstacles.is_colliding_many(old).any()
@@ -0,0 +1,16 @@
+import numpy as np
+
+from campaign import SimulationConfig, run_campaign
+
+CONFIG = SimulationConfig(max_steps=40)
+
+
+def test_results_do_not_depend_on_worker_count():
+    single = run_campaign(CONFIG, 40, workers=1, chunk_size=8, keep_histories=True)
+    pooled = run_campaign(CONFIG, 40, workers=3, chunk_size=8, keep_histories=True)
+    for name in ('steps', 'collision_counts', 'goal_reached', 'meas_errors', 'kf_errors',
+                 'pred_errors'):
+        assert np.array_equal(getattr(single, name), getattr(pooled, name))
+    assert single.stats.to_dict().keys() == pooled.stats.to_dict().keys()
+    for name, value in single.stats.to_dict().items():
+        assert np.array_equal(value, pooled.stats.to_dict()[name])
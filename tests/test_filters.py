@@ -0,0 +1,124 @@
+import numpy as np
+
+import filters
+from filters import (BatchKalman2D, Kalman2D, ParticleFilter2D, kld_particle_count,
+                     systematic_resample)
+
+
+def test_masked_nan_readings_only_predict():
+    starts = np.array([[0.0, 0.0], [5.0, -3.0], [1.0, 2.0]])
+    masked = BatchKalman2D(starts, 0.01, 0.25, 1.0)
+    reference = BatchKalman2D(starts, 0.01, 0.25, 1.0)
+    rng = np.random.default_rng(0)
+    mask = np.array([True, False, True])
+
+    for _ in range(5):
+        z = starts + rng.normal(size=starts.shape)
+        readings = z.copy()
+        readings[~mask] = np.nan
+        masked.update(readings, mask=mask)
+        reference.update(z[mask], idx=np.flatnonzero(mask))
+        # Prediction only for the dropped filter
+        x, P = reference.x[1], reference.P[1]
+        reference.x[1] = reference.F @ x
+        reference.P[1] = reference.F @ P @ reference.F.T + reference.Q
+
+    assert np.all(np.isfinite(masked.x)) and np.all(np.isfinite(masked.P))
+    assert np.allclose(masked.x, reference.x)
+    assert np.allclose(masked.P, reference.P)
+
+
+def test_jittered_predict_keeps_model_caches_bounded():
+    kf = Kalman2D(np.zeros(2), 0.01, 0.25, 1.0)
+    rng = np.random.default_rng(1)
+    for dt in 0.1 + 0.01 * rng.random(3 * filters._MODEL_CACHE_SIZE):
+        kf.predict(round(float(dt), 9))
+    assert len(filters._MODEL_CACHE) <= filters._MODEL_CACHE_SIZE
+    assert len(kf._models) <= filters._MODEL_CACHE_SIZE
+    assert np.all(np.isfinite(kf.P))
+
+
+def test_update_fast_matches_update():
+    rng = np.random.default_rng(3)
+    zs = np.arange(60)[:, None] * np.array([1.0, 0.5]) + rng.normal(0.0, 0.5, size=(60, 2))
+    for options in ({}, {'steady_state': True}, {'steady_state': True, 'switch_tol': 1e-6}):
+        slow = Kalman2D([0.0, 0.0], 0.01, 0.25, 1.0, **options)
+        fast = Kalman2D([0.0, 0.0], 0.01, 0.25, 1.0, **options)
+        for z in zs:
+            kf_pos, pred_pos, K = slow.update(z, None, 1.0)
+            fast_pos, fast_pred, fast_K = fast.update_fast(z)
+            assert np.allclose(fast_pos, kf_pos, rtol=0, atol=1e-12)
+            assert np.allclose(fast_pred, pred_pos, rtol=0, atol=1e-12)
+            assert np.allclose(fast_K, K, rtol=0, atol=1e-12)
+            assert np.allclose(fast.P, slow.P, rtol=0, atol=1e-12)
+        assert fast.fixed_gain == slow.fixed_gain
+
+
+def test_update_results_survive_the_next_call_after_the_switch():
+    kf = Kalman2D([0.0, 0.0], 0.01, 0.25, 1.0, steady_state=True, switch_tol=1e-3)
+    rng = np.random.default_rng(5)
+    t = 0
+    while not kf.fixed_gain:
+        kf.update(np.array([t, 0.5 * t]) + rng.normal(size=2), None, 1.0)
+        t += 1
+    first = kf.update(np.array([t, 0.5 * t]), None, 1.0)
+    kept = [a.copy() for a in first[:2]]
+    x_kept = kf.x.copy()
+    second = kf.update(np.array([t + 1.0, 0.5 * t + 0.5]), None, 1.0)
+    for held, copy in zip(first[:2], kept):
+        assert np.array_equal(held, copy)
+    assert not np.shares_memory(first[0], second[0])
+    assert not np.shares_memory(first[1], second[1])
+    assert not np.array_equal(kf.x, x_kept)
+
+
+def test_systematic_resample_is_unbiased():
+    rng = np.random.default_rng(8)
+    weights = rng.random(50) ** 4
+    weights /= weights.sum()
+    total = np.zeros(50)
+    draws = 2000
+    for n in (50, 37, 200):
+        for _ in range(draws):
+            idx = systematic_resample(weights, n, rng)
+            assert len(idx) == n
+            counts = np.bincount(idx, minlength=50)
+            # Low variance: every particle is copied floor or ceil of n * w times
+            assert np.all(np.abs(counts - n * weights) < 1.0)
+            total += counts / n
+    assert np.allclose(total / (3 * draws), weights, atol=2e-3)
+
+
+def test_kld_particle_count_stays_within_bounds():
+    assert kld_particle_count(1) == 1
+    assert kld_particle_count(50) < kld_particle_count(500)
+    rng = np.random.default_rng(2)
+    pf = ParticleFilter2D([0.0, 0.0], 0.01, 25.0, 1.0, rng=rng, min_particles=150, max_particles=900)
+    for t in range(30):
+        pf.update(np.array([t, 0.0]) + 5.0 * rng.standard_normal(2), (1.0, 0.0), 1.0)
+        assert 150 <= pf.n_particles <= 900
+        assert np.isclose(pf.weights.sum(), 1.0)
+    # A tight posterior drops to the minimum, a spread one asks for the maximum
+    tight = ParticleFilter2D([0.0, 0.0], 1e-6, 1e-4, 1.0, rng=rng, min_particles=150, max_particles=900)
+    tight.update(np.array([0.0, 0.0]), (0.0, 0.0), 1.0)
+    assert tight.n_particles == 150
+    wide = ParticleFilter2D([0.0, 0.0], 4.0, 400.0, 1.0, rng=rng, min_particles=150, max_particles=900)
+    wide.update(np.array([0.0, 0.0]), (0.0, 0.0), 1.0)
+    assert wide.n_particles == 900
+
+
+def test_particle_filter_tracks_a_straight_line():
+    rng = np.random.default_rng(4)
+    meas_var = 0.25
+    pf = ParticleFilter2D([0.0, 0.0], 0.01, meas_var, 1.0, rng=rng)
+    velocity = np.array([1.0, 0.5])
+    truth = np.zeros(2)
+    meas_errors, est_errors = [], []
+    for _ in range(80):
+        truth = truth + velocity + 0.1 * rng.standard_normal(2)
+        measured = truth + np.sqrt(meas_var) * rng.standard_normal(2)
+        est, _, _ = pf.update(measured, velocity, 1.0)
+        meas_errors.append(np.linalg.norm(measured - truth))
+        est_errors.append(np.linalg.norm(est - truth))
+    assert np.mean(est_errors[20:]) < 0.6 * np.mean(meas_errors[20:])
+    assert np.linalg.norm(pf.x[2:] - velocity) < 0.3
@@ -0,0 +1,10 @@
+import pytest
+
+from main import main
+
+
+def test_precision_rejects_explicit_batch_engine(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(['--engine', 'batch', '--precision', '0.05'])
+    assert exit_info.value.code == 2
+    assert '--engine batch' in capsys.readouterr().err
@@ -0,0 +1,52 @@
+import numpy as np
+
+from campaign import SimulationConfig, run_batch, run_campaign
+from recorder import TrajectoryLog, TrajectoryRecorder
+from stats import RunningStats
+
+CONFIG = SimulationConfig(max_steps=60)
+
+
+def test_lockstep_engine_agrees_with_serial_engine():
+    batch = run_batch(CONFIG, 300)
+    serial = run_campaign(CONFIG, 300, workers=1)
+    b, s = batch.summary(), serial.summary()
+
+    # Same scenarios, different noise: each KF RMSE lies in the other's interval
+    assert s['rmse_kf_lo'] <= b['rmse_kf'] <= s['rmse_kf_hi']
+    assert b['rmse_kf_lo'] <= s['rmse_kf'] <= b['rmse_kf_hi']
+    collisions = RunningStats()
+    collisions.add(serial.collision_counts)
+    lo, hi = collisions.confidence_interval()
+    assert lo <= b['mean_collisions'] <= hi
+    assert abs(b['reached'] - s['reached']) <= 0.05
+
+
+def test_recorded_runs_match_histories(tmp_path):
+    n_runs = 40
+    with TrajectoryRecorder(str(tmp_path), buffer_steps=100) as recorder:
+        result = run_batch(CONFIG, n_runs, recorder=recorder, keep_histories=True)
+    log = TrajectoryLog(str(tmp_path))
+    # Recording doesn't change the campaign
+    plain = run_batch(CONFIG, n_runs, keep_histories=True)
+    assert np.array_equal(plain.steps, result.steps)
+    assert np.array_equal(plain.kf_errors, result.kf_errors)
+
+    # Runs are stored as they finish, not in id order
+    assert sorted(log.run_ids.tolist()) == list(range(n_runs))
+    assert log.run_ids.tolist() != list(range(n_runs))
+    assert np.array_equal(log.steps(), result.steps[log.run_ids])
+
+    for i in range(n_runs):
+        run = log.run(i)
+        n = result.steps[i]
+        true_pos = run['true_pos']
+        assert len(true_pos) == n
+        for name, errors in (('measured_pos', result.meas_errors), ('pred_pos', result.pred_errors)):
+            assert np.allclose(np.linalg.norm(run[name] - true_pos, axis=1), errors[i, :n])
+        assert np.allclose(np.linalg.norm(run['kf_state'][:, :2] - true_pos, axis=1),
+                           result.kf_errors[i, :n])
+        # A step can add more than one collision, but flags a step at most once
+        flagged = run['collision'].sum()
+        assert flagged <= result.collision_counts[i]
+        assert (flagged > 0) == (result.collision_counts[i] > 0)
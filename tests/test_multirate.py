@@ -0,0 +1,16 @@
+import numpy as np
+
+from campaign import SimulationConfig
+from multirate import Rates, run_multirate
+
+CONFIG = SimulationConfig(max_steps=30)
+
+
+def test_histories_are_opt_in():
+    rates = Rates(sim=10.0, control=10.0, gps=2.0)
+    streamed = run_multirate(CONFIG, 4, rates)
+    kept = run_multirate(CONFIG, 4, rates, keep_histories=True)
+    assert streamed.kf_errors is None
+    assert kept.kf_errors.shape[0] == 4
+    assert np.all(kept.steps <= kept.kf_errors.shape[1])
+    assert streamed.summary() == kept.summary()
@@ -0,0 +1,62 @@
+import numpy as np
+
+import navigation
+from campaign import SimulationConfig
+from planner import BatchPlanner2D
+
+
+def _nav_map():
+    config = SimulationConfig(navigation=True)
+    return config.build_navigation(*config.build_constraints())
+
+
+def test_goals_with_one_target_share_a_field():
+    nav_map = _nav_map()
+    # Both goals lie beyond the x_max wall and clamp to the same target
+    assert nav_map.field((40.0, -60.0)) is nav_map.field((90.0, -60.0))
+
+
+def test_batch_planner_holds_a_bounded_set_of_fields():
+    nav_map = _nav_map()
+    rng = np.random.default_rng(0)
+    goals = rng.integers(-95, 5, size=(12, 2)).astype(float)
+    kf_pos = rng.uniform(-90, 0, size=(12, 2))
+    planner = BatchPlanner2D(goals, 2.0, 1.0, navigation=nav_map, max_fields=4)
+
+    batches = planner.batches()
+    assert sorted(np.concatenate(batches).tolist()) == list(range(12))
+    for idx in batches:
+        vel = planner.velocity_vectors(kf_pos[idx], idx)
+        assert planner.n_fields <= 4
+        for run, v in zip(idx, vel):
+            expected = nav_map.field(goals[run]).directions(kf_pos[run])[0] * 2.0
+            assert np.allclose(v, expected)
+        planner.release(idx)
+        assert planner.n_fields == 0
+
+
+def test_maps_with_different_cost_grids_do_not_share_fields():
+    # The inflated corner sits 0.85 from a node on both axes: inside the
+    # square clearance of the box test, outside the round one of the SDF
+    config = SimulationConfig(navigation=True, distance_map=True,
+                              obstacles=((-50, -29.35, -50, -29.35),))
+    boundary, obstacles = config.build_constraints()
+    distance_map = config.build_distance_map(boundary, obstacles)
+    boxes = config.build_navigation(boundary, obstacles)
+    rounded = config.build_navigation(boundary, obstacles, distance_map)
+    assert not np.array_equal(boxes.blocked, rounded.blocked)
+    assert boxes.hash != rounded.hash
+    assert boxes.field((-60.0, -60.0)) is not rounded.field((-60.0, -60.0))
+
+
+def test_field_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(navigation, '_FIELD_CACHE', {})
+    monkeypatch.setattr(navigation, '_FIELD_CACHE_SIZE', 2)
+    nav_map = _nav_map()
+    first = nav_map.field((-60.0, -60.0))
+    nav_map.field((-70.0, -60.0))
+    assert nav_map.field((-60.0, -60.0)) is first
+    nav_map.field((-80.0, -60.0))
+    # The field used last survives, the one used before it is evicted
+    assert nav_map.field((-60.0, -60.0)) is first
+    assert len(navigation._FIELD_CACHE) == 2
@@ -0,0 +1,24 @@
+import numpy as np
+
+from noise import NoiseSource
+
+
+SIZES = [3, (2, 5), 1, 40, (7,), 500, 2, (3, 3)]
+
+
+def _draw(block_size, sizes):
+    source = NoiseSource.from_seed(11, block_size=block_size)
+    return np.concatenate([np.ravel(source.standard_normal(size)) for size in sizes])
+
+
+def test_stream_does_not_depend_on_block_size():
+    reference = np.random.default_rng(11).standard_normal(sum(np.prod(s) for s in SIZES))
+    for block_size in (1, 7, 64, 8192):
+        assert np.array_equal(_draw(block_size, SIZES), reference)
+
+
+def test_numpy_integer_sizes_match_python_ints():
+    numpy_sizes = [np.int64(s) if isinstance(s, int) else s for s in SIZES]
+    assert np.array_equal(_draw(16, numpy_sizes), _draw(16, SIZES))
+    source = NoiseSource.from_seed(3)
+    assert source.standard_normal(np.int32(4)).shape == (4,)
@@ -0,0 +1,61 @@
+import numpy as np
+
+from profiling import StageProfiler, TimingHistogram
+
+
+def _laps(seed, n):
+    rng = np.random.default_rng(seed)
+    stages = rng.choice(['sense', 'filter', 'plan', 'act.move'], size=n)
+    durations = rng.lognormal(8.0, 2.0, size=n).astype(np.int64) + 1
+    return [(str(s), int(ns)) for s, ns in zip(stages, durations)]
+
+
+def _profile(laps, counters=()):
+    profiler = StageProfiler()
+    for stage, ns in laps:
+        profiler.add(stage, ns)
+    for name, n in counters:
+        profiler.count(name, n)
+    return profiler
+
+
+def test_merge_equals_profiling_the_combined_laps():
+    first, second = _laps(0, 500), _laps(1, 700) + [('record', 12345)]
+    a = _profile(first, [('runs', 3), ('collisions', 2)])
+    b = _profile(second, [('runs', 4)])
+    combined = _profile(first + second, [('runs', 7), ('collisions', 2)])
+
+    merged = StageProfiler().merge(a).merge(b)
+    assert merged.to_dict() == combined.to_dict()
+    for stage, hist in combined.stages.items():
+        assert merged.stages[stage].percentile(99) == hist.percentile(99)
+
+    # Merged histograms are copies: adding to a source doesn't change them
+    b.add('record', 1)
+    assert merged.stages['record'].count == 1
+
+
+def test_dump_and_load_merge_the_dumps(tmp_path):
+    a = _profile(_laps(2, 300), [('runs', 1)])
+    b = _profile(_laps(3, 200), [('runs', 2)])
+    paths = [a.dump(str(tmp_path / 'a.json')), b.dump(str(tmp_path / 'b.json'))]
+    loaded = StageProfiler.load(*paths)
+    expected = StageProfiler().merge(a).merge(b)
+    assert loaded.to_dict() == expected.to_dict()
+    assert StageProfiler.load(paths[0]).to_dict() == a.to_dict()
+
+
+def test_histogram_buckets_and_percentiles():
+    hist = TimingHistogram()
+    for ns in (1, 2, 3, 1000, 1023, 1024):
+        hist.add(ns)
+    assert hist.buckets[1] == 1 and hist.buckets[2] == 2
+    assert hist.buckets[10] == 2 and hist.buckets[11] == 1
+    assert (hist.min_ns, hist.max_ns, hist.total_ns) == (1, 1024, 3053)
+    # Percentiles are exact to within their bucket, and clipped to min / max
+    assert 1 <= hist.percentile(0) <= 2
+    assert hist.percentile(100) == 1024
+    assert 512 <= hist.percentile(75) <= 1024
+    # Dumps with fewer buckets are padded back to N_BUCKETS
+    short = TimingHistogram.from_dict(dict(hist.to_dict(), buckets=hist.buckets[:12]))
+    assert short.buckets == hist.buckets
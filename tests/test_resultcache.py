@@ -0,0 +1,35 @@
+import dataclasses
+
+import numpy as np
+
+from campaign import SimulationConfig, run_campaign
+from resultcache import ResultCache, config_key
+
+CONFIG = SimulationConfig(max_steps=40)
+
+
+def test_smaller_request_after_stats_only_entry(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.run(CONFIG, 12, workers=1)
+    assert (cache.misses, cache.computed_runs) == (1, 12)
+
+    first = cache.run(CONFIG, 5, workers=1)
+    assert (cache.misses, cache.computed_runs) == (2, 17)
+    again = cache.run(CONFIG, 5, workers=1)
+    assert (cache.hits, cache.misses, cache.computed_runs) == (1, 2, 17)
+
+    # The prefix entry doesn't replace the campaign entry
+    assert cache.campaign_runs(CONFIG) == 12
+    fresh = run_campaign(CONFIG, 5, workers=1)
+    for result in (first, again):
+        assert np.array_equal(result.steps, fresh.steps)
+        assert result.summary() == fresh.summary()
+
+
+def test_equal_configs_share_a_key():
+    config = SimulationConfig()
+    parsed = dataclasses.replace(config, max_speed=2.0, dt=np.float64(1.0), max_steps=np.int64(500),
+                                 boundary=(-100.0, 10.0, -100.0, 10.0))
+    assert parsed == config
+    assert config_key(parsed) == config_key(config)
+    assert config_key(dataclasses.replace(config, max_speed=2.5)) != config_key(config)
@@ -0,0 +1,56 @@
+import numpy as np
+
+from boundaries import BoundaryConstraints
+from campaign import SimulationConfig
+from swarm import SpatialHash, SwarmSimulator2D, run_swarm, spawn_points
+
+
+def test_pressed_pair_is_counted_once_and_separated():
+    boundary = BoundaryConstraints(0.5, 2.0, 0.5, -10, 10, -10, 10)
+    sim = SwarmSimulator2D([(-3.0, 0.0), (3.0, 0.0)], [(3.0, 0.0), (-3.0, 0.0)], 0.5, 0.0, 2.0,
+                           boundary)
+    # Both agents keep driving into each other
+    for _ in range(20):
+        sim.step(np.array([[2.0, 0.0], [-2.0, 0.0]]))
+        assert np.hypot(*(sim.pos[1] - sim.pos[0])) >= 1.0 - 1e-9
+    assert sim.agent_collision_count.tolist() == [1, 1]
+
+
+def test_spawns_are_clamped_inside_the_boundary():
+    boundary = BoundaryConstraints(0.5, 2.0, 0.5, -10, 10, -10, 10)
+    sim = SwarmSimulator2D([(-20.0, 0.0), (0.0, 30.0)], [(0.0, 0.0), (0.0, 0.0)], 0.5, 0.0, 2.0,
+                           boundary)
+    assert not boundary.is_outside_many(sim.pos).any()
+
+
+def test_agent_collision_counts_stay_bounded():
+    config = SimulationConfig(max_steps=150)
+    result = run_swarm(config, 60)
+    counts = result.agent_collision_counts
+    # Agents pressed together are not recounted on every step
+    assert counts.max() < config.max_steps // 5
+    assert np.all(result.collision_counts >= counts)
+
+
+def test_spawn_points_are_free_and_apart():
+    config = SimulationConfig()
+    boundary, obstacles = config.build_constraints()
+    rng = np.random.default_rng(0)
+    starts = rng.uniform(-150, 50, size=(800, 2))
+    points = spawn_points(starts, config.radius, boundary, obstacles, rng)
+    assert not boundary.is_outside_many(points).any()
+    assert not obstacles.is_colliding_many(points).any()
+    assert not len(SpatialHash(2 * config.radius).pairs(points)[0])
+    # Free starts are kept
+    keep = ~boundary.is_outside_many(starts) & ~obstacles.is_colliding_many(starts)
+    assert np.any(np.all(points == starts, axis=1)) and np.all(points[~keep] != starts[~keep])
+
+
+def test_subset_query_matches_full_query():
+    rng = np.random.default_rng(2)
+    points = rng.uniform(-20, 20, size=(400, 2))
+    query = rng.choice(len(points), 50, replace=False)
+    i, j, _ = SpatialHash(2.0).pairs(points)
+    touched = np.isin(i, query) | np.isin(j, query)
+    qi, qj, _ = SpatialHash(2.0).pairs(points, query=query)
+    assert sorted(zip(qi.tolist(), qj.tolist())) == sorted(zip(i[touched].tolist(), j[touched].tolist()))
@@ -0,0 +1,21 @@
+import pytest
+
+from sweep import parse_sweep
+
+
+def test_linspace_on_int_field():
+    assert parse_sweep(['max_steps=100:300:3']) == {'max_steps': [100, 200, 300]}
+    assert parse_sweep(['max_speed=1:2:3']) == {'max_speed': [1.0, 1.5, 2.0]}
+
+
+def test_linspace_on_int_field_rejects_fractions():
+    with pytest.raises(ValueError, match='non-integer'):
+        parse_sweep(['max_steps=100:300:4'])
+
+
+def test_none_only_for_optional_fields():
+    assert parse_sweep(['slow_clearance=none,2']) == {'slow_clearance': [None, 2.0]}
+    with pytest.raises(ValueError, match='max_speed'):
+        parse_sweep(['max_speed=none,2'])
+    with pytest.raises(ValueError, match='estimator'):
+        parse_sweep(['estimator=None'])
@@ -0,0 +1,68 @@
+import time
+
+import numpy as np
+
+from boundaries import BoundaryConstraints, ObstacleConstraints
+from telemetry import (FRAME, FRAME_STRUCT, SCENE, TelemetryFrame, TelemetryPublisher,
+                       TelemetrySubscriber, decode_scene, encode_frame, encode_scene)
+
+
+def test_frame_layout_round_trip():
+    datagram = encode_frame(7, 3, (1.0, 2.0), (1.5, 2.5), (1.1, 2.1), (0.9, 1.9), 1.75, 0.25, 4)
+    assert datagram[:1] == FRAME
+    assert len(datagram) == 1 + FRAME_STRUCT.size
+    frame = TelemetryFrame.decode(datagram[1:])
+    assert (frame.step, frame.run, frame.collisions) == (7, 3, 4)
+    assert np.array_equal(frame.pos, [1.0, 2.0])
+    assert np.array_equal(frame.measured_pos, [1.5, 2.5])
+    assert np.array_equal(frame.kf_pos, [1.1, 2.1])
+    assert np.array_equal(frame.pred_pos, [0.9, 1.9])
+    assert (frame.speed, frame.k_trace) == (1.75, 0.25)
+
+
+def test_scene_round_trip():
+    boundary = BoundaryConstraints(0.5, 2.0, 1.0, x_min=-100, x_max=10, y_min=-100, y_max=10)
+    obstacles = ObstacleConstraints(2.0, 1.0, 0.5)
+    obstacles.add_obstacle(x_min=-50, x_max=-30, y_min=-50, y_max=-30)
+    datagram = encode_scene(2, (0, 1), (-40, 5), boundary, obstacles)
+    assert datagram[:1] == SCENE
+    run, start, goal, b, o = decode_scene(datagram[1:])
+    assert (run, start, goal) == (2, [0.0, 1.0], [-40.0, 5.0])
+    assert (b.x_min, b.x_max, b.y_min, b.y_max) == (-100, 10, -100, 10)
+    assert [(obs['x_min'], obs['x_max'], obs['y_min'], obs['y_max']) for obs in o.obstacles] \
+        == [(-50, -30, -50, -30)]
+    assert decode_scene(encode_scene(0, (0, 0), (1, 1))[1:])[3:] == (None, None)
+
+
+def _drain(subscriber, n_frames, timeout=2.0):
+    scenes, frames = [], []
+    deadline = time.monotonic() + timeout
+    while len(frames) < n_frames and time.monotonic() < deadline:
+        scene, new = subscriber.poll()
+        if scene is not None:
+            scenes.append(scene)
+        frames.extend(new)
+        time.sleep(0.001)
+    return scenes, frames
+
+
+def test_loopback_sequence():
+    subscriber = TelemetrySubscriber(('127.0.0.1', 0))
+    try:
+        address = subscriber.sock.getsockname()
+        with TelemetryPublisher(address, scene_every=4) as publisher:
+            for run in range(2):
+                publisher.publish_scene((run, 0), (10, 10))
+                for step in range(6):
+                    publisher.publish((step, 0.0), (step, 0.1), (step, 0.2), (step, 0.3), 1.0,
+                                      collisions=run)
+            # 2 scenes, 12 frames, and each run re-sends its scene before step 4
+            assert publisher.sent + publisher.dropped == 16
+        scenes, frames = _drain(subscriber, publisher.sent - 4)
+    finally:
+        subscriber.close()
+    assert publisher.dropped == 0
+    assert [(f.run, f.step) for f in frames] == [(r, s) for r in range(2) for s in range(6)]
+    assert [f.pos[0] for f in frames] == [float(s) for _ in range(2) for s in range(6)]
+    assert [f.collisions for f in frames] == [0] * 6 + [1] * 6
+    assert scenes and scenes[-1][0] == 1
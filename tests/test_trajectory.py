@@ -0,0 +1,57 @@
+import numpy as np
+
+from trajectory import TrajectoryBuffer, douglas_peucker
+
+
+def test_buffer_grows_and_keeps_points():
+    buffer = TrajectoryBuffer((0.0, 0.0), capacity=2)
+    points = np.random.default_rng(0).normal(size=(100, 2))
+    for point in points:
+        buffer.append(point)
+    assert len(buffer) == 101
+    assert buffer.nbytes >= 101 * 2 * 8
+    assert np.array_equal(buffer.data[0], [0.0, 0.0])
+    assert np.array_equal(buffer.data[1:], points)
+    assert np.array_equal(buffer.x, buffer.data[:, 0])
+    assert np.array_equal(buffer.y, buffer.data[:, 1])
+
+    buffer.clear()
+    buffer.append((1.0, 2.0))
+    assert np.array_equal(buffer.data, [[1.0, 2.0]])
+
+
+def test_buffer_decimation_and_disabled_logging():
+    buffer = TrajectoryBuffer((0.0, 0.0), every=3)
+    for i in range(10):
+        buffer.append((i, -i))
+    assert np.array_equal(buffer.x, [0, 0, 3, 6, 9])
+
+    off = TrajectoryBuffer((0.0, 0.0), enabled=False)
+    off.append((1.0, 1.0))
+    assert len(off) == 0
+
+
+def test_douglas_peucker_drops_collinear_points():
+    line = np.column_stack([np.linspace(0, 10, 50), np.linspace(0, 5, 50)])
+    assert np.array_equal(douglas_peucker(line, 1e-9), line[[0, -1]])
+
+
+def _distance_to_polyline(points, polyline):
+    a, b = polyline[:-1], polyline[1:]
+    seg = b - a
+    rel = points[:, None, :] - a[None, :, :]
+    t = np.clip(np.sum(rel * seg, axis=2) / np.sum(seg * seg, axis=1), 0.0, 1.0)
+    closest = a[None, :, :] + t[:, :, None] * seg[None, :, :]
+    return np.min(np.hypot(*np.moveaxis(points[:, None, :] - closest, 2, 0)), axis=1)
+
+
+def test_douglas_peucker_respects_tolerance():
+    t = np.linspace(0, 4 * np.pi, 400)
+    curve = np.column_stack([t, np.sin(t)])
+    for tolerance in (0.01, 0.1, 0.5):
+        kept = douglas_peucker(curve, tolerance)
+        assert np.array_equal(kept[[0, -1]], curve[[0, -1]])
+        assert len(kept) < len(curve)
+        # Every original vertex lies within tolerance of the simplified polyline
+        assert np.max(_distance_to_polyline(curve, kept)) <= tolerance + 1e-12
+    assert len(douglas_peucker(curve, 0.01)) > len(douglas_peucker(curve, 0.5))
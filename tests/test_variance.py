@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from campaign import (GOAL_HIGH, GOAL_LOW, START_HIGH, START_LOW, SimulationConfig, run_campaign,
+                      run_scenarios, sobol_start_goal)
+from qmc import SobolSequence
+from variance import antithetic_variance_reduction, compare_configs
+
+
+def test_sobol_points_are_stratified_in_every_coordinate():
+    sequence = SobolSequence(4, seed=3)
+    for n in (8, 64, 256):
+        bins = np.floor(sequence.random(n) * n).astype(int)
+        for d in range(4):
+            assert np.array_equal(np.sort(bins[:, d]), np.arange(n))
+
+
+def test_unscrambled_sobol_starts_with_van_der_corput():
+    u = SobolSequence(2, scramble=False).random(4)
+    assert np.allclose(u[:, 0], [0.0, 0.5, 0.25, 0.75], atol=1e-9)
+
+
+def test_sobol_start_goal_is_stratified():
+    n = 64
+    starts, goals = sobol_start_goal(7, np.arange(n))
+    values = np.hstack([starts, goals])
+    low = np.array(START_LOW + GOAL_LOW)
+    width = np.array(START_HIGH + GOAL_HIGH) - low
+    k = np.arange(n)
+    for d in range(4):
+        # The k-th smallest unit coordinate lies in [k/n, (k+1)/n)
+        offsets = np.sort(values[:, d]) - low[d]
+        assert np.all(offsets >= np.floor(k * width[d] / n))
+        assert np.all(offsets < (k + 1) * width[d] / n)
+
+
+@pytest.mark.parametrize('scenarios', ['random', 'sobol'])
+def test_antithetic_pairs_mirror_each_other(scenarios):
+    config = SimulationConfig(scenarios=scenarios, antithetic=True, seed=4)
+    starts, goals = run_scenarios(config, 12)
+    assert np.array_equal(starts[1::2], np.add(START_LOW, START_HIGH) - 1 - starts[0::2])
+    assert np.array_equal(goals[1::2], np.add(GOAL_LOW, GOAL_HIGH) - 1 - goals[0::2])
+    assert np.all((starts >= START_LOW) & (starts < START_HIGH))
+    assert np.all((goals >= GOAL_LOW) & (goals < GOAL_HIGH))
+    # The first run of every pair is the plain run of the pair's streams
+    plain_starts, plain_goals = run_scenarios(SimulationConfig(scenarios=scenarios, seed=4), 6)
+    assert np.array_equal(starts[0::2], plain_starts)
+    assert np.array_equal(goals[0::2], plain_goals)
+
+
+def test_antithetic_variance_reduction():
+    config = SimulationConfig(antithetic=True, max_steps=60, seed=2)
+    result = run_campaign(config, 16, workers=1, keep_histories=True)
+    factors = antithetic_variance_reduction(result)
+    assert set(factors) == {'mse', 'collisions'}
+    assert factors['mse'] > 0.0
+    short = run_campaign(config, 2, workers=1, keep_histories=True)
+    with pytest.raises(ValueError, match='two antithetic pairs'):
+        antithetic_variance_reduction(short)
+
+
+def test_compare_configs_rejects_different_seeds_with_common_random_numbers():
+    with pytest.raises(ValueError, match='equal seeds'):
+        compare_configs(SimulationConfig(seed=1), SimulationConfig(seed=2, max_speed=3.0), n_runs=4)
@@ -0,0 +1,110 @@
+import numpy as np
+
+
+class TrajectoryBuffer:
+    """
+    Compact 2D trajectory log.
+
+    Points are stored in a preallocated (capacity, 2) float64 array that
+    doubles when full, instead of two lists of boxed Python floats (about
+    4-5x less memory per point). Logging can be switched off (append
+    becomes a no-op) or decimated to every k-th point.
+    """
+
+    __slots__ = ('_data', '_length', 'enabled', 'every', '_ticks')
+
+    def __init__(self, start=None, capacity=64, enabled=True, every=1):
+        """
+        Args:
+            start: optional first point, always recorded when enabled
+            capacity: initial number of points
+            enabled: False disables logging entirely
+            every: record one point out of every `every` appends
+        """
+        self._data = np.empty((max(1, capacity), 2))
+        self._length = 0
+        self.enabled = enabled
+        self.every = max(1, int(every))
+        self._ticks = 0
+        if start is not None and enabled:
+            self._data[0] = start[0], start[1]
+            self._length = 1
+
+    def append(self, point):
+        if not self.enabled:
+            return
+        ticks = self._ticks
+        self._ticks = ticks + 1
+        if ticks % self.every:
+            return
+        n = self._length
+        if n == len(self._data):
+            grown = np.empty((2 * n, 2))
+            grown[:n] = self._data
+            self._data = grown
+        self._data[n] = point[0], point[1]
+        self._length = n + 1
+
+    def clear(self):
+        self._length = 0
+        self._ticks = 0
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def data(self):
+        """(n, 2) view of the recorded points."""
+        return self._data[:self._length]
+
+    @property
+    def x(self):
+        return self._data[:self._length, 0]
+
+    @property
+    def y(self):
+        return self._data[:self._length, 1]
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+
+def douglas_peucker(points, tolerance):
+    """
+    Simplify a polyline with the Douglas-Peucker algorithm.
+
+    Args:
+        points: (n, 2) array of vertices
+        tolerance: maximum distance of a dropped vertex from the simplified line
+
+    Returns:
+        (m, 2) array of the kept vertices (always includes both end points)
+    """
+    points = np.asarray(points, dtype=float)
+    n = len(points)
+    if n < 3:
+        return points.copy()
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a = points[first]
+        seg = points[last] - a
+        rel = points[first + 1:last] - a
+        length = np.hypot(seg[0], seg[1])
+        if length > 0.0:
+            dist = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / length
+        else:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
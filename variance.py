@@ -0,0 +1,141 @@
+import dataclasses
+from statistics import NormalDist
+
+import numpy as np
+
+from campaign import run_campaign
+
+
+def run_contributions(result, channel='kf'):
+    """
+    Per-run contributions to the overall MSE of a campaign (which needs
+    its error histories) and to its mean collisions.
+
+    The overall MSE is the ratio estimator sum(S) / sum(n) of the runs'
+    squared-error sums S and step counts n; its linearization
+    (S_i - mse * n_i) / mean(n) has mean 0 and the variance of the MSE
+    estimate times the number of runs, like StepStats'
+    overall_confidence_interval().
+
+    Returns:
+        dict 'mse' -> (runs,) linearized MSE contributions,
+        'collisions' -> (runs,) collision counts
+    """
+    if result.kf_errors is None:
+        raise ValueError("Per-run contributions need the error histories (keep_histories=True)")
+    errors = {'meas': result.meas_errors, 'kf': result.kf_errors, 'pred': result.pred_errors}[channel]
+    steps = np.asarray(result.steps)
+    valid = np.arange(errors.shape[1])[None, :] < steps[:, None]
+    sums = np.where(valid, errors ** 2, 0.0).sum(axis=1)
+    mse = sums.sum() / steps.sum()
+    return {
+        'mse': (sums - mse * steps) / steps.mean(),
+        'collisions': np.asarray(result.collision_counts, dtype=float),
+    }
+
+
+def antithetic_variance_reduction(result):
+    """
+    Variance reduction of an antithetic campaign (config.antithetic) over
+    independent runs, estimated from the campaign itself: the variance of
+    single runs over twice the variance of pair means. Factors above 1 mean
+    fewer runs for the same precision.
+
+    Returns:
+        dict 'mse' / 'collisions' -> factor
+    """
+    n_pairs = result.n_runs // 2
+    if n_pairs < 2:
+        raise ValueError("Need at least two antithetic pairs")
+    factors = {}
+    for name, values in run_contributions(result).items():
+        values = values[:2 * n_pairs]
+        pair_means = values.reshape(n_pairs, 2).mean(axis=1)
+        factors[name] = _ratio(values.var(ddof=1), 2.0 * pair_means.var(ddof=1))
+    return factors
+
+
+def compare_configs(config_a, config_b, n_runs=500, workers=None, common_random_numbers=True,
+                    level=0.95):
+    """
+    Estimate the differences b - a of the overall KF RMSE and of the mean
+    collisions per run between two configurations.
+
+    With common_random_numbers, both campaigns use config_a.seed, so run i
+    of either sees the same scenario and noise streams (noise is drawn as
+    standard normals and then scaled, so this holds across noise levels),
+    and the differences are estimated from paired runs; config_b must then
+    have the same seed as config_a. Otherwise b runs on config_a.seed + 1,
+    independently of a, whatever config_b.seed is.
+
+    Returns:
+        dict 'rmse_kf' / 'collisions' -> {'a', 'b', 'difference', 'half_width'
+        (of its level confidence interval), 'variance_reduction' (variance
+        of the difference with independent runs over its variance here;
+        1 without common random numbers)}
+    """
+    if common_random_numbers and config_b.seed != config_a.seed:
+        raise ValueError(f"Common random numbers need equal seeds, got {config_a.seed} "
+                         f"and {config_b.seed}")
+    seed_b = config_a.seed if common_random_numbers else config_a.seed + 1
+    config_b = dataclasses.replace(config_b, seed=seed_b)
+    result_a = run_campaign(config_a, n_runs, workers, keep_histories=True)
+    result_b = run_campaign(config_b, n_runs, workers, keep_histories=True)
+    runs_a = run_contributions(result_a)
+    runs_b = run_contributions(result_b)
+    z = NormalDist().inv_cdf(0.5 + level / 2.0)
+
+    report = {}
+    for name, key in (('rmse_kf', 'mse'), ('collisions', 'collisions')):
+        if name == 'rmse_kf':
+            a = float(result_a.stats.overall_rmse()[result_a.stats.channel('kf')])
+            b = float(result_b.stats.overall_rmse()[result_b.stats.channel('kf')])
+            # Delta method: d(RMSE) = d(MSE) / (2 RMSE)
+            da, db = runs_a[key] / (2.0 * a), runs_b[key] / (2.0 * b)
+        else:
+            a = float(np.mean(result_a.collision_counts))
+            b = float(np.mean(result_b.collision_counts))
+            da, db = runs_a[key], runs_b[key]
+        var_independent = da.var(ddof=1) + db.var(ddof=1)
+        var = (db - da).var(ddof=1) if common_random_numbers else var_independent
+        report[name] = {
+            'a': a,
+            'b': b,
+            'difference': b - a,
+            'half_width': float(z * np.sqrt(var / n_runs)),
+            'variance_reduction': _ratio(var_independent, var),
+        }
+    return report
+
+
+def replicate_variance_reduction(config, n_runs=256, replicates=8, workers=None):
+    """
+    Variance reduction of config's sampling options (scenarios, antithetic)
+    over plain Monte Carlo, measured on replicated campaigns: replicate r of
+    both runs on seed config.seed + r (a fresh scramble / fresh streams),
+    and the factor is the variance of the plain campaigns' estimates over
+    that of config's. Needs 2 * replicates campaigns, and with few
+    replicates the factors themselves are rough.
+
+    Returns:
+        dict 'rmse_kf' / 'mean_collisions' -> factor
+    """
+    if replicates < 2:
+        raise ValueError("Need at least two replicates")
+    plain = dataclasses.replace(config, scenarios='random', antithetic=False)
+    estimates = {'plain': [], 'config': []}
+    for r in range(replicates):
+        for label, base in (('plain', plain), ('config', config)):
+            result = run_campaign(dataclasses.replace(base, seed=config.seed + r), n_runs, workers)
+            summary = result.summary()
+            estimates[label].append((summary['rmse_kf'], summary['mean_collisions']))
+    plain_var = np.var(estimates['plain'], axis=0, ddof=1)
+    config_var = np.var(estimates['config'], axis=0, ddof=1)
+    return {name: _ratio(plain_var[i], config_var[i])
+            for i, name in enumerate(('rmse_kf', 'mean_collisions'))}
+
+
+def _ratio(numerator, denominator):
+    if denominator > 0.0:
+        return float(numerator / denominator)
+    return float('inf') if numerator > 0.0 else 1.0